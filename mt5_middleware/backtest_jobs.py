@@ -0,0 +1,543 @@
+"""
+=================================================================================
+          🗂️ Backtest Job Queue
+          طابور اختبارات Strategy Tester محفوظ على القرص
+=================================================================================
+
+كل طلب Backtest يصبح "مهمة" (job) لها رقم:
+- POST يرجع job_id فوراً، والتشغيل يتم في الخلفية بعدد محدود من الـ workers
+  (كل worker يشغّل terminal واحد، ونفس terminal64.exe لا يشغّل مهمتين معاً)
+- كل مهمة ملف JSON في jobs/<id>.json (كتابة ذرية) -> الطابور يبقى بعد إعادة تشغيل الخادم:
+  المهام التي كانت قيد التشغيل ترجع للطابور (أو تكتمل إذا كان تقريرها موجوداً)
+  بعد إغلاق الـ terminal الذي بقي يعمل منها
+- الإلغاء: مهمة في الطابور تُلغى مباشرة، ومهمة قيد التشغيل يُغلق الـ terminal الخاص بها
+- بعد خروج الـ terminal يُنتظر ظهور ملف التقرير (.htm / .xml) ثم تُقرأ نتائجه في الـ job
+- مع pool=TesterPool(...) كل مهمة تأخذ أي نسخة portable فارغة بدل terminal_path
+  (عدة اختبارات متوازية، والتقارير تُجمع في مجلد reports/ للـ pool)
+
+    queue = BacktestJobQueue("jobs", prepare=prepare_backtest_job, workers=2)
+    queue.start()
+    job = queue.submit({"terminal_path": ..., "symbol": "EURUSD", ...}, timeout=3600)
+    queue.get(job["id"]); queue.cancel(job["id"]); queue.wait(job["id"], 60)
+
+لا يعتمد على FastAPI - نقاط /jobs في main.py
+=================================================================================
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from tester_pool import close_terminal
+
+logger = logging.getLogger(__name__)
+
+# حالات المهمة
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+REPORT_EXTENSIONS = (".htm", ".html", ".xml")
+
+# عناوين تقرير MT5 -> حقول BacktestResult
+REPORT_FIELDS = {
+    "total_profit": ("Total Net Profit", float),
+    "total_trades": ("Total Trades", int),
+    "profit_factor": ("Profit Factor", float),
+    "expected_payoff": ("Expected Payoff", float),
+    "recovery_factor": ("Recovery Factor", float),
+    "sharpe_ratio": ("Sharpe Ratio", float),
+    "max_drawdown": ("Equity Drawdown Maximal", float),
+}
+
+
+# =================================================================================
+#                          قراءة التقرير
+# =================================================================================
+
+def _read_text(path: str) -> str:
+    """تقارير MT5 بصيغة UTF-16 غالباً"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return data.decode("utf-16", errors="ignore")
+    return data.decode("utf-8", errors="ignore")
+
+
+def _number(text: str) -> Optional[float]:
+    match = re.search(r"-?\d[\d\s]*(?:\.\d+)?", text)
+    return float(re.sub(r"\s", "", match.group(0))) if match else None
+
+
+def parse_report(path: str) -> Dict:
+    """
+    ملخص تقرير Strategy Tester (.htm / .xml)
+
+    المخرجات: total_profit، total_trades، profit_factor ... (فقط الحقول الموجودة)
+    """
+    text = _read_text(path)
+    result = {}
+
+    if path.lower().endswith(".xml"):
+        # تقرير XML: خلايا Excel (عنوان ثم قيمة)
+        cells = []
+        try:
+            root = ET.fromstring(text.lstrip("\ufeff"))
+            cells = [(elem.text or "").strip() for elem in root.iter() if elem.text and elem.text.strip()]
+        except ET.ParseError:
+            pass
+        for field, (label, cast) in REPORT_FIELDS.items():
+            for i, cell in enumerate(cells[:-1]):
+                if cell.rstrip(":") == label:
+                    value = _number(cells[i + 1])
+                    if value is not None:
+                        result[field] = cast(value)
+                    break
+        return result
+
+    for field, (label, cast) in REPORT_FIELDS.items():
+        match = re.search(re.escape(label) + r":?\s*</td>\s*<td[^>]*>(?:<b>)?([^<]+)", text)
+        if match:
+            value = _number(match.group(1))
+            if value is not None:
+                result[field] = cast(value)
+    return result
+
+
+def default_report_dirs(terminal_path: str) -> List[str]:
+    """
+    أماكن ملف التقرير: مجلد الـ terminal (portable) ومجلدات البيانات في APPDATA
+    (Report= في ملف INI مسار نسبي لمجلد البيانات)
+    """
+    dirs = []
+    if terminal_path:
+        dirs.append(os.path.dirname(os.path.abspath(terminal_path)))
+    appdata = os.environ.get("APPDATA", "")
+    terminals = os.path.join(appdata, "MetaQuotes", "Terminal") if appdata else ""
+    if terminals and os.path.isdir(terminals):
+        for folder in os.listdir(terminals):
+            dirs.append(os.path.join(terminals, folder))
+    return dirs
+
+
+def find_report(report_name: str, dirs: List[str]) -> Optional[str]:
+    """أول ملف تقرير موجود لـ report_name"""
+    for base in dirs:
+        for sub in ("", "reports", os.path.join("tester", "reports")):
+            for ext in REPORT_EXTENSIONS:
+                path = os.path.join(base, sub, report_name + ext)
+                if os.path.exists(path):
+                    return path
+    return None
+
+
+def kill_process(process: subprocess.Popen):
+    """إغلاق الـ terminal (مع العمليات التابعة على Windows)"""
+    if process.poll() is not None:
+        return
+    if sys.platform == "win32":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        process.kill()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+# =================================================================================
+#                          الطابور
+# =================================================================================
+
+class BacktestJobQueue:
+    """
+    طابور مهام Backtest بعدد محدود من الـ terminals
+
+    prepare(job) -> (config_file, report_name): يكتب ملف INI للمهمة
+    workers: أقصى عدد terminals تعمل في نفس الوقت
+    report_wait: ثواني انتظار ظهور التقرير بعد خروج الـ terminal
+    pool: TesterPool - المهام توزع على نسخه (workers = عدد النسخ على الأكثر)
+    """
+
+    def __init__(self, root: str, prepare: Callable, workers: int = 2,
+                 poll_interval: float = 2.0, report_wait: float = 120.0,
+                 report_dirs: Callable = default_report_dirs, pool=None):
+        self.root = Path(root)
+        self.prepare = prepare
+        self.pool = pool
+        self.workers = max(1, min(workers, pool.size) if pool is not None else workers)
+        self.poll_interval = poll_interval
+        self.report_wait = report_wait
+        self.report_dirs = report_dirs
+
+        self.jobs: Dict[str, Dict] = {}
+        self.cond = threading.Condition()
+        self.busy_terminals = set()
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.threads: List[threading.Thread] = []
+        self.stopping = False
+        self.seq = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # ---------------------------------------------------------------- التخزين
+
+    def _path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.json"
+
+    def _save(self, job: Dict):
+        """كتابة ذرية (ملف مؤقت ثم os.replace)"""
+        path = self._path(job["id"])
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, path)
+
+    def _load(self):
+        """تحميل المهام المحفوظة - المهام التي كانت قيد التشغيل ترجع للطابور"""
+        for path in self.root.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"تجاهل ملف مهمة تالف {path}: {e}")
+                continue
+            self.jobs[job["id"]] = job
+            self.seq = max(self.seq, job.get("seq", 0))
+
+        with self.cond:
+            for job in self.jobs.values():
+                if job["status"] != RUNNING:
+                    continue
+                self._close_orphan(job)
+                if self._attach_report(job):
+                    logger.info(f"المهمة {job['id']}: التقرير موجود بعد إعادة التشغيل")
+                elif job.get("cancel_requested"):
+                    self._finish(job, CANCELLED, "أُلغيت قبل إعادة تشغيل الخادم")
+                else:
+                    job.update(status=QUEUED, pid=None, started_at=None, stage="queued")
+                    self._save(job)
+                    logger.info(f"المهمة {job['id']}: رجعت للطابور بعد إعادة التشغيل")
+
+    def _close_orphan(self, job: Dict):
+        """
+        terminal مهمة كانت تعمل عند توقف الخادم قد يبقى يعمل: يُغلق قبل إعادة
+        المهمة للطابور حتى لا يعمل terminalان على نفس النسخة / نفس التقرير
+        - نسخة من الـ pool: كل عملية بملف تشغيلها (النسخة خاصة بالـ pool)
+        - terminal_path: العملية المسجلة (pid) فقط - نفس الملف قد يكون terminal المستخدم
+        """
+        instance = self.pool.get(job["instance"]) if self.pool is not None and job.get("instance") else None
+        if instance is not None:
+            closed = close_terminal(instance.executable)
+        elif job.get("pid") and job["request"].get("terminal_path"):
+            closed = close_terminal(job["request"]["terminal_path"], pid=job["pid"])
+        else:
+            return
+        if closed:
+            logger.info(f"المهمة {job['id']}: أُغلق الـ terminal المتبقي من قبل إعادة التشغيل")
+
+    # ---------------------------------------------------------------- الواجهة
+
+    def submit(self, request: Dict, timeout: int = 3600) -> Dict:
+        """إضافة مهمة للطابور - يرجع المهمة (status = queued)"""
+        with self.cond:
+            self.seq += 1
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "seq": self.seq,
+                "status": QUEUED,
+                "stage": "queued",
+                "request": request,
+                "timeout": timeout,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "attempts": 0,
+                "pid": None,
+                "config_file": None,
+                "report_name": None,
+                "report_path": None,
+                "instance": None,
+                "return_code": None,
+                "result": None,
+                "error": None,
+                "cancel_requested": False,
+            }
+            self.jobs[job["id"]] = job
+            self._save(job)
+            self.cond.notify_all()
+        logger.info(f"مهمة جديدة {job['id']}: {request.get('expert_advisor')} {request.get('symbol')}")
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.cond:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, status: Optional[str] = None) -> List[Dict]:
+        with self.cond:
+            jobs = [dict(job) for job in self.jobs.values() if status is None or job["status"] == status]
+        return sorted(jobs, key=lambda job: job["seq"])
+
+    def position(self, job_id: str) -> Optional[int]:
+        """ترتيب المهمة في الطابور (0 = التالية)"""
+        queued = [job["id"] for job in self.list(QUEUED)]
+        return queued.index(job_id) if job_id in queued else None
+
+    def progress(self, job_id: str) -> Optional[Dict]:
+        """
+        تقدم المهمة: المرحلة، الوقت المنقضي، والنسبة التقديرية
+        (من متوسط مدة المهام المكتملة بنفس الرمز / الفريم / النمذجة)
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        elapsed = None
+        if job["started_at"]:
+            end = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.now()
+            elapsed = (end - datetime.fromisoformat(job["started_at"])).total_seconds()
+
+        estimate = None
+        if job["status"] == DONE:
+            estimate = 100.0
+        elif job["status"] == RUNNING and elapsed is not None:
+            request = job["request"]
+            durations = [
+                other["duration_seconds"] for other in self.list(DONE)
+                if other.get("duration_seconds")
+                and all(other["request"].get(k) == request.get(k) for k in ("symbol", "period", "model"))
+            ]
+            if durations:
+                estimate = min(99.0, 100.0 * elapsed / (sum(durations) / len(durations)))
+
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "queue_position": self.position(job_id),
+            "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+            "timeout_seconds": job["timeout"],
+            "estimated_percent": round(estimate, 1) if estimate is not None else None,
+            "report_path": job["report_path"],
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """إلغاء مهمة: من الطابور مباشرة، أو إغلاق الـ terminal إذا كانت تعمل"""
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == QUEUED:
+                self._finish(job, CANCELLED, "أُلغيت قبل التشغيل")
+            elif job["status"] == RUNNING:
+                job["cancel_requested"] = True
+                self._save(job)
+                process = self.processes.get(job_id)
+                if process is not None:
+                    threading.Thread(target=kill_process, args=(process,), daemon=True).start()
+            self.cond.notify_all()
+            return dict(job)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """انتظار انتهاء المهمة (None إذا انتهت المهلة قبلها)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                job = self.jobs.get(job_id)
+                if job is None or job["status"] in FINISHED_STATES:
+                    return dict(job) if job else None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def stats(self) -> Dict:
+        with self.cond:
+            counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+            stats = {"workers": self.workers, "busy_terminals": sorted(self.busy_terminals), **counts}
+        if self.pool is not None:
+            stats["pool"] = self.pool.status()
+        return stats
+
+    # ---------------------------------------------------------------- الـ workers
+
+    def start(self):
+        """تشغيل الـ workers (مرة واحدة عند بدء الخادم)"""
+        if self.threads:
+            return
+        self.stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"backtest-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"طابور الاختبارات: {self.workers} workers، {len(self.list(QUEUED))} مهام في الانتظار")
+
+    def stop(self, timeout: float = 15.0):
+        """
+        إيقاف الخادم: الـ terminals العاملة تُغلق ومهامها ترجع للطابور
+        (تُعاد من البداية عند التشغيل القادم)
+        """
+        with self.cond:
+            self.stopping = True
+            processes = list(self.processes.values())
+            self.cond.notify_all()
+        for process in processes:
+            kill_process(process)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _next_job(self) -> Optional[Dict]:
+        """أقدم مهمة في الطابور وصاحبة terminal غير مشغول (يُستدعى مع القفل)"""
+        if self.pool is not None:
+            queued = [job for job in self.jobs.values() if job["status"] == QUEUED]
+            if queued and self.pool.free_count():
+                return min(queued, key=lambda job: job["seq"])
+            return None
+        for job in sorted(self.jobs.values(), key=lambda job: job["seq"]):
+            if job["status"] == QUEUED and job["request"].get("terminal_path") not in self.busy_terminals:
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                job = None
+                while not self.stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self.cond.wait()
+                if self.stopping:
+                    return
+                instance = self.pool.acquire(job["id"]) if self.pool is not None else None
+                terminal = instance.executable if instance else job["request"].get("terminal_path")
+                self.busy_terminals.add(terminal)
+                job.update(status=RUNNING, stage="starting", started_at=datetime.now().isoformat(),
+                           attempts=job["attempts"] + 1, error=None,
+                           instance=instance.name if instance else None)
+                self._save(job)
+            try:
+                self._run(job, instance)
+            except Exception as e:
+                logger.error(f"المهمة {job['id']}: {e}")
+                with self.cond:
+                    self._finish(job, FAILED, str(e))
+            finally:
+                with self.cond:
+                    self.busy_terminals.discard(terminal)
+                    self.processes.pop(job["id"], None)
+                    if instance is not None:
+                        self.pool.release(instance)
+                    self.cond.notify_all()
+
+    def _run(self, job: Dict, instance=None):
+        """تشغيل terminal واحد للمهمة ومتابعته حتى الخروج ثم انتظار التقرير"""
+        config_file, report_name = self.prepare(job)
+        if instance is not None:
+            command = instance.command(config_file)
+        else:
+            # الأمر: terminal64.exe /config:path_to_config.ini
+            command = [job["request"]["terminal_path"], f"/config:{config_file}"]
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == "win32" else 0
+        )
+        with self.cond:
+            self.processes[job["id"]] = process
+            job.update(stage="testing", pid=process.pid, config_file=config_file, report_name=report_name)
+            self._save(job)
+            abort = job["cancel_requested"] or self.stopping
+        if abort:
+            kill_process(process)
+        logger.info(f"المهمة {job['id']}: بدأ الـ terminal (PID {process.pid})")
+
+        started = time.monotonic()
+        while process.poll() is None:
+            if time.monotonic() - started > job["timeout"]:
+                kill_process(process)
+                with self.cond:
+                    self._finish(job, FAILED, f"انتهت المهلة الزمنية ({job['timeout']} ثانية)")
+                return
+            time.sleep(self.poll_interval)
+
+        with self.cond:
+            job["return_code"] = process.returncode
+            if self.stopping and not job["cancel_requested"]:
+                job.update(status=QUEUED, stage="queued", pid=None, started_at=None)
+                self._save(job)
+                return
+            if job["cancel_requested"]:
+                self._finish(job, CANCELLED, "أُلغيت أثناء التشغيل")
+                return
+            job["stage"] = "waiting_report"
+            self._save(job)
+
+        # التقرير قد يُكتب بعد خروج الـ terminal بقليل
+        deadline = time.monotonic() + self.report_wait
+        while True:
+            with self.cond:
+                if self._attach_report(job):
+                    self._save(job)
+                    self.cond.notify_all()
+                    return
+            if self.stopping:
+                return      # يبقى running: التقرير يُبحث عنه عند التشغيل القادم
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        with self.cond:
+            self._finish(job, FAILED, f"خرج الـ terminal (رمز {process.returncode}) بدون تقرير {report_name}")
+
+    def _attach_report(self, job: Dict) -> bool:
+        """إذا ظهر تقرير المهمة: قراءة نتائجه وإنهاء المهمة"""
+        if not job.get("report_name"):
+            return False
+        if self.pool is not None and job.get("instance"):
+            dirs = self.pool.report_dirs(job["instance"])
+        else:
+            dirs = self.report_dirs(job["request"].get("terminal_path"))
+        path = find_report(job["report_name"], dirs)
+        if path is None:
+            return False
+        try:
+            metrics = parse_report(path)
+            if self.pool is not None:
+                path = self.pool.collect_report(path, job["id"])
+        except OSError as e:
+            logger.warning(f"المهمة {job['id']}: فشل قراءة التقرير {path}: {e}")
+            return False
+        job.update(report_path=path, result={"success": True, **metrics, "report_path": path})
+        self._finish(job, DONE)
+        logger.info(f"المهمة {job['id']}: اكتملت - {path}")
+        return True
+
+    def _finish(self, job: Dict, status: str, error: Optional[str] = None):
+        """حالة نهائية (يُستدعى مع القفل)"""
+        now = datetime.now()
+        job.update(status=status, stage=status, finished_at=now.isoformat(), pid=None)
+        if error:
+            job["error"] = error
+        if job["started_at"]:
+            job["duration_seconds"] = round((now - datetime.fromisoformat(job["started_at"])).total_seconds(), 2)
+        self._save(job)
+        self.cond.notify_all()
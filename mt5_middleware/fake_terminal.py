@@ -0,0 +1,128 @@
+"""
+=================================================================================
+          🧪 Fake terminal64 - بديل MT5 لاختبار الـ scheduler
+=================================================================================
+
+يتصرف مثل terminal64.exe /config:<ini> [/portable] بدون MetaTrader:
+- يقرأ قسم [Tester] من ملف INI
+- ينتظر FAKE_TERMINAL_SECONDS ثانية (مدة "الاختبار")
+- يكتب تقرير HTML بصيغة UTF-16 مثل MT5 في مجلد البيانات (Report=)
+  مجلد البيانات = مجلد الملف مع /portable، وإلا FAKE_TERMINAL_DATA
+- يرفض التشغيل (رمز 2) إذا كانت نسخة أخرى تستخدم نفس مجلد البيانات
+- FAKE_TERMINAL_FAIL_RATE: نسبة التشغيلات التي تخرج بدون تقرير
+- ShutdownTerminal=0: يبقى يعمل حتى يُغلق (مثل MT5)
+
+    python fake_terminal.py /config:C:/path/backtest.ini /portable
+=================================================================================
+"""
+
+import os
+import sys
+import time
+import random
+import zlib
+import configparser
+from pathlib import Path
+
+LOCK_NAME = ".terminal.lock"
+
+
+def _alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        return True          # بدون فحص على Windows: القفل يُحذف عند الخروج العادي
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _take_lock(data_dir: Path) -> bool:
+    """قفل مجلد البيانات (قفل قديم لعملية منتهية يُستبدل)"""
+    lock = data_dir / LOCK_NAME
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                pid = int(lock.read_text() or 0)
+            except (OSError, ValueError):
+                pid = 0
+            if pid and _alive(pid):
+                return False
+            lock.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _read_ini(path: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-16") if data.startswith((b"\xff\xfe", b"\xfe\xff")) else data.decode("utf-8")
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    parser.optionxform = str
+    parser.read_string(text.lstrip("\ufeff"))
+    return dict(parser["Tester"]) if parser.has_section("Tester") else {}
+
+
+def report_html(tester: dict) -> str:
+    """تقرير بنفس عناوين تقرير MT5 (قيم ثابتة لنفس الإعدادات)"""
+    seed = zlib.crc32("|".join(tester.get(k, "") for k in ("Expert", "Symbol", "Period",
+                                                           "FromDate", "ToDate")).encode())
+    rng = random.Random(seed)
+    trades = rng.randint(20, 400)
+    profit = round(rng.uniform(-2000, 4000), 2)
+    rows = {
+        "Total Net Profit": f"{profit:.2f}",
+        "Profit Factor": f"{rng.uniform(0.6, 2.2):.2f}",
+        "Recovery Factor": f"{rng.uniform(-1, 5):.2f}",
+        "Expected Payoff": f"{profit / trades:.2f}",
+        "Sharpe Ratio": f"{rng.uniform(-1, 3):.2f}",
+        "Equity Drawdown Maximal": f"{rng.uniform(100, 3000):.2f} ({rng.uniform(1, 30):.2f}%)",
+        "Total Trades": str(trades),
+    }
+    cells = "".join(f"<tr><td>{label}:</td><td><b>{value}</b></td></tr>" for label, value in rows.items())
+    return (f"<html><head><title>Strategy Tester Report</title></head><body>"
+            f"<div>{tester.get('Expert', '')} {tester.get('Symbol', '')}</div><table>{cells}</table></body></html>")
+
+
+def main(argv) -> int:
+    config = next((a.split(":", 1)[1] for a in argv if a.lower().startswith("/config:")), None)
+    portable = any(a.lower() == "/portable" for a in argv)
+    data_dir = Path(__file__).resolve().parent if portable else Path(os.environ.get("FAKE_TERMINAL_DATA", "."))
+
+    if not _take_lock(data_dir):
+        print(f"terminal already running in {data_dir}", file=sys.stderr)
+        return 2
+    try:
+        tester = _read_ini(config) if config else {}
+        if not tester:
+            # بدون [Tester]: terminal عادي حتى يُغلق
+            while True:
+                time.sleep(1)
+
+        time.sleep(float(os.environ.get("FAKE_TERMINAL_SECONDS", "2")))
+
+        if random.random() >= float(os.environ.get("FAKE_TERMINAL_FAIL_RATE", "0")):
+            report = data_dir / (tester.get("Report") or "report")
+            report = report.with_name(report.name + ".htm")
+            report.parent.mkdir(parents=True, exist_ok=True)
+            tmp = report.with_name(report.name + ".tmp")
+            tmp.write_bytes(report_html(tester).encode("utf-16"))
+            os.replace(tmp, report)
+
+        if tester.get("ShutdownTerminal", "0") != "1":
+            while True:
+                time.sleep(1)
+        return 0
+    finally:
+        (data_dir / LOCK_NAME).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -19,8 +19,7 @@
 
 import os
 import sys
-import time
-import subprocess
+import asyncio
 import configparser
 from datetime import datetime
 from typing import Optional, List
@@ -33,6 +32,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import uvicorn
 
+# نقاط /smc (تحليل SMC من الذاكرة المؤقتة)
+from smc_api import smc_router
+
+# طابور اختبارات Strategy Tester (محفوظ على القرص)
+from backtest_jobs import BacktestJobQueue, FINISHED_STATES, DONE, CANCELLED
+from tester_pool import TesterPool
+
 # ملاحظة: مكتبة MetaTrader5 تعمل فقط على Windows
 # على Linux/Mac سنستخدم محاكاة للاختبار
 try:
@@ -200,6 +206,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# نقاط تحليل SMC: GET /smc/{symbol}/{timeframe} (انظر smc_api.py)
+app.include_router(smc_router)
+
 # =================================================================================
 #                              متغيرات الحالة العامة
 # =================================================================================
@@ -212,6 +221,10 @@ connection_state = {
     "server": None
 }
 
+# مجلد ملفات التكوين (.ini) ومجلد مهام الطابور
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs")
+JOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs")
+
 # =================================================================================
 #                              دوال مساعدة
 # =================================================================================
@@ -240,7 +253,8 @@ def get_timeframe_constant(period: str) -> int:
     return timeframes.get(period.upper(), 60)
 
 
-def generate_ini_config(request: BacktestRequest, config_path: str) -> str:
+def generate_ini_config(request: BacktestRequest, config_path: str,
+                        report_name: Optional[str] = None) -> str:
     """
     إنشاء ملف تكوين .ini لتشغيل Strategy Tester
     
@@ -268,11 +282,14 @@ def generate_ini_config(request: BacktestRequest, config_path: str) -> str:
     المعاملات:
         request: طلب الاختبار الخلفي
         config_path: مسار حفظ ملف التكوين
+        report_name: اسم ملف التقرير (افتراضي: backtest_report_<الوقت>)
     
     المخرجات:
         المسار الكامل لملف التكوين المُنشأ
     """
     
+    report_name = report_name or f"backtest_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
     # إنشاء محتوى ملف التكوين
     config_content = f"""
 ; ============================================================
@@ -315,7 +332,7 @@ Leverage={request.leverage}
 Currency=USD
 
 ; === إعدادات التقرير ===
-Report=backtest_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}
+Report={report_name}
 ReplaceReport=1
 ShutdownTerminal=1
 
@@ -373,6 +390,94 @@ def find_experts(mql5_path: str) -> List[dict]:
     return experts
 
 
+def prepare_backtest_job(job: dict):
+    """
+    تجهيز مهمة من الطابور للتشغيل: ملف .ini خاص بها واسم تقرير فريد
+
+    المخرجات:
+        (مسار ملف التكوين، اسم التقرير)
+    """
+    request = BacktestRequest(**job["request"])
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    report_name = f"backtest_report_{job['id']}"
+    config_path = generate_ini_config(
+        request, os.path.join(CONFIG_DIR, f"backtest_config_{job['id']}.ini"), report_name
+    )
+    return config_path, report_name
+
+
+# نسخ MT5 portable للاختبارات المتوازية (اختياري):
+#   MT5_TESTER_POOL=<مجلد النسخ>  MT5_TESTER_POOL_SIZE=4
+#   MT5_TESTER_SOURCE=<مجلد تثبيت MT5>  MT5_TESTER_DATA=<مجلد البيانات فيه MQL5/Experts>
+# بدونها كل مهمة تستخدم terminal_path من الطلب (اختبار واحد لكل terminal)
+tester_pool = None
+if os.environ.get("MT5_TESTER_POOL"):
+    tester_pool = TesterPool(
+        os.environ["MT5_TESTER_POOL"],
+        size=int(os.environ.get("MT5_TESTER_POOL_SIZE", "2")),
+        source=os.environ.get("MT5_TESTER_SOURCE"),
+        data_source=os.environ.get("MT5_TESTER_DATA")
+    )
+
+# الطابور: أقصى عدد terminals تعمل معاً من MT5_BACKTEST_WORKERS (أو عدد نسخ الـ pool)
+job_queue = BacktestJobQueue(
+    JOBS_DIR,
+    prepare=prepare_backtest_job,
+    workers=int(os.environ.get("MT5_BACKTEST_WORKERS",
+                               str(tester_pool.size) if tester_pool else "2")),
+    pool=tester_pool
+)
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    """تشغيل workers الطابور (المهام المحفوظة تُستكمل) - مع إنشاء نسخ الـ pool الناقصة"""
+    if tester_pool is not None:
+        if tester_pool.source:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, tester_pool.provision)
+            except Exception as e:
+                logger.error(f"فشل تجهيز نسخ الـ tester pool: {e}")
+        elif not tester_pool.instances:
+            tester_pool.error = f"لا توجد نسخ في {tester_pool.root} و MT5_TESTER_SOURCE غير محدد"
+        if not tester_pool.instances:
+            logger.error(f"الـ tester pool بدون نسخ ({tester_pool.error}) - طلبات الاختبار ترجع 503")
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """إغلاق الـ terminals العاملة - مهامها ترجع للطابور"""
+    await asyncio.get_running_loop().run_in_executor(None, job_queue.stop)
+
+
+def get_job_or_404(job_id: str) -> dict:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"المهمة غير موجودة: {job_id}"
+        )
+    return job
+
+
+def check_terminal_path(terminal_path: str):
+    if tester_pool is not None:
+        # المهام تعمل على نسخ الـ pool - بدون نسخ لن تبدأ أي مهمة
+        if not tester_pool.instances:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"الـ tester pool بدون نسخ جاهزة ({tester_pool.error}). "
+                       f"جهّزها بـ POST /tester_pool/provision"
+            )
+        return
+    if not os.path.exists(terminal_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"ملف terminal64.exe غير موجود: {terminal_path}"
+        )
+
+
 # =================================================================================
 #                              نقاط النهاية (API Endpoints)
 # =================================================================================
@@ -393,8 +498,14 @@ async def root():
             "connect": "POST /connect",
             "disconnect": "POST /disconnect",
             "run_backtest": "POST /run_backtest",
+            "jobs": "GET /jobs",
+            "job_status": "GET /jobs/{job_id}",
+            "job_progress": "GET /jobs/{job_id}/progress",
+            "cancel_job": "POST /jobs/{job_id}/cancel",
+            "tester_pool": "GET /tester_pool",
             "list_experts": "GET /list_experts",
-            "account_info": "GET /account_info"
+            "account_info": "GET /account_info",
+            "smc": "GET /smc/{symbol}/{timeframe}"
         }
     }
 
@@ -558,16 +669,17 @@ async def disconnect_mt5():
 #                              اختبار الاستراتيجيات (Strategy Tester)
 # =================================================================================
 
-@app.post("/run_backtest", tags=["اختبار الاستراتيجيات"])
-async def run_backtest(request: BacktestRequest):
+@app.post("/run_backtest", tags=["اختبار الاستراتيجيات"], status_code=status.HTTP_202_ACCEPTED)
+async def run_backtest(request: BacktestRequest, timeout: int = 3600):
     """
     ## تشغيل اختبار استراتيجية (Backtest)
     
     ### كيف يعمل:
-    1. يتم إنشاء ملف تكوين .ini يحتوي على جميع إعدادات الاختبار
-    2. يتم تشغيل MT5 من سطر الأوامر مع معامل /config
-    3. MT5 يقرأ الإعدادات ويبدأ الاختبار تلقائياً
-    4. بعد انتهاء الاختبار، يتم إغلاق MT5 (حسب الإعداد)
+    1. الطلب يُضاف لطابور الاختبارات ويرجع `job_id` فوراً
+    2. عندما يفرغ worker: يتم إنشاء ملف تكوين .ini يحتوي على جميع إعدادات الاختبار
+    3. يتم تشغيل MT5 من سطر الأوامر مع معامل /config
+    4. MT5 يقرأ الإعدادات ويبدأ الاختبار تلقائياً، ثم يُغلق بعد الانتهاء
+    5. نتائج التقرير تُضاف للمهمة: `GET /jobs/{job_id}`
     
     ### أنواع النمذجة (Model):
     - **0 - كل تيك**: أعلى دقة، يستخدم كل حركة سعرية (بطيء)
@@ -583,77 +695,33 @@ async def run_backtest(request: BacktestRequest):
     ### ملاحظة مهمة:
     تأكد من أن المستشار الخبير موجود في مجلد MQL5/Experts
     """
-    
-    # التحقق من وجود ملف MT5
-    if not os.path.exists(request.terminal_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"ملف terminal64.exe غير موجود: {request.terminal_path}"
-        )
-    
-    try:
-        # إنشاء مجلد للتكوينات إذا لم يكن موجوداً
-        config_dir = os.path.join(os.path.dirname(__file__), "configs")
-        os.makedirs(config_dir, exist_ok=True)
-        
-        # إنشاء اسم فريد لملف التكوين
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        config_filename = f"backtest_config_{timestamp}.ini"
-        config_path = os.path.join(config_dir, config_filename)
-        
-        # إنشاء ملف التكوين
-        full_config_path = generate_ini_config(request, config_path)
-        
-        logger.info(f"بدء اختبار الاستراتيجية: {request.expert_advisor}")
-        logger.info(f"الرمز: {request.symbol}, الفترة: {request.period}")
-        logger.info(f"من: {request.from_date} إلى: {request.to_date}")
-        
-        # تشغيل MT5 مع ملف التكوين
-        # الأمر: terminal64.exe /config:path_to_config.ini
-        command = [
-            request.terminal_path,
-            f"/config:{full_config_path}"
-        ]
-        
-        logger.info(f"تنفيذ الأمر: {' '.join(command)}")
-        
-        # تشغيل العملية
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0
-        )
-        
-        # انتظار انتهاء العملية (مع مهلة زمنية)
-        # ملاحظة: في الإنتاج، قد تحتاج لتعديل هذا حسب طول الاختبار
-        timeout_seconds = 3600  # ساعة واحدة كحد أقصى
-        
-        return {
-            "success": True,
-            "message": "تم بدء اختبار الاستراتيجية",
-            "details": {
-                "expert_advisor": request.expert_advisor,
-                "symbol": request.symbol,
-                "period": request.period,
-                "from_date": request.from_date,
-                "to_date": request.to_date,
-                "model": request.model,
-                "optimization": request.optimization,
-                "deposit": request.deposit,
-                "leverage": request.leverage
-            },
-            "config_file": full_config_path,
-            "process_id": process.pid,
-            "note": "الاختبار يعمل في الخلفية. راجع MT5 للنتائج."
-        }
-        
-    except Exception as e:
-        logger.error(f"خطأ في تشغيل الاختبار: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"فشل تشغيل الاختبار: {str(e)}"
-        )
+    check_terminal_path(request.terminal_path)
+
+    job = job_queue.submit(request.model_dump(), timeout)
+    logger.info(f"اختبار في الطابور {job['id']}: {request.expert_advisor} {request.symbol} {request.period}")
+    logger.info(f"من: {request.from_date} إلى: {request.to_date}")
+
+    return {
+        "success": True,
+        "message": "تمت إضافة الاختبار للطابور",
+        "job_id": job["id"],
+        "status": job["status"],
+        "queue_position": job_queue.position(job["id"]),
+        "details": {
+            "expert_advisor": request.expert_advisor,
+            "symbol": request.symbol,
+            "period": request.period,
+            "from_date": request.from_date,
+            "to_date": request.to_date,
+            "model": request.model,
+            "optimization": request.optimization,
+            "deposit": request.deposit,
+            "leverage": request.leverage
+        },
+        "status_url": f"/jobs/{job['id']}",
+        "progress_url": f"/jobs/{job['id']}/progress",
+        "note": "الاختبار في الطابور. تابع الحالة من status_url."
+    }
 
 
 @app.post("/run_backtest_sync", tags=["اختبار الاستراتيجيات"])
@@ -662,67 +730,162 @@ async def run_backtest_sync(request: BacktestRequest, timeout: int = 3600):
     ## تشغيل اختبار استراتيجية (متزامن)
     
     نفس الوظيفة السابقة لكن ينتظر حتى انتهاء الاختبار.
+    الاختبار يمر بنفس الطابور، والانتظار لا يوقف الخادم (باقي الطلبات تعمل).
     
     ### المعاملات الإضافية:
-    - **timeout**: المهلة الزمنية بالثواني (افتراضي: 3600 = ساعة)
+    - **timeout**: أقصى مدة تشغيل الاختبار بالثواني (افتراضي: 3600 = ساعة)، من بدء تشغيله لا من دخوله الطابور
     
     ### تحذير:
-    هذا الطلب قد يستغرق وقتاً طويلاً حسب إعدادات الاختبار.
+    هذا الطلب قد يستغرق وقتاً طويلاً حسب إعدادات الاختبار وطول الطابور.
+    الأفضل: POST /run_backtest ثم GET /jobs/{job_id}
     """
-    
-    if not os.path.exists(request.terminal_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"ملف terminal64.exe غير موجود: {request.terminal_path}"
-        )
-    
-    try:
-        # إنشاء ملف التكوين
-        config_dir = os.path.join(os.path.dirname(__file__), "configs")
-        os.makedirs(config_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        config_path = os.path.join(config_dir, f"backtest_config_{timestamp}.ini")
-        full_config_path = generate_ini_config(request, config_path)
-        
-        # تشغيل MT5
-        command = [request.terminal_path, f"/config:{full_config_path}"]
-        
-        start_time = time.time()
-        
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0
-        )
-        
-        # انتظار انتهاء العملية
-        try:
-            stdout, stderr = process.communicate(timeout=timeout)
-            end_time = time.time()
-            
-            return {
-                "success": True,
-                "message": "اكتمل اختبار الاستراتيجية",
-                "duration_seconds": round(end_time - start_time, 2),
-                "return_code": process.returncode,
-                "config_file": full_config_path
-            }
-            
-        except subprocess.TimeoutExpired:
-            process.kill()
+    check_terminal_path(request.terminal_path)
+
+    job = job_queue.submit(request.model_dump(), timeout)
+    # الـ worker يغلق الـ terminal بعد timeout ثم ينتظر التقرير report_wait
+    limit = timeout + job_queue.report_wait + 2 * job_queue.poll_interval
+
+    # انتظار بدون حجز الـ event loop
+    while job["status"] not in FINISHED_STATES:
+        # المهلة تُحسب من بدء التشغيل: وقت الانتظار في الطابور لا يُحسب
+        running = (0 if not job["started_at"] else
+                   (datetime.now() - datetime.fromisoformat(job["started_at"])).total_seconds())
+        if running > limit:
+            job_queue.cancel(job["id"])
             raise HTTPException(
                 status_code=status.HTTP_408_REQUEST_TIMEOUT,
-                detail=f"انتهت المهلة الزمنية ({timeout} ثانية). تم إيقاف الاختبار."
+                detail=f"انتهت المهلة الزمنية ({timeout} ثانية). تم إلغاء المهمة {job['id']}."
             )
-            
-    except Exception as e:
-        logger.error(f"خطأ في الاختبار المتزامن: {str(e)}")
+        await asyncio.sleep(1)
+        job = job_queue.get(job["id"])
+
+    if job["status"] != DONE:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"فشل الاختبار: {str(e)}"
+            detail=f"فشل الاختبار ({job['status']}): {job['error']}"
+        )
+
+    return {
+        "success": True,
+        "message": "اكتمل اختبار الاستراتيجية",
+        "job_id": job["id"],
+        "duration_seconds": job.get("duration_seconds"),
+        "return_code": job["return_code"],
+        "config_file": job["config_file"],
+        "report_path": job["report_path"],
+        "result": job["result"]
+    }
+
+
+# =================================================================================
+#                              طابور الاختبارات (Jobs)
+# =================================================================================
+
+@app.post("/jobs", tags=["طابور الاختبارات"], status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: BacktestRequest, timeout: int = 3600):
+    """
+    ## إضافة اختبار للطابور
+
+    يرجع المهمة فوراً (`status = queued`). عدد الاختبارات المتزامنة محدود
+    بـ `MT5_BACKTEST_WORKERS`، ونفس terminal64.exe لا يشغّل اختبارين معاً.
+    """
+    check_terminal_path(request.terminal_path)
+    job = job_queue.submit(request.model_dump(), timeout)
+    return {**job, "queue_position": job_queue.position(job["id"])}
+
+
+@app.get("/jobs", tags=["طابور الاختبارات"])
+async def list_jobs(job_status: Optional[str] = None):
+    """
+    ## قائمة المهام
+
+    - **job_status**: queued | running | done | failed | cancelled (اختياري)
+    """
+    return {
+        "success": True,
+        "stats": job_queue.stats(),
+        "jobs": job_queue.list(job_status)
+    }
+
+
+@app.get("/jobs/{job_id}", tags=["طابور الاختبارات"])
+async def get_job(job_id: str):
+    """
+    ## حالة مهمة
+
+    عند ظهور التقرير: `status = done` و `result` فيه نتائج الاختبار
+    (total_profit، total_trades، profit_factor ...).
+    """
+    return get_job_or_404(job_id)
+
+
+@app.get("/jobs/{job_id}/progress", tags=["طابور الاختبارات"])
+async def get_job_progress(job_id: str):
+    """
+    ## تقدم مهمة
+
+    المرحلة (queued / starting / testing / waiting_report / ...)، ترتيبها في الطابور،
+    الوقت المنقضي، ونسبة تقديرية من مدة الاختبارات السابقة المشابهة.
+    """
+    get_job_or_404(job_id)
+    return job_queue.progress(job_id)
+
+
+@app.post("/jobs/{job_id}/cancel", tags=["طابور الاختبارات"])
+async def cancel_job(job_id: str):
+    """
+    ## إلغاء مهمة
+
+    مهمة في الطابور تُلغى مباشرة، ومهمة قيد التشغيل يُغلق الـ terminal الخاص بها.
+    """
+    job = get_job_or_404(job_id)
+    if job["status"] in FINISHED_STATES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"المهمة انتهت بالفعل ({job['status']})"
         )
+    job = job_queue.cancel(job_id)
+    return {
+        "success": True,
+        "message": "تم الإلغاء" if job["status"] == CANCELLED else "جاري إغلاق الـ terminal",
+        "job": job
+    }
+
+
+@app.get("/tester_pool", tags=["طابور الاختبارات"])
+async def get_tester_pool():
+    """
+    ## نسخ MT5 الـ portable
+
+    كل نسخة: مجلدها، هل هي مشغولة (job_id)، عدد الاختبارات ووقت التشغيل.
+    `ready = false` و `error`: لا توجد نسخ (فشل التجهيز) - طلبات الاختبار ترجع 503.
+    يتطلب `MT5_TESTER_POOL`.
+    """
+    if tester_pool is None:
+        return {"success": False, "message": "الـ tester pool غير مفعل (MT5_TESTER_POOL)"}
+    return {"success": True, **tester_pool.status()}
+
+
+@app.post("/tester_pool/provision", tags=["طابور الاختبارات"])
+async def provision_tester_pool(refresh: bool = False):
+    """
+    ## تجهيز نسخ الـ pool
+
+    ينسخ مجلد التثبيت للنسخ الناقصة. **refresh**: نسخ الـ EAs و config من جديد
+    لكل النسخ (بعد ترجمة EA جديد).
+    """
+    if tester_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="الـ tester pool غير مفعل (MT5_TESTER_POOL)"
+        )
+    try:
+        instances = await asyncio.get_running_loop().run_in_executor(None, tester_pool.provision, refresh)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    with job_queue.cond:
+        job_queue.cond.notify_all()     # نسخ جديدة -> workers ينتظرون تبدأ
+    return {"success": True, "instances": instances}
 
 
 # =================================================================================
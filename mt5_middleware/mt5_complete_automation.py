@@ -679,6 +679,46 @@ ShutdownTerminal=0
         except Exception as e:
             return BacktestResult(success=False, error=str(e))
     
+    def run_native_backtest(self, symbol: str = "EURUSD", timeframe: str = "H1",
+                            from_date: str = "2024.01.01", to_date: str = "2024.12.31",
+                            deposit: float = 10000, **params) -> BacktestResult:
+        """
+        Backtest سريع لإشارات SMC بدون تشغيل terminal64.exe (smc_python/smc_backtest)
+
+        للفرز المبدئي قبل أي اختبار على Strategy Tester
+        params: entries, sl_points, tp_points, sl_atr, tp_atr, spread, commission, lots ...
+        """
+        log_step(f"Backtest سريع (بدون Terminal): {symbol} {timeframe}")
+
+        smc_dir = str(Path(__file__).resolve().parent.parent / "smc_python")
+        if smc_dir not in sys.path:
+            sys.path.insert(0, smc_dir)
+        try:
+            from data_providers import TIMEFRAMES, get_default_provider
+            from smc_backtest import backtest_rates
+        except ImportError as e:
+            return BacktestResult(success=False, error=f"محرك SMC غير متوفر: {e}")
+
+        if timeframe.upper() not in TIMEFRAMES:
+            return BacktestResult(success=False, error=f"فريم غير معروف: {timeframe}")
+
+        provider = get_default_provider()
+        if not provider.connect():
+            return BacktestResult(success=False, error=f"فشل الاتصال بـ {provider.name}: {provider.last_error()}")
+        try:
+            rates = provider.get_rates_range(
+                symbol, TIMEFRAMES[timeframe.upper()],
+                datetime.strptime(from_date, "%Y.%m.%d"), datetime.strptime(to_date, "%Y.%m.%d")
+            )
+        finally:
+            provider.shutdown()
+        if rates is None or len(rates) == 0:
+            return BacktestResult(success=False, error=f"لا توجد بيانات: {provider.last_error()}")
+
+        report = backtest_rates(rates, deposit=deposit, symbol=symbol, timeframe=timeframe.upper(), **params)
+        log_success(f"{report.total_trades} صفقة، الربح {report.total_profit:.2f} في {report.elapsed_ms:.0f} ms")
+        return BacktestResult(**report.metrics())
+
     def read_backtest_results(self, expert_name: str) -> BacktestResult:
         """قراءة نتائج Backtest"""
         log_step("قراءة نتائج Backtest...")
@@ -53,6 +53,9 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
+# نقاط /smc (تحليل SMC من الذاكرة المؤقتة)
+from smc_api import smc_router
+
 # =================================================================================
 #                          تحميل المكتبات حسب النظام
 # =================================================================================
@@ -928,6 +931,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# نقاط تحليل SMC: GET /smc/{symbol}/{timeframe} (انظر smc_api.py)
+app.include_router(smc_router)
+
 # المتحكمات
 strategy_tester = None
 trading_controller = TradingController()
@@ -961,7 +967,8 @@ async def root():
             "connect": "POST /connect",
             "backtest": "POST /backtest",
             "trade": "POST /trade",
-            "ui_controls": "GET /ui/controls"
+            "ui_controls": "GET /ui/controls",
+            "smc": "GET /smc/{symbol}/{timeframe}"
         }
     }
 
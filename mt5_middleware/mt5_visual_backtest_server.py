@@ -74,6 +74,9 @@ try:
 except ImportError:
     print(f"{Colors.YELLOW}⚠️ MetaTrader5 غير متوفر{Colors.END}")
 
+# إغلاق terminal واحد بمساره (نسخ الـ tester pool تبقى تعمل)
+from tester_pool import close_terminal
+
 # استيراد نظام الأتمتة
 try:
     from mt5_complete_automation import MT5CompleteAutomation, EAGenerator
@@ -538,11 +541,14 @@ async def start_backtest(
     
     هذا الـ endpoint يستخدم subprocess.Popen بدلاً من run
     فيشغل MT5 في الخلفية ويرجع فوراً
+
+    يُغلق فقط الـ terminal الخاص بهذا الخادم (controller.terminal_path)،
+    أي نسخ أخرى (مثل نسخ الـ tester pool في main.py) تبقى تعمل
     """
     try:
-        # 1. إغلاق MT5 أولاً
-        subprocess.run('taskkill /IM terminal64.exe /F', shell=True, capture_output=True)
-        time.sleep(1)
+        # 1. إغلاق نسخة MT5 هذه فقط أولاً
+        if controller.terminal_path and close_terminal(controller.terminal_path):
+            time.sleep(1)
         
         # 2. تحويل الإطار الزمني
         tf_map = {
@@ -618,8 +624,9 @@ async def restart_mt5(api_key: str = Depends(verify_api_key)):
     🔄 إعادة تشغيل MT5
     """
     try:
-        # إغلاق
-        subprocess.run('taskkill /IM terminal64.exe /F', shell=True, capture_output=True)
+        # إغلاق (نسخة MT5 هذه فقط)
+        if controller.terminal_path:
+            close_terminal(controller.terminal_path)
         time.sleep(2)
         
         # فتح
@@ -38,6 +38,9 @@ from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 import uvicorn
 
+# نقاط /smc (تحليل SMC من الذاكرة المؤقتة)
+from smc_api import smc_router
+
 # استيراد نظام الأتمتة
 try:
     from mt5_complete_automation import MT5CompleteAutomation, BacktestResult
@@ -166,6 +169,10 @@ async def verify_api_key(api_key: str = Depends(api_key_header)):
     return api_key
 
 
+# نقاط تحليل SMC: GET /smc/{symbol}/{timeframe} - بنفس مفتاح API
+app.include_router(smc_router, dependencies=[Depends(verify_api_key)])
+
+
 # =================================================================================
 #                          نقاط النهاية
 # =================================================================================
@@ -184,7 +191,8 @@ async def root():
             "compile_ea": "POST /compile-ea/{name}",
             "backtest": "POST /backtest",
             "full_automation": "POST /full-automation ⭐",
-            "strategies": "GET /strategies"
+            "strategies": "GET /strategies",
+            "smc": "GET /smc/{symbol}/{timeframe}"
         },
         "security": "أضف X-API-Key في الـ Header",
         "docs": "/docs"
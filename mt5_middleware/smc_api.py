@@ -0,0 +1,102 @@
+"""
+=================================================================================
+          📡 SMC API Router
+          نقاط /smc المشتركة بين تطبيقات FastAPI
+=================================================================================
+
+    app.include_router(smc_router)                       # main.py, mt5_ultimate_control.py
+    app.include_router(smc_router, dependencies=[...])   # remote_control_server.py (API key)
+
+GET /smc                               -> العناصر الموجودة في الذاكرة + إحصائيات
+GET /smc/{symbol}/{timeframe}          -> النتيجة كاملة (seq + ETag)
+GET /smc/{symbol}/{timeframe}?since=N  -> التغييرات بعد seq N فقط
+
+العميل يرسل If-None-Match بآخر ETag: 304 بدون body إذا لم تُغلق شمعة غيرت النتيجة.
+=================================================================================
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query, Response, status
+
+from smc_cache import smc_cache, SMCUnavailable, SMCSymbolNotFound, SMC_AVAILABLE, SMC_IMPORT_ERROR, TIMEFRAMES, PROFILES
+
+
+smc_router = APIRouter(prefix="/smc", tags=["📈 SMC"])
+
+
+def _check_available():
+    if not SMC_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"محرك SMC غير متوفر: {SMC_IMPORT_ERROR}"
+        )
+
+
+@smc_router.get("")
+def smc_cache_status():
+    """
+    ## حالة ذاكرة SMC
+
+    كل رمز/فريم محلل: seq، آخر شمعة، عدد الطلبات (hits) وعدد مرات التحليل (analyses).
+    """
+    return smc_cache.stats()
+
+
+@smc_router.get("/{symbol}/{timeframe}")
+def get_smc_signals(
+    symbol: str,
+    timeframe: str,
+    profile: str = Query("v3", description="v1 | v2 | v3"),
+    swing_strength: Optional[int] = Query(None, ge=1, le=50),
+    max_ob: Optional[int] = Query(None, ge=1, description="V3 فقط"),
+    since: Optional[int] = Query(None, ge=0, description="رجّع التغييرات بعد هذا seq فقط"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    ## إشارات SMC لرمز وفريم
+
+    النتيجة تُحسب مرة واحدة وتبقى في الذاكرة حتى تُغلق شمعة جديدة.
+
+    ### الكاش:
+    - الرد يحمل `ETag` و `seq`
+    - أرسل `If-None-Match: <ETag>` -> **304** إذا لم يتغير شيء
+    - `?since=<seq>` -> `deltas` (added / changed / removed) بدل النتيجة كاملة،
+      أو `reset: true` + النتيجة كاملة إذا كان seq قديماً جداً
+    """
+    _check_available()
+    symbol = symbol.upper()
+    timeframe = timeframe.upper()
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"فريم غير معروف: {timeframe} (المتاح: {', '.join(TIMEFRAMES)})"
+        )
+    if profile not in PROFILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"profile غير معروف: {profile} (المتاح: {', '.join(PROFILES)})"
+        )
+    if max_ob is not None and profile != "v3":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_ob متاح فقط مع profile=v3"
+        )
+
+    try:
+        entry = smc_cache.get(symbol, timeframe, profile,
+                              {"swing_strength": swing_strength, "max_ob": max_ob})
+    except SMCSymbolNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SMCUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    etag, seq, body = smc_cache.response(entry, if_none_match, since)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-SMC-Seq": str(seq),
+    }
+    if body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,318 @@
+"""
+=================================================================================
+          🧠 SMC Analysis Cache
+          ذاكرة مؤقتة لنتائج تحليل SMC داخل الخادم
+=================================================================================
+
+كل (رمز، فريم، profile) يُحلَّل مرة واحدة ويبقى في الذاكرة:
+- التحليل يُعاد فقط عند إغلاق شمعة جديدة (V3: on_bar للشمعة الجديدة فقط)
+- كل تغيير يرفع رقم `seq` ويُحفظ كـ delta (نفس صيغة smc_export)
+- ETag ثابت طالما لم يتغير `seq` -> If-None-Match يرجع 304
+- مئات العملاء يسألون كل ثانية = طلب شمعتين فقط من المزود كل `check_interval`
+
+يستخدم محرك smc_python (Subscription من smc_daemon) بدون تشغيل أي سكريبت.
+=================================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+
+# محرك SMC موجود في ../smc_python
+SMC_PYTHON_DIR = Path(__file__).resolve().parent.parent / "smc_python"
+if str(SMC_PYTHON_DIR) not in sys.path:
+    sys.path.insert(0, str(SMC_PYTHON_DIR))
+
+try:
+    from data_providers import TIMEFRAMES, get_default_provider
+    from smc_core import PROFILES, signal_payload
+    from smc_daemon import Subscription
+    from smc_export import IDENTITY, stable_object, diff_collections
+    SMC_AVAILABLE = True
+    SMC_IMPORT_ERROR = None
+except ImportError as e:
+    SMC_AVAILABLE = False
+    SMC_IMPORT_ERROR = str(e)
+    TIMEFRAMES, PROFILES = {}, {}
+    print(f"⚠️ تحذير: محرك SMC غير متوفر ({e}) - نقاط /smc معطلة")
+
+
+class SMCUnavailable(Exception):
+    """المزود لا يرجع بيانات (غير متصل / لا توجد شموع) -> 503"""
+
+
+class SMCSymbolNotFound(SMCUnavailable):
+    """الرمز غير موجود عند الوسيط -> 404"""
+
+
+# =================================================================================
+#                          عنصر واحد في الذاكرة
+# =================================================================================
+
+class SMCCacheEntry:
+    """
+    نتيجة تحليل رمز / فريم واحد
+
+    seq: يزيد فقط عندما يتغير object في النتيجة
+    body: الـ JSON الكامل جاهز كـ bytes (لا يُعاد التحويل لكل عميل)
+    deltas: آخر التغييرات (seq, delta) لطلبات ?since=
+    """
+
+    def __init__(self, symbol, timeframe, profile, params, history_bars, keep_deltas):
+        self.subscription = Subscription(symbol, timeframe, profile, params, history_bars)
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.etag = None
+        self.body = b""
+        self.generated_at = None
+        self.state = None
+        self.deltas = deque(maxlen=keep_deltas)
+        self.checked_at = 0.0
+
+        # إحصائيات
+        self.hits = 0
+        self.refreshes = 0
+        self.analyses = 0
+        self.last_analysis_ms = None
+
+    @property
+    def last_bar_time(self):
+        return self.subscription.last_time
+
+    def info(self):
+        sub = self.subscription
+        return {
+            "symbol": sub.symbol,
+            "timeframe": sub.tf_name,
+            "profile": sub.profile,
+            "params": sub.params,
+            "seq": self.seq,
+            "etag": self.etag,
+            "last_bar_time": self.last_bar_time,
+            "bars": sub.bars_processed,
+            "generated_at": self.generated_at,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "analyses": self.analyses,
+            "last_analysis_ms": self.last_analysis_ms,
+            "deltas_kept": len(self.deltas),
+        }
+
+
+# =================================================================================
+#                          الذاكرة المؤقتة
+# =================================================================================
+
+class SMCCache:
+    """
+    cache = SMCCache()
+    entry = cache.get("EURUSD", "H1")          # تحليل أول مرة، ثم من الذاكرة
+    body = cache.since(entry, 12)              # التغييرات بعد seq 12
+
+    check_interval: أقل مدة (ثواني) بين سؤالين للمزود عن نفس الرمز/الفريم
+    max_entries: أقصى عدد عناصر (الأقدم استخداماً يُحذف أولاً)
+    """
+
+    def __init__(self, provider=None, history_bars=5000, check_interval=1.0,
+                 max_entries=64, keep_deltas=500):
+        self.provider = provider
+        self.history_bars = history_bars
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.keep_deltas = keep_deltas
+        # يتغير مع كل تشغيل للخادم: ETag قديم من تشغيل سابق لا يطابق أبداً
+        self.instance = format(int(time.time() * 1000), "x")
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()           # قاموس العناصر
+        self._provider_lock = threading.Lock()  # مكتبة MT5 لا تُستدعى من عدة threads معاً
+
+    # -----------------------------------------------------------------------------
+    #   المزود
+    # -----------------------------------------------------------------------------
+
+    def _ensure_connected(self):
+        """
+        يستخدم اتصال التطبيق الموجود (/connect) إن وُجد، ويتصل فقط إذا لم يكن هناك اتصال
+        لا shutdown أبداً: mt5.shutdown() يغلق اتصال العملية كلها
+        """
+        if self.provider is None:
+            self.provider = get_default_provider()
+        if self.provider.is_connected():
+            return
+        if not self.provider.connect():
+            raise SMCUnavailable(f"فشل الاتصال بـ {self.provider.name}: {self.provider.last_error()}")
+
+    def _rates(self, method, symbol, *args):
+        """
+        استدعاء المزود لرمز واحد
+        None -> إعادة المحاولة مرة بعد اتصال / اختيار الرمز، وإلا 404 (رمز غير معروف) أو 503
+        """
+        with self._provider_lock:
+            self._ensure_connected()
+            rates = getattr(self.provider, method)(symbol, *args)
+            if rates is not None:
+                return rates
+
+            if not self.provider.is_connected():
+                self._ensure_connected()     # انقطع الاتصال
+            elif not self.provider.select_symbol(symbol):
+                raise SMCSymbolNotFound(f"رمز غير معروف: {symbol} ({self.provider.last_error()})")
+            rates = getattr(self.provider, method)(symbol, *args)
+            if rates is None:
+                raise SMCUnavailable(f"لا توجد بيانات لـ {symbol}: {self.provider.last_error()}")
+            return rates
+
+    # -----------------------------------------------------------------------------
+    #   العناصر
+    # -----------------------------------------------------------------------------
+
+    def get(self, symbol, timeframe, profile="v3", params=None):
+        """العنصر بعد التأكد أنه محدث حتى آخر شمعة مغلقة"""
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        key = (symbol, timeframe, profile, tuple(sorted(params.items())))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = SMCCacheEntry(symbol, timeframe, profile, params,
+                                      self.history_bars, self.keep_deltas)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+
+        # قفل لكل عنصر: عدة عملاء على نفس الرمز = تحليل واحد فقط
+        with entry.lock:
+            entry.hits += 1
+            if time.monotonic() - entry.checked_at >= self.check_interval:
+                self._refresh(entry)
+                entry.checked_at = time.monotonic()
+        return entry
+
+    def _refresh(self, entry):
+        """شموع جديدة مغلقة -> تحديث التحليل (لا شيء إذا لم تُغلق شمعة)"""
+        sub = entry.subscription
+        entry.refreshes += 1
+        if sub.last_time is None:
+            rates = self._rates("get_rates", sub.symbol, sub.timeframe, sub.history_bars + 1)
+            if len(rates) < 2:
+                raise SMCUnavailable(f"لا توجد شموع لـ {sub.symbol} {sub.tf_name}")
+            started = time.perf_counter()
+            sub.warmup(rates[:-1], self.provider)  # آخر شمعة لم تُغلق بعد
+            self._publish(entry, started)
+            return
+
+        rates = self._rates("get_rates", sub.symbol, sub.timeframe, 2)
+        if len(rates) < 2 or int(rates["time"][-2]) <= sub.last_time:
+            return
+        if int(rates["time"][-2]) - sub.last_time > sub.seconds:
+            # أكثر من شمعة أُغلقت منذ آخر فحص
+            rates = self._rates("get_rates_range", sub.symbol, sub.timeframe,
+                                sub.last_time + 1, int(rates["time"][-1]))
+        closed = rates[:-1]
+        closed = closed[closed["time"] > sub.last_time]
+        if len(closed):
+            started = time.perf_counter()
+            sub.feed(closed)
+            self._publish(entry, started)
+
+    def _publish(self, entry, started):
+        """نتيجة جديدة -> seq / ETag / delta (فقط إذا تغير شيء فعلاً)"""
+        sub = entry.subscription
+        payload = signal_payload(sub.profile, sub.symbol, sub.tf_name, sub.current_result())
+        payload = json.loads(json.dumps(payload, default=str))
+        state = {name: [stable_object(obj) for obj in payload[name]]
+                 for name in IDENTITY if name in payload}
+        entry.analyses += 1
+        entry.last_analysis_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        if entry.state is not None:
+            added, changed, removed = diff_collections(entry.state, state)
+            if not (added or changed or removed):
+                return
+            entry.deltas.append({
+                "seq": entry.seq + 1,
+                "base_seq": entry.seq,
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+            })
+
+        entry.seq += 1
+        entry.state = state
+        entry.generated_at = payload.get("generated_at")
+        entry.etag = f'"smc-{self.instance}-{entry.seq}"'
+        entry.body = json.dumps({"seq": entry.seq, "last_bar_time": sub.last_time, **payload},
+                                separators=(",", ":")).encode("utf-8")
+
+    # -----------------------------------------------------------------------------
+    #   الردود
+    # -----------------------------------------------------------------------------
+
+    @staticmethod
+    def not_modified(entry, if_none_match):
+        """If-None-Match يطابق ETag الحالي (يقبل قائمة، W/ و *)"""
+        if not if_none_match or entry.etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+    @staticmethod
+    def since(entry, since_seq):
+        """
+        التغييرات بعد since_seq (تُطبق بـ smc_export.apply_delta بالترتيب)
+        since_seq قديم جداً أو من تشغيل سابق -> reset + النتيجة كاملة
+        """
+        oldest = entry.deltas[0]["base_seq"] if entry.deltas else entry.seq
+        if since_seq == entry.seq or (oldest <= since_seq < entry.seq):
+            return json.dumps({
+                "seq": entry.seq,
+                "base_seq": since_seq,
+                "last_bar_time": entry.last_bar_time,
+                "deltas": [d for d in entry.deltas if d["seq"] > since_seq],
+            }, separators=(",", ":")).encode("utf-8")
+        full = json.loads(entry.body)
+        return json.dumps({"reset": True, "base_seq": since_seq, **full},
+                          separators=(",", ":")).encode("utf-8")
+
+    def response(self, entry, if_none_match=None, since_seq=None):
+        """
+        (etag, seq, body) مقروءة معاً تحت قفل العنصر
+        body = None -> 304 Not Modified
+        """
+        with entry.lock:
+            if self.not_modified(entry, if_none_match):
+                return entry.etag, entry.seq, None
+            body = entry.body if since_seq is None else self.since(entry, since_seq)
+            return entry.etag, entry.seq, body
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        with self._provider_lock:
+            connected = self.provider is not None and self.provider.is_connected()
+        return {
+            "available": SMC_AVAILABLE,
+            "provider": getattr(self.provider, "name", None),
+            "connected": connected,
+            "check_interval": self.check_interval,
+            "entries": [entry.info() for entry in entries],
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# ذاكرة واحدة مشتركة لكل تطبيقات FastAPI في نفس العملية
+smc_cache = SMCCache(
+    history_bars=int(os.environ.get("SMC_CACHE_BARS", "5000")),
+    check_interval=float(os.environ.get("SMC_CACHE_CHECK_SECONDS", "1.0")),
+)
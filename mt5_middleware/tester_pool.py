@@ -0,0 +1,383 @@
+"""
+=================================================================================
+          🏊 MT5 Tester Pool
+          عدة نسخ Portable من MT5 لتشغيل اختبارات متوازية
+=================================================================================
+
+terminal64.exe واحد = مجلد بيانات واحد = اختبار واحد في نفس الوقت.
+الحل: نسخ مجلد التثبيت إلى عدة مجلدات وتشغيل كل نسخة بـ /portable
+(مجلد البيانات = مجلد النسخة نفسها):
+
+    tester_pool/
+        instance_01/terminal64.exe  (+ MQL5/Experts و config من مجلد البيانات الأصلي)
+        instance_02/...
+        reports/                    <- تقارير كل المهام تُجمع هنا
+
+- provision(): ينشئ النسخ الناقصة فقط (وينسخ الـ EAs من جديد مع refresh=True)
+- acquire() / release(): كل مهمة INI تأخذ نسخة فارغة، ولا نسختين لنفس المهمة
+- collect_report(): ينقل تقرير المهمة من مجلد النسخة إلى reports/
+- مع BacktestJobQueue(pool=...) الطابور يوزع المهام على النسخ (main.py: MT5_TESTER_POOL)
+
+اختبار تحميل على Linux بدون MT5 (fake_terminal.py مكان terminal64.exe):
+
+    python tester_pool.py --stand-in --size 4 --jobs 40
+=================================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MARKER = "instance.json"
+
+# ما لا يُنسخ من مجلد التثبيت (سجلات وكاش الـ tester لكل نسخة)
+COPY_IGNORE = shutil.ignore_patterns("logs", "Tester", "*.log", MARKER)
+
+# ما يُنسخ من مجلد البيانات الأصلي (الـ EAs وبيانات الحساب)
+DATA_DIRS = (
+    os.path.join("MQL5", "Experts"),
+    os.path.join("MQL5", "Include"),
+    os.path.join("MQL5", "Indicators"),
+    os.path.join("MQL5", "Libraries"),
+    "config",
+)
+
+
+def launch_command(executable: str, *args: str) -> List[str]:
+    """الأمر لتشغيل الـ terminal (ملف .py مثل البديل fake_terminal.py يُشغّل بـ Python)"""
+    if executable.lower().endswith(".py"):
+        return [sys.executable, executable, *args]
+    return [executable, *args]
+
+
+def close_terminal(executable: str, pid: Optional[int] = None) -> bool:
+    """
+    إغلاق نسخة terminal معينة فقط (حسب مسار الملف)
+    بدل taskkill /IM terminal64.exe الذي يغلق كل النسخ بما فيها نسخ الـ pool
+
+    pid: العملية المسجلة فقط، وبشرط أنها ما زالت `executable` (رقم الـ PID يُعاد استخدامه)
+    """
+    executable = os.path.abspath(executable)
+    if sys.platform == "win32":
+        path = executable.replace("'", "''")
+        source = f"Get-Process -Id {int(pid)} -ErrorAction SilentlyContinue" if pid else "Get-Process"
+        script = (f"{source} | Where-Object {{ $_.Path -eq '{path}' }} "
+                  f"| Stop-Process -Force")
+        result = subprocess.run(["powershell", "-NoProfile", "-Command", script],
+                                capture_output=True, text=True)
+        return result.returncode == 0
+
+    # Linux (الـ terminal البديل): العمليات التي ملف تشغيلها أو السكريبت هو `executable`
+    killed = False
+    if pid:
+        pids = [str(int(pid))]
+    else:
+        pids = os.listdir("/proc") if os.path.isdir("/proc") else []
+    for pid in pids:
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().split(b"\0")
+            if executable.encode() in argv[:2]:
+                os.kill(int(pid), signal.SIGKILL)
+                killed = True
+        except (OSError, ProcessLookupError):
+            continue
+    return killed
+
+
+# =================================================================================
+#                          نسخة واحدة
+# =================================================================================
+
+class TesterInstance:
+    """نسخة portable واحدة: مجلدها، ملف التشغيل، والمهمة الحالية"""
+
+    def __init__(self, name: str, path: Path, executable: str):
+        self.name = name
+        self.path = path
+        self.executable = str(path / executable)
+        self.job_id: Optional[str] = None
+        self.runs = 0
+        self.busy_seconds = 0.0
+        self.acquired_at: Optional[float] = None
+
+    def command(self, config_file: str) -> List[str]:
+        """terminal64.exe /config:<ini> /portable"""
+        return launch_command(self.executable, f"/config:{config_file}", "/portable")
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "busy": self.job_id is not None,
+            "job_id": self.job_id,
+            "runs": self.runs,
+            "busy_seconds": round(self.busy_seconds, 1),
+        }
+
+
+# =================================================================================
+#                          الـ Pool
+# =================================================================================
+
+class TesterPool:
+    """
+    مجموعة نسخ portable من MT5
+
+    source: مجلد تثبيت MT5 (فيه terminal64.exe)
+    data_source: مجلد البيانات الأصلي (MQL5/Experts، config) - اختياري
+    """
+
+    def __init__(self, root: str, size: int = 2, source: Optional[str] = None,
+                 data_source: Optional[str] = None, executable: str = "terminal64.exe"):
+        self.root = Path(root)
+        self.size = max(1, size)
+        self.source = source
+        self.data_source = data_source
+        self.executable = executable
+        self.reports_dir = self.root / "reports"
+        self.lock = threading.Lock()
+        self.instances: List[TesterInstance] = []
+        self.error: Optional[str] = None   # سبب فشل آخر provision() (يظهر في status)
+        self._discover()
+
+    def _instance_path(self, index: int) -> Path:
+        return self.root / f"instance_{index + 1:02d}"
+
+    def _discover(self):
+        """النسخ الموجودة على القرص (بعد إعادة تشغيل الخادم لا يُعاد النسخ)"""
+        self.instances = [
+            TesterInstance(path.name, path, self.executable)
+            for path in (self._instance_path(i) for i in range(self.size))
+            if (path / self.executable).exists()
+        ]
+
+    def provision(self, refresh: bool = False) -> List[Dict]:
+        """
+        إنشاء النسخ الناقصة حتى `size`
+
+        refresh: نسخ الـ EAs و config من جديد لكل النسخ (بعد ترجمة EA جديد)
+        """
+        if not self.source or not (Path(self.source) / self.executable).exists():
+            self.error = f"مجلد التثبيت لا يحتوي {self.executable}: {self.source}"
+            raise FileNotFoundError(self.error)
+
+        created = []
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.reports_dir.mkdir(exist_ok=True)
+            for i in range(self.size):
+                path = self._instance_path(i)
+                fresh = not (path / self.executable).exists()
+                if fresh:
+                    shutil.copytree(self.source, path, ignore=COPY_IGNORE, dirs_exist_ok=True)
+                if fresh or refresh:
+                    self._sync_data(path)
+                    with open(path / MARKER, "w", encoding="utf-8") as f:
+                        json.dump({"source": str(self.source), "data_source": self.data_source,
+                                   "provisioned_at": datetime.now().isoformat()}, f, indent=2)
+                    created.append(path.name)
+        except OSError as e:
+            self.error = f"فشل نسخ {self.source}: {e}"
+            raise
+        self.error = None
+
+        with self.lock:
+            busy = {inst.name: inst for inst in self.instances}
+            self._discover()
+            # النسخ المشغولة تحتفظ بحالتها
+            self.instances = [busy.get(inst.name, inst) for inst in self.instances]
+        return [{**inst.status(), "provisioned": inst.name in created} for inst in self.instances]
+
+    def _sync_data(self, path: Path):
+        """نسخ الـ EAs وبيانات الحساب من مجلد البيانات الأصلي"""
+        if not self.data_source:
+            return
+        for sub in DATA_DIRS:
+            src = Path(self.data_source) / sub
+            if src.exists():
+                shutil.copytree(src, path / sub, dirs_exist_ok=True)
+
+    # ---------------------------------------------------------------- التوزيع
+
+    def free_count(self) -> int:
+        with self.lock:
+            return sum(1 for inst in self.instances if inst.job_id is None)
+
+    def acquire(self, job_id: str) -> Optional[TesterInstance]:
+        """أقل نسخة فارغة استخداماً (None إذا كانت كلها مشغولة)"""
+        with self.lock:
+            free = [inst for inst in self.instances if inst.job_id is None]
+            if not free:
+                return None
+            inst = min(free, key=lambda inst: inst.runs)
+            inst.job_id = job_id
+            inst.acquired_at = time.monotonic()
+            return inst
+
+    def release(self, inst: TesterInstance):
+        with self.lock:
+            if inst.acquired_at is not None:
+                inst.busy_seconds += time.monotonic() - inst.acquired_at
+            inst.job_id = None
+            inst.acquired_at = None
+            inst.runs += 1
+
+    def get(self, name: str) -> Optional[TesterInstance]:
+        for inst in self.instances:
+            if inst.name == name:
+                return inst
+        return None
+
+    def report_dirs(self, name: Optional[str]) -> List[str]:
+        """مكان تقرير مهمة نسختها `name` (Report= نسبي لمجلد النسخة مع /portable)"""
+        inst = self.get(name) if name else None
+        return [str(inst.path)] if inst else [str(self.reports_dir)]
+
+    def collect_report(self, path: str, job_id: str) -> str:
+        """نقل التقرير (وصور الرسوم بجانبه) إلى reports/<job_id>/"""
+        src = Path(path)
+        dest = self.reports_dir / job_id
+        dest.mkdir(parents=True, exist_ok=True)
+        for item in src.parent.glob(src.stem + "*"):
+            if item.is_file():
+                shutil.move(str(item), str(dest / item.name))
+        return str(dest / src.name)
+
+    def status(self) -> Dict:
+        with self.lock:
+            instances = [inst.status() for inst in self.instances]
+        return {
+            "root": str(self.root),
+            "size": self.size,
+            "provisioned": len(instances),
+            "free": sum(1 for inst in instances if not inst["busy"]),
+            "ready": bool(instances),
+            "error": self.error,
+            "instances": instances,
+        }
+
+
+# =================================================================================
+#                          اختبار التحميل (Linux / CI)
+# =================================================================================
+
+def stand_in_source(root: str) -> str:
+    """مجلد تثبيت وهمي فيه fake_terminal.py مكان terminal64.exe"""
+    source = Path(root) / "stand_in_install"
+    (source / "MQL5" / "Experts").mkdir(parents=True, exist_ok=True)
+    shutil.copy2(Path(__file__).with_name("fake_terminal.py"), source / "terminal64.py")
+    return str(source)
+
+
+def load_test(root: str, size: int = 4, jobs: int = 40, seconds: float = 0.5, fail_rate: float = 0.0,
+              poll_interval: float = 0.1) -> Dict:
+    """
+    تشغيل `jobs` مهمة على `size` نسخة بديلة عبر BacktestJobQueue
+
+    يتحقق أن كل مهمة اكتملت بتقرير وأن النسخة لم تشغّل مهمتين معاً
+    (fake_terminal.py يرفض التشغيل إذا كان مجلد البيانات مستخدماً)
+    """
+    from backtest_jobs import BacktestJobQueue
+
+    os.environ["FAKE_TERMINAL_SECONDS"] = str(seconds)
+    os.environ["FAKE_TERMINAL_FAIL_RATE"] = str(fail_rate)
+    pool = TesterPool(os.path.join(root, "pool"), size, stand_in_source(root), executable="terminal64.py")
+    pool.provision()
+    config_dir = Path(root) / "configs"
+    config_dir.mkdir(parents=True, exist_ok=True)
+
+    def prepare(job):
+        report_name = f"backtest_report_{job['id']}"
+        config_file = config_dir / f"backtest_config_{job['id']}.ini"
+        request = job["request"]
+        config_file.write_text(
+            f"[Tester]\nExpert={request['expert_advisor']}\nSymbol={request['symbol']}\n"
+            f"Period={request['period']}\nReport={report_name}\nShutdownTerminal=1\n",
+            encoding="utf-8"
+        )
+        return str(config_file), report_name
+
+    queue = BacktestJobQueue(os.path.join(root, "jobs"), prepare, workers=size, pool=pool,
+                             poll_interval=poll_interval, report_wait=2 * poll_interval + 1)
+    queue.start()
+    started = time.perf_counter()
+    ids = [queue.submit({"terminal_path": "pool", "expert_advisor": "SMC_Strategy_v2_Pro",
+                         "symbol": f"SYM{i % 7}", "period": "H1"}, timeout=60)["id"]
+           for i in range(jobs)]
+    results = [queue.wait(job_id, 120) for job_id in ids]
+    wall = time.perf_counter() - started
+    queue.stop()
+
+    done = [job for job in results if job and job["status"] == "done"]
+    return {
+        "instances": size,
+        "jobs": jobs,
+        "done": len(done),
+        "failed": sum(1 for job in results if job and job["status"] == "failed"),
+        "seconds": wall,
+        "jobs_per_second": jobs / wall if wall else 0.0,
+        "ideal_seconds": seconds * jobs / size,
+        "reports_collected": sum(1 for job in done if job["report_path"].startswith(str(pool.reports_dir))),
+        "pool": pool.status(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MT5 portable tester pool")
+    parser.add_argument("--root", default="tester_pool")
+    parser.add_argument("--size", type=int, default=2)
+    parser.add_argument("--source", default=None, help="مجلد تثبيت MT5 (فيه terminal64.exe)")
+    parser.add_argument("--data-source", default=None, help="مجلد البيانات (MQL5/Experts، config)")
+    parser.add_argument("--refresh", action="store_true", help="نسخ الـ EAs من جديد لكل النسخ")
+    parser.add_argument("--stand-in", action="store_true", help="اختبار تحميل بالـ terminal البديل")
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=0.5, help="مدة كل اختبار بديل")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="نسبة الاختبارات البديلة بدون تقرير")
+    args = parser.parse_args()
+
+    if args.stand_in:
+        import tempfile
+        import logging
+        logging.basicConfig(level=logging.WARNING)
+        root = tempfile.mkdtemp(prefix="tester_pool_")
+        try:
+            print("=" * 60)
+            print(f"   Tester pool load test: {args.jobs} jobs x {args.seconds}s on {args.size} instances")
+            print("=" * 60)
+            result = load_test(root, args.size, args.jobs, args.seconds, args.fail_rate)
+            print(f"   - Done: {result['done']}/{result['jobs']} (failed {result['failed']})")
+            print(f"   - Reports collected: {result['reports_collected']}")
+            print(f"   - Wall: {result['seconds']:.2f}s (ideal {result['ideal_seconds']:.2f}s), "
+                  f"{result['jobs_per_second']:.1f} jobs/s")
+            for inst in result["pool"]["instances"]:
+                print(f"   - {inst['name']}: {inst['runs']} runs, busy {inst['busy_seconds']:.1f}s")
+            print("=" * 60)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return 0 if result["done"] + result["failed"] == result["jobs"] else 1
+
+    pool = TesterPool(args.root, args.size, args.source, args.data_source)
+    try:
+        instances = pool.provision(args.refresh)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    for inst in instances:
+        print(f"[OK] {inst['name']}: {inst['path']}" + (" (جديد)" if inst["provisioned"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+=============================================================================
+    Bar Store - local on-disk OHLC history per symbol / timeframe
+    - raw MT5 rates records, appended in place (memory-mappable)
+    - top-up fetches only bars newer than the last stored one
+    - reads are zero-copy np.memmap slices
+
+    <root>/<SYMBOL>/<TF>.bin        (RATES_DTYPE records, oldest first)
+    <root>/<SYMBOL>/<TF>.head.json  (oldest bar the broker has - no deeper fetches)
+=============================================================================
+"""
+
+import gc
+import os
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from data_providers import RATES_DTYPE, get_default_provider
+from smc_export import _replace, write_json_atomic
+
+
+class BarStore:
+    """
+    Persistent bar history, one writer per file
+
+    store = BarStore("bar_store")
+    store.update("EURUSD", "H1", TIMEFRAMES['H1'])   # first run: full fetch, then top-ups
+    rates = store.read("EURUSD", "H1", 500)          # last 500 bars, no copy
+    """
+
+    def __init__(self, root="bar_store", initial_bars=100_000):
+        self.root = root
+        self.initial_bars = initial_bars
+
+    def path(self, symbol, tf_name):
+        return os.path.join(self.root, symbol, f"{tf_name}.bin")
+
+    def count(self, symbol, tf_name):
+        """Number of stored bars"""
+        path = self.path(symbol, tf_name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // RATES_DTYPE.itemsize
+
+    def _record_time(self, symbol, tf_name, index):
+        with open(self.path(symbol, tf_name), 'rb') as f:
+            f.seek(index * RATES_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(RATES_DTYPE.itemsize), dtype=RATES_DTYPE)['time'][0])
+
+    def first_time(self, symbol, tf_name):
+        """Epoch time of the first stored bar (None = empty)"""
+        return self._record_time(symbol, tf_name, 0) if self.count(symbol, tf_name) else None
+
+    def last_time(self, symbol, tf_name):
+        """Epoch time of the last stored bar (None = empty)"""
+        n = self.count(symbol, tf_name)
+        return self._record_time(symbol, tf_name, n - 1) if n else None
+
+    # -------------------------------------------------------------------------
+    #   Start of the broker's history
+    # -------------------------------------------------------------------------
+
+    def _head_path(self, symbol, tf_name):
+        return os.path.join(self.root, symbol, f"{tf_name}.head.json")
+
+    def _mark_head(self, symbol, tf_name, requested):
+        """The stored history starts where the broker's does (for up to `requested` bars)"""
+        write_json_atomic(self._head_path(symbol, tf_name),
+                          {'first_time': self.first_time(symbol, tf_name), 'requested': requested})
+
+    def has_full_history(self, symbol, tf_name, bars):
+        """True when a fetch of `bars` bars already came back short - no deeper history"""
+        try:
+            with open(self._head_path(symbol, tf_name), encoding='utf-8') as f:
+                head = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return head['first_time'] == self.first_time(symbol, tf_name) and bars <= head['requested']
+
+    def read(self, symbol, tf_name, bars=None):
+        """
+        Last `bars` bars (all when None) as a read-only memmap view
+        Read again after update(): a deeper history rewrites the whole file
+        """
+        n = self.count(symbol, tf_name)
+        if n == 0:
+            return np.empty(0, dtype=RATES_DTYPE)
+        data = np.memmap(self.path(symbol, tf_name), dtype=RATES_DTYPE, mode='r', shape=(n,))
+        return data if bars is None else data[max(0, n - bars):]
+
+    def append(self, symbol, tf_name, rates):
+        """
+        Merge freshly fetched rates into the store
+        - bars older than the last stored bar are ignored
+        - a bar with the same time replaces the stored one (it was still forming)
+        Returns the number of new bars
+        """
+        rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+        path = self.path(symbol, tf_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        last = self.last_time(symbol, tf_name)
+        n = self.count(symbol, tf_name)
+        if last is not None:
+            rates = rates[rates['time'] >= last]
+        if len(rates) == 0:
+            return 0
+
+        # Overwrite in place instead of truncating - safe while readers hold memmaps
+        with open(path, 'r+b' if n else 'wb') as f:
+            if last is not None and rates['time'][0] == last:
+                f.seek((n - 1) * RATES_DTYPE.itemsize)
+                f.write(rates[:1].tobytes())
+                rates = rates[1:]
+            f.seek(0, os.SEEK_END)
+            f.write(rates.tobytes())
+        return len(rates)
+
+    def update(self, symbol, tf_name, timeframe, bars=None, provider=None):
+        """
+        Bring the store up to date from the data provider (connected)
+        Empty store (or fewer than `bars` stored): copy_rates_from_pos
+        Otherwise: copy_rates_range from the last stored bar to now
+        A short copy_rates_from_pos marks the start of the broker's history,
+        later calls only top up instead of fetching everything again
+        Returns the number of new bars, or None on error
+        """
+        provider = provider or get_default_provider()
+        last = self.last_time(symbol, tf_name)
+        deepen = (bars is not None and self.count(symbol, tf_name) < bars
+                  and not self.has_full_history(symbol, tf_name, bars))
+        requested = bars or self.initial_bars
+        if last is None or deepen:
+            rates = provider.get_rates(symbol, timeframe, requested)
+        else:
+            date_from = datetime.fromtimestamp(last, tz=timezone.utc)
+            date_to = datetime.now(tz=timezone.utc) + timedelta(days=1)
+            rates = provider.get_rates_range(symbol, timeframe, date_from, date_to)
+
+        if rates is None:
+            print(f"[ERROR] {symbol} {tf_name}: failed to get data: {provider.last_error()}")
+            return None
+        if last is None or deepen:
+            rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+            first = self.first_time(symbol, tf_name)
+            older = len(rates) > 0 and (first is None or rates['time'][0] < first)
+            if older and first is not None:
+                added = self._rewrite(symbol, tf_name, rates)
+            else:
+                added = self.append(symbol, tf_name, rates)  # nothing older: top-up only
+            if len(rates) < requested or not older:
+                self._mark_head(symbol, tf_name, requested)
+            return added
+        return self.append(symbol, tf_name, rates)
+
+    def _rewrite(self, symbol, tf_name, rates):
+        """Replace the file with a longer history (older bars + stored + new)"""
+        stored = np.array(self.read(symbol, tf_name))
+        older = rates[rates['time'] < stored['time'][0]]
+        newer = rates[rates['time'] >= stored['time'][-1]]
+        if len(newer) and newer['time'][0] == stored['time'][-1]:
+            stored = stored[:-1]  # last stored bar was still forming
+            added = len(older) + len(newer) - 1
+        else:
+            added = len(older) + len(newer)
+
+        path = self.path(symbol, tf_name)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            for part in (older, stored, newer):
+                f.write(part.tobytes())
+
+        # Windows refuses to replace a mapped file: drop unreferenced memmaps first
+        gc.collect()
+        try:
+            _replace(tmp, path)
+        except PermissionError:
+            # Still mapped by a live reader - overwrite in place (the file only grows)
+            with open(tmp, 'rb') as src, open(path, 'r+b') as dst:
+                dst.write(src.read())
+            os.remove(tmp)
+        return added
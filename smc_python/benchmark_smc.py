@@ -0,0 +1,411 @@
+"""
+=============================================================================
+    SMC Benchmarks - timing of the SMC pipeline on synthetic data
+    - per-stage wall time and peak memory for every analyzer version
+    - 500 .. 1,000,000 bars, several swing strengths
+    - scaling exponent per stage, JSON baselines for regression checks
+
+    python benchmark_smc.py                              # full suite
+    python benchmark_smc.py --quick                      # up to 100k bars
+    python benchmark_smc.py --save benchmark_baseline.json
+    python benchmark_smc.py --compare benchmark_baseline.json
+    python benchmark_smc.py --kernels                    # kernel / memory checks
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from data_providers import TIMEFRAMES, SyntheticProvider
+from smc_kernels import find_swing_indices, find_first_breaks
+from smc_core import (
+    SMCCore, run_v1, export_collections, signal_payload, fair_value_gaps, equal_levels,
+    v1_swings, v1_bos, v1_choch, v1_order_blocks,
+    v2_swings, v2_structure_breaks, v2_order_blocks,
+    v3_swings, v3_bos_choch, v3_order_blocks,
+)
+
+
+DEFAULT_SIZES = (500, 2_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (500, 2_000, 10_000, 100_000)
+DEFAULT_STRENGTHS = (3, 5)
+PROFILE_NAMES = ('v1', 'v2', 'v3')
+
+
+def synthetic_ohlc(bars, seed=42):
+    """Random-walk highs/lows/closes (no MT5 needed)"""
+    rng = np.random.default_rng(seed)
+    closes = 1.1 + np.cumsum(rng.normal(0, 0.0005, bars))
+    highs = closes + np.abs(rng.normal(0, 0.0003, bars))
+    lows = closes - np.abs(rng.normal(0, 0.0003, bars))
+    return highs, lows, closes
+
+
+def synthetic_core(bars, seed=42):
+    """SMCCore over synthetic H1 bars"""
+    highs, lows, closes = synthetic_ohlc(bars, seed)
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    times = (1_600_000_000 + 3600 * np.arange(bars)).astype('datetime64[s]')
+    return SMCCore(times, opens, np.maximum(highs, opens), np.minimum(lows, opens), closes)
+
+
+def _traced(build):
+    """(result, bytes still allocated by build())"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def scaling_exponent(sizes, seconds):
+    """Slope of log(time) vs log(bars): ~1.0 = linear, ~2.0 = quadratic"""
+    return float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+
+
+def bench_breaks(sizes=(10_000, 100_000, 1_000_000), strength=3, repeat=3):
+    """Single-pass BOS/CHoCH break detection over growing histories"""
+    print("=" * 60)
+    print("   Break detector (find_first_breaks)")
+    print("=" * 60)
+
+    timings = []
+    for bars in sizes:
+        highs, lows, closes = synthetic_ohlc(bars)
+        high_idx, low_idx = find_swing_indices(highs, lows, strength)
+
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            find_first_breaks(closes, high_idx, highs[high_idx], above=True)
+            find_first_breaks(closes, low_idx, lows[low_idx], above=False)
+            best = min(best, time.perf_counter() - start)
+
+        timings.append(best)
+        levels = len(high_idx) + len(low_idx)
+        print(f"   {bars:>9,} bars  {levels:>7,} levels  {best * 1000:9.1f} ms")
+
+    print(f"   Scaling exponent: {scaling_exponent(sizes, timings):.2f}")
+    return timings
+
+
+def bench_memory(bars=200_000, strength=3):
+    """Memory held by V1 results: slot records vs the old dict-per-object layout"""
+    print("=" * 60)
+    print("   Result memory (V1 profile)")
+    print("=" * 60)
+
+    core = synthetic_core(bars)
+    core.swing_sequence(strength)  # cached intermediates are not counted
+
+    records, record_bytes = _traced(lambda: run_v1(core, strength))
+    _, dict_bytes = _traced(lambda: export_collections('v1', records))
+
+    objects = sum(len(v) for v in records.values())
+    print(f"   {bars:,} bars, {objects:,} objects")
+    print(f"   dicts + str times : {dict_bytes / 1e6:8.2f} MB ({dict_bytes / objects:.0f} B/object)")
+    print(f"   slot records      : {record_bytes / 1e6:8.2f} MB ({record_bytes / objects:.0f} B/object)")
+    return dict_bytes, record_bytes
+
+
+# =============================================================================
+#                         Pipeline suite (per stage)
+# =============================================================================
+
+def _export(profile, result):
+    """export_to_json without the disk: same payload and json.dump settings"""
+    with open(os.devnull, 'w', encoding='utf-8') as f:
+        json.dump(signal_payload(profile, "BENCH", "H1", result), f, indent=2, default=str)
+
+
+def pipeline_stages(profile, strength):
+    """
+    [(stage name, fn(core, state))] for one analyzer version
+    Stage names follow the analyzer methods; each fn stores its output in state
+    """
+    fvgs = ('find_fair_value_gaps', lambda core, st: st.update(fvgs=fair_value_gaps(core)))
+    levels = ('find_equal_levels', lambda core, st: st.update(
+        equal_levels=equal_levels(core, st['swings'])))
+
+    if profile == 'v1':
+        return [
+            ('find_swing_points', lambda core, st: st.update(swings=v1_swings(core, strength))),
+            ('find_bos', lambda core, st: st.update(bos=v1_bos(core, st['swings']))),
+            ('find_choch', lambda core, st: st.update(choch=v1_choch(core, st['swings']))),
+            ('find_order_blocks', lambda core, st: st.update(
+                order_blocks=v1_order_blocks(core, st['bos'] + st['choch']))),
+            fvgs,
+            levels,
+            ('export_to_json', lambda core, st: _export('v1', st)),
+        ]
+
+    if profile == 'v2':
+        def structure(core, st):
+            breaks = v2_structure_breaks(core, st['swings'])
+            st.update(breaks=breaks,
+                      bos=[b for b in breaks if 'BOS' in b.type],
+                      choch=[b for b in breaks if 'CHoCH' in b.type])
+        return [
+            ('find_swing_points', lambda core, st: st.update(swings=v2_swings(core, strength))),
+            ('find_structure_breaks', structure),
+            ('find_order_blocks', lambda core, st: st.update(
+                order_blocks=v2_order_blocks(core, st['breaks']))),
+            fvgs,
+            levels,
+            ('export_to_json', lambda core, st: _export('v2', {
+                k: st[k] for k in ('swings', 'bos', 'choch', 'order_blocks', 'fvgs',
+                                   'equal_levels')})),
+        ]
+
+    def bos_choch(core, st):
+        st['bos'], st['choch'] = v3_bos_choch(core, st['swings'])
+    return [
+        ('find_swing_points', lambda core, st: st.update(swings=v3_swings(core, strength))),
+        ('find_bos_choch', bos_choch),
+        ('find_order_blocks', lambda core, st: st.update(
+            order_blocks=v3_order_blocks(core, st['bos'], st['choch']))),
+        fvgs,
+        levels,
+        ('export_to_json', lambda core, st: _export('v3', st)),
+    ]
+
+
+def run_pipeline(rates, profile, strength, trace=False):
+    """
+    One full run on a fresh core (no cached swings)
+    Returns {stage: seconds} and, with trace=True, {stage: peak bytes}
+    """
+    stages = [('load', None)] + pipeline_stages(profile, strength)
+    seconds, peaks = {}, {}
+    state, core = {}, None
+
+    if trace:
+        tracemalloc.start()
+    try:
+        for name, fn in stages:
+            if trace:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            if fn is None:
+                core = SMCCore.from_rates(rates)
+            else:
+                fn(core, state)
+            seconds[name] = time.perf_counter() - start
+            if trace:
+                peaks[name] = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+    counts = {k: len(state[k]) for k in ('swings', 'bos', 'choch', 'order_blocks', 'fvgs',
+                                         'equal_levels')}
+    return seconds, peaks, counts
+
+
+def _fit_exponent(sizes, seconds):
+    """Scaling exponent on the sizes where fixed overhead no longer dominates"""
+    pairs = [(n, t) for n, t in zip(sizes, seconds) if n >= 10_000 and t > 0]
+    if len(pairs) < 2:
+        pairs = [(n, t) for n, t in zip(sizes, seconds) if t > 0]
+    if len(pairs) < 2:
+        return None
+    return round(scaling_exponent(*zip(*pairs)), 3)
+
+
+def run_suite(sizes=DEFAULT_SIZES, strengths=DEFAULT_STRENGTHS, profiles=PROFILE_NAMES,
+              repeat=3, memory=True, seed=42):
+    """
+    Full matrix: profile x strength x size
+    Wall time = best of `repeat` runs (median kept for baseline checks);
+    peak memory from one extra traced run
+    """
+    # Same history for every size list, so baselines stay comparable
+    provider = SyntheticProvider(bars=max(max(sizes), DEFAULT_SIZES[-1]), seed=seed)
+    history = provider.get_rates("EURUSD", TIMEFRAMES['H1'], max(sizes))
+
+    results = {}
+    for profile in profiles:
+        for strength in strengths:
+            key = f"{profile}/s{strength}"
+            print("=" * 60)
+            print(f"   {profile.upper()} pipeline, swing strength {strength}")
+            print("=" * 60)
+
+            runs = {}
+            for bars in sizes:
+                rates = np.ascontiguousarray(history[-bars:])
+                timings = []
+                for _ in range(max(1, repeat if bars < 1_000_000 else 1)):
+                    seconds, _, counts = run_pipeline(rates, profile, strength)
+                    timings.append(seconds)
+                best = {k: min(t[k] for t in timings) for k in timings[0]}
+                median = {k: float(np.median([t[k] for t in timings])) for k in timings[0]}
+                peaks = run_pipeline(rates, profile, strength, trace=True)[1] if memory else {}
+
+                runs[bars] = {
+                    'seconds': {k: round(v, 6) for k, v in best.items()},
+                    'median_seconds': {k: round(v, 6) for k, v in median.items()},
+                    'peak_bytes': peaks,
+                    'total_seconds': round(sum(best.values()), 6),
+                    'counts': counts,
+                }
+                peak = max(peaks.values()) / 1e6 if peaks else 0.0
+                print(f"   {bars:>9,} bars  {sum(best.values()) * 1000:10.1f} ms  "
+                      f"peak {peak:8.1f} MB  "
+                      + ' '.join(f"{k}={v}" for k, v in counts.items()))
+
+            stage_names = list(runs[sizes[0]]['seconds'])
+            exponents = {
+                name: _fit_exponent(sizes, [runs[n]['seconds'][name] for n in sizes])
+                for name in stage_names
+            }
+            exponents['total'] = _fit_exponent(sizes, [runs[n]['total_seconds'] for n in sizes])
+
+            print("   Stage times at the largest size / scaling exponent:")
+            for name in stage_names:
+                ms = runs[sizes[-1]]['seconds'][name] * 1000
+                print(f"     {name:<22} {ms:10.1f} ms   n^{exponents[name]}")
+
+            results[key] = {
+                'profile': profile,
+                'swing_strength': strength,
+                'sizes': {str(n): runs[n] for n in sizes},
+                'scaling_exponent': exponents,
+            }
+
+    return {
+        'meta': {
+            'generated_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+# =============================================================================
+#                         Baselines
+# =============================================================================
+
+def save_baseline(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Baseline saved to: {path}")
+
+
+def _median_seconds(run):
+    """Per-stage median of the repeats (best time in baselines saved before medians)"""
+    return run.get('median_seconds') or run['seconds']
+
+
+def compare_baseline(report, path, tolerance=0.25, min_seconds=0.02, exponent_slack=0.25):
+    """
+    Regressions against a saved baseline, on the median of the repeats:
+    - at the largest size both runs have, a stage slower than baseline by more
+      than `tolerance` and by at least `min_seconds` after dividing out the
+      run's overall speed (median current / baseline ratio of the stages - a
+      busier or slower machine moves every stage)
+    - scaling exponent grown by more than `exponent_slack`, fitted on the
+      sizes >= 10k where the stage takes `min_seconds` in both runs
+    Single-run timings of small stages swing by 20-30%, so both gates only
+    look at stages long enough to time
+    Returns the list of regressions (empty = OK)
+    """
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for key, current in report['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        common = sorted(set(current['sizes']) & set(base['sizes']), key=int)
+        if not common:
+            continue
+        largest = common[-1]
+        now = _median_seconds(current['sizes'][largest])
+        old = _median_seconds(base['sizes'][largest])
+        stages = [s for s in now if old.get(s, 0) > 0]
+        ratios = [now[s] / old[s] for s in stages if max(now[s], old[s]) >= min_seconds]
+        speed = float(np.median(ratios)) if ratios else 1.0
+        for stage in stages:
+            seconds, before = now[stage], old[stage]
+            if max(seconds, before) < min_seconds or seconds / speed - before < min_seconds:
+                continue
+            if seconds / before / speed > 1 + tolerance:
+                regressions.append(
+                    f"{key} {int(largest):,} bars {stage}: "
+                    f"{before * 1000:.1f} -> {seconds * 1000:.1f} ms "
+                    f"(run speed x{speed:.2f})")
+
+        sizes = [n for n in common if int(n) >= 10_000]
+        for stage in stages:
+            timed = [n for n in sizes
+                     if min(_median_seconds(current['sizes'][n]).get(stage, 0),
+                            _median_seconds(base['sizes'][n]).get(stage, 0)) >= min_seconds]
+            if len(timed) < 2:
+                continue  # too fast to fit reliably
+            exponents = [
+                _fit_exponent([int(n) for n in timed], [_median_seconds(run['sizes'][n])[stage]
+                                                        for n in timed])
+                for run in (base, current)
+            ]
+            if None not in exponents and exponents[1] > exponents[0] + exponent_slack:
+                regressions.append(f"{key} {stage}: scaling n^{exponents[0]} -> n^{exponents[1]}")
+
+    print("=" * 60)
+    if regressions:
+        print(f"[ERROR] {len(regressions)} regressions vs {path}:")
+        for line in regressions:
+            print(f"   - {line}")
+    else:
+        print(f"[OK] No regressions vs {path}")
+    print("=" * 60)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMC pipeline benchmark suite")
+    parser.add_argument("--sizes", nargs="+", type=int, default=None)
+    parser.add_argument("--quick", action="store_true", help=f"sizes {QUICK_SIZES}")
+    parser.add_argument("--strengths", nargs="+", type=int, default=list(DEFAULT_STRENGTHS))
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILE_NAMES), choices=PROFILE_NAMES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory run")
+    parser.add_argument("--save", default=None, help="write the report as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--kernels", action="store_true", help="kernel scaling + result memory only")
+    args = parser.parse_args()
+
+    if args.kernels:
+        bench_breaks()
+        bench_memory()
+        return 0
+
+    sizes = tuple(sorted(args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)))
+    report = run_suite(sizes, args.strengths, args.profiles, args.repeat, not args.no_memory)
+
+    if args.save:
+        save_baseline(report, args.save)
+    if args.compare:
+        return 1 if compare_baseline(report, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
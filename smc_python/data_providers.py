@@ -0,0 +1,392 @@
+"""
+=============================================================================
+    Data Providers - where the analyzers get their bars from
+    - MT5Provider:       live terminal (Windows, MetaTrader5 package)
+    - FileProvider:      CSV / Parquet files (any OS)
+    - SyntheticProvider: deterministic random walk (CI, benchmarks)
+    - ReplayProvider:    another provider's history replayed as a live feed
+
+    Every provider returns MT5-style rates records (RATES_DTYPE)
+=============================================================================
+"""
+
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from smc_records import epochs_of
+
+# ملاحظة: مكتبة MetaTrader5 تعمل فقط على Windows
+try:
+    import MetaTrader5 as mt5
+    MT5_AVAILABLE = True
+except ImportError:
+    mt5 = None
+    MT5_AVAILABLE = False
+
+
+# Same values as MetaTrader5.TIMEFRAME_* (usable without the package)
+TIMEFRAMES = {
+    'M1': 1,
+    'M5': 5,
+    'M15': 15,
+    'M30': 30,
+    'H1': 16385,
+    'H4': 16388,
+    'D1': 16408,
+}
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAMES['M1']: 60,
+    TIMEFRAMES['M5']: 300,
+    TIMEFRAMES['M15']: 900,
+    TIMEFRAMES['M30']: 1800,
+    TIMEFRAMES['H1']: 3600,
+    TIMEFRAMES['H4']: 14400,
+    TIMEFRAMES['D1']: 86400,
+}
+
+# Layout of mt5.copy_rates_* records
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8'),
+])
+
+
+def timeframe_name(timeframe):
+    """MT5 timeframe constant -> 'H1' (None if unknown)"""
+    for name, value in TIMEFRAMES.items():
+        if value == timeframe:
+            return name
+    return None
+
+
+def _epoch(value):
+    """datetime (naive = UTC) or epoch -> epoch seconds"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def _slice_range(rates, date_from, date_to):
+    times = rates['time']
+    lo = np.searchsorted(times, _epoch(date_from), side='left')
+    hi = np.searchsorted(times, _epoch(date_to), side='right')
+    return rates[lo:hi]
+
+
+class DataProvider:
+    """
+    Interface - subclasses implement get_rates / get_rates_range
+    Errors: return None (and False from connect) like the MT5 API
+    """
+
+    name = "provider"
+
+    def connect(self):
+        return True
+
+    def is_connected(self):
+        """Session already open (e.g. by another part of the process)"""
+        return True
+
+    def shutdown(self):
+        pass
+
+    def select_symbol(self, symbol):
+        return True
+
+    def last_error(self):
+        return None
+
+    def get_rates(self, symbol, timeframe, bars):
+        """Last `bars` bars, oldest first"""
+        raise NotImplementedError
+
+    def get_rates_range(self, symbol, timeframe, date_from, date_to):
+        """Bars with date_from <= time <= date_to"""
+        raise NotImplementedError
+
+    def server_time(self, symbol):
+        """Trade server clock (epoch, server timezone) - None when unknown"""
+        return None
+
+
+class MT5Provider(DataProvider):
+    """Live MetaTrader 5 terminal"""
+
+    name = "MT5"
+
+    def __init__(self, path=None, login=None, password=None, server=None):
+        self.init_kwargs = {
+            k: v for k, v in
+            (('path', path), ('login', login), ('password', password), ('server', server))
+            if v is not None
+        }
+
+    def connect(self):
+        if not MT5_AVAILABLE:
+            return False
+        return mt5.initialize(**self.init_kwargs)
+
+    def is_connected(self):
+        return MT5_AVAILABLE and mt5.terminal_info() is not None
+
+    def shutdown(self):
+        if MT5_AVAILABLE:
+            mt5.shutdown()
+
+    def select_symbol(self, symbol):
+        return mt5.symbol_select(symbol, True)
+
+    def last_error(self):
+        if not MT5_AVAILABLE:
+            return "MetaTrader5 package not installed"
+        return mt5.last_error()
+
+    def get_rates(self, symbol, timeframe, bars):
+        return mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
+
+    def get_rates_range(self, symbol, timeframe, date_from, date_to):
+        return mt5.copy_rates_range(symbol, timeframe, date_from, date_to)
+
+    def server_time(self, symbol):
+        tick = mt5.symbol_info_tick(symbol)
+        return int(tick.time) if tick is not None else None
+
+
+class FileProvider(DataProvider):
+    """
+    Bars from files: <root>/<SYMBOL>_<TF>.parquet or .csv
+    CSV columns: time (epoch or date string) or date + time, open, high, low, close
+    [tick_volume, spread, real_volume] - MT5 history exports (<DATE> <TIME> ...) work too
+    """
+
+    name = "files"
+
+    def __init__(self, root="data"):
+        self.root = root
+        self._cache = {}
+        self._error = None
+
+    def last_error(self):
+        return self._error
+
+    def _load(self, symbol, timeframe):
+        tf = timeframe_name(timeframe) or str(timeframe)
+        for ext in ('.parquet', '.csv'):
+            path = os.path.join(self.root, f"{symbol}_{tf}{ext}")
+            if os.path.exists(path):
+                break
+        else:
+            self._error = f"no file for {symbol} {tf} in {self.root}"
+            return None
+
+        key = (path, os.path.getmtime(path))
+        if key not in self._cache:
+            self._cache[key] = self._read(path)
+        return self._cache[key]
+
+    def _read(self, path):
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        else:
+            with open(path, encoding='utf-8') as f:
+                sep = '\t' if '\t' in f.readline() else ','
+            df = pd.read_csv(path, sep=sep)
+        df.columns = [c.strip('<>').lower() for c in df.columns]
+        df = df.rename(columns={'tickvol': 'tick_volume', 'vol': 'real_volume', 'volume': 'tick_volume'})
+
+        if 'date' in df.columns and 'time' in df.columns:
+            times = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+        elif 'date' in df.columns:
+            # D1 / W1 / MN exports have <DATE> only
+            times = pd.to_datetime(df['date'].astype(str))
+        elif np.issubdtype(df['time'].dtype, np.number):
+            times = df['time']
+        else:
+            times = pd.to_datetime(df['time'])
+
+        rates = np.zeros(len(df), dtype=RATES_DTYPE)
+        rates['time'] = epochs_of(times.values)
+        for field in ('open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume'):
+            if field in df.columns:
+                rates[field] = df[field].values
+        return rates[np.argsort(rates['time'], kind='stable')]
+
+    def get_rates(self, symbol, timeframe, bars):
+        rates = self._load(symbol, timeframe)
+        return None if rates is None else rates[-bars:]
+
+    def get_rates_range(self, symbol, timeframe, date_from, date_to):
+        rates = self._load(symbol, timeframe)
+        return None if rates is None else _slice_range(rates, date_from, date_to)
+
+
+class SyntheticProvider(DataProvider):
+    """
+    Deterministic geometric random walk per symbol / timeframe
+    Same (seed, symbol, timeframe) -> same bars on every machine
+    `bars` is the available history, like the terminal's max bars
+    """
+
+    name = "synthetic"
+
+    def __init__(self, bars=100_000, seed=42, start_price=1.1, volatility=0.0005,
+                 end_time=1_704_067_200):
+        self.bars = bars
+        self.seed = seed
+        self.start_price = start_price
+        self.volatility = volatility
+        self.end_time = end_time  # 2024-01-01 00:00 UTC
+        self._cache = {}
+
+    def _series(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._cache:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), timeframe])
+            n = self.bars
+            step = TIMEFRAME_SECONDS.get(timeframe, 3600)
+            vol = self.volatility
+
+            closes = self.start_price * np.exp(np.cumsum(rng.normal(0, vol, n)))
+            opens = np.concatenate([[self.start_price], closes[:-1]])
+            wick = np.abs(rng.normal(0, vol * 0.6, (2, n))) * closes
+
+            rates = np.zeros(n, dtype=RATES_DTYPE)
+            rates['time'] = self.end_time - step * np.arange(n - 1, -1, -1)
+            rates['open'] = opens
+            rates['close'] = closes
+            rates['high'] = np.maximum(opens, closes) + wick[0]
+            rates['low'] = np.minimum(opens, closes) - wick[1]
+            rates['tick_volume'] = rng.integers(50, 5000, n)
+            rates['spread'] = 10
+            self._cache[key] = rates
+        return self._cache[key]
+
+    def get_rates(self, symbol, timeframe, bars):
+        return self._series(symbol, timeframe)[-bars:]
+
+    def get_rates_range(self, symbol, timeframe, date_from, date_to):
+        return _slice_range(self._series(symbol, timeframe), date_from, date_to)
+
+
+class ReplayProvider(DataProvider):
+    """
+    Live-feed stand-in (Linux / CI runs of smc_daemon.py)
+    The source history is replayed on a virtual clock that starts
+    `lookback_days` before the source's last bar and runs `speed` market
+    seconds per wall second. Like copy_rates_from_pos(..., 0, n), the last
+    row of get_rates() is the bar still forming.
+    """
+
+    name = "replay"
+
+    def __init__(self, source=None, speed=60.0, lookback_days=30):
+        self.source = source or SyntheticProvider()
+        self.speed = speed
+        self.lookback_days = lookback_days
+        self._series = {}
+        self._start_clock = None
+        self._start_wall = None
+
+    def connect(self):
+        if not self.source.connect():
+            return False
+        self._start_wall = time.monotonic()
+        return True
+
+    def is_connected(self):
+        return self._start_wall is not None and self.source.is_connected()
+
+    def shutdown(self):
+        self.source.shutdown()
+
+    def last_error(self):
+        return self.source.last_error()
+
+    def _history(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._series:
+            rates = self.source.get_rates_range(symbol, timeframe, 0, 2 ** 62)
+            if rates is None or len(rates) == 0:
+                return None
+            self._series[key] = rates
+            if self._start_clock is None:
+                self._start_clock = int(rates['time'][-1]) - self.lookback_days * 86400
+        return self._series[key]
+
+    def server_time(self, symbol):
+        if self._start_clock is None or self._start_wall is None:
+            return None
+        return self._start_clock + int((time.monotonic() - self._start_wall) * self.speed)
+
+    def _visible(self, symbol, timeframe):
+        rates = self._history(symbol, timeframe)
+        if rates is None:
+            return None
+        now = self.server_time(symbol)
+        if now is None:
+            return rates[:0]
+        return rates[:np.searchsorted(rates['time'], now, side='right')]
+
+    def get_rates(self, symbol, timeframe, bars):
+        rates = self._visible(symbol, timeframe)
+        return None if rates is None else rates[-bars:]
+
+    def get_rates_range(self, symbol, timeframe, date_from, date_to):
+        rates = self._visible(symbol, timeframe)
+        return None if rates is None else _slice_range(rates, date_from, date_to)
+
+
+# =============================================================================
+#                         Configured provider
+# =============================================================================
+
+_default_provider = None
+
+
+def provider_from_spec(spec):
+    """
+    'mt5' | 'synthetic' | 'synthetic:<seed>' | 'files:<dir>' | 'replay[:<speed>]'
+    """
+    kind, _, arg = spec.partition(':')
+    kind = kind.lower()
+    if kind == 'mt5':
+        return MT5Provider()
+    if kind == 'synthetic':
+        return SyntheticProvider(seed=int(arg)) if arg else SyntheticProvider()
+    if kind in ('file', 'files'):
+        return FileProvider(arg or "data")
+    if kind == 'replay':
+        return ReplayProvider(speed=float(arg)) if arg else ReplayProvider()
+    raise ValueError(f"Unknown data provider: {spec}")
+
+
+def set_default_provider(provider):
+    """Provider used by analyzers that were not given one (spec string or instance)"""
+    global _default_provider
+    _default_provider = provider_from_spec(provider) if isinstance(provider, str) else provider
+
+
+def get_default_provider():
+    """
+    Configured provider - set_default_provider(), else $SMC_DATA_PROVIDER,
+    else MT5 (never falls back to fake data silently)
+    """
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = provider_from_spec(os.environ.get('SMC_DATA_PROVIDER', 'mt5'))
+    return _default_provider
@@ -7,12 +7,12 @@
 
 import os
 import sys
-import shutil
 
 # إضافة المسار
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from smc_analyzer import SMCAnalyzer
+from smc_export import copy_atomic
 import MetaTrader5 as mt5
 
 def main():
@@ -38,7 +38,7 @@ def main():
         mt5_files_path = os.path.join(mt5_data_path, "MQL5", "Files")
         
         dest_file = os.path.join(mt5_files_path, "smc_signals.json")
-        shutil.copy(local_file, dest_file)
+        copy_atomic(local_file, dest_file)  # الـ EA لا يقرأ ملفاً نصف مكتوب
         
         print(f"\nFile copied to: {dest_file}")
         print("\nNow open MT5 and attach SMC_Drawer_EA to the chart!")
@@ -0,0 +1,203 @@
+"""
+=============================================================================
+    SMC Batch Runner - symbol x timeframe matrix in one launch
+    - one MT5 fetch per pair (single terminal connection)
+    - analysis in a process pool sized to the machine
+    - one signal file per pair, or one combined file
+
+    python run_batch.py
+    python run_batch.py --symbols EURUSD GBPUSD --timeframes H1 H4 --profile v3
+    python run_batch.py --combined --out-dir signals
+    python run_batch.py --store bar_store      # top-up fetch from a local bar store
+    python run_batch.py --provider synthetic   # no terminal needed (Linux / CI)
+    python run_batch.py --versioned            # "seq" + append-only delta log per pair
+    python run_batch.py --binary               # + fixed-width .smcb per pair (SMC_Drawer_V2)
+=============================================================================
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bar_store import BarStore
+from data_providers import TIMEFRAMES, get_default_provider, provider_from_spec
+from smc_core import SMCCore, PROFILES, signal_payload
+from smc_export import SignalWriter, write_json_atomic
+from smc_binary import binary_path, write_binary
+
+
+# 28 major / cross FX pairs
+FX_UNIVERSE = [
+    "EURUSD", "GBPUSD", "USDJPY", "USDCHF", "USDCAD", "AUDUSD", "NZDUSD",
+    "EURGBP", "EURJPY", "EURCHF", "EURCAD", "EURAUD", "EURNZD",
+    "GBPJPY", "GBPCHF", "GBPCAD", "GBPAUD", "GBPNZD",
+    "AUDJPY", "AUDCHF", "AUDCAD", "AUDNZD",
+    "NZDJPY", "NZDCHF", "NZDCAD",
+    "CADJPY", "CADCHF", "CHFJPY",
+]
+
+DEFAULT_TIMEFRAMES = ["M5", "M15", "H1", "H4", "D1"]
+
+
+def fetch_all(provider, symbols, timeframes, bars, store=None):
+    """
+    One fetch per pair -> {(symbol, tf): rates}
+    With a BarStore only bars newer than the stored ones are requested
+    """
+    data = {}
+    for symbol in symbols:
+        provider.select_symbol(symbol)
+        for tf in timeframes:
+            if store is not None:
+                if store.update(symbol, tf, TIMEFRAMES[tf], bars, provider) is None:
+                    continue
+                rates = store.read(symbol, tf, bars)
+            else:
+                rates = provider.get_rates(symbol, TIMEFRAMES[tf], bars)
+            if rates is None or len(rates) == 0:
+                print(f"[ERROR] {symbol} {tf}: no data ({provider.last_error()})")
+                continue
+            data[(symbol, tf)] = rates
+    return data
+
+
+def analyze_pair(symbol, tf, rates, profile, params, out_dir, versioned=False, binary=False):
+    """
+    Worker: run one profile on one pair
+    Writes the pair's signal file when out_dir is given, else returns the payload
+    versioned: SignalWriter (seq + delta log), resumed from the files on disk
+    binary: also write the fixed-width .smcb next to the JSON file
+    """
+    start = time.perf_counter()
+    core = SMCCore.from_rates(rates)
+    result = PROFILES[profile](core, **params)
+    payload = signal_payload(profile, symbol, tf, result)
+
+    path = None
+    if out_dir:
+        path = os.path.join(out_dir, f"smc_signals_{symbol}_{tf}.json")
+        seq = 0
+        if versioned:
+            seq = SignalWriter(path).write(payload)
+        else:
+            write_json_atomic(path, payload)
+        if binary and seq is not None:
+            write_binary(binary_path(path), result, symbol, tf, seq)
+        payload = None
+
+    counts = {name: len(records) for name, records in result.items()}
+    return symbol, tf, counts, time.perf_counter() - start, path, payload
+
+
+def run_batch(symbols, timeframes, bars=500, profile='v3', params=None,
+              out_dir='.', combined=False, workers=None, store=None, provider=None,
+              versioned=False, binary=False):
+    """Fetch every pair once, analyze in parallel, write signal files"""
+    params = params or {}
+    provider = provider or get_default_provider()
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+
+    print("=" * 60)
+    print(f"   SMC Batch: {len(symbols)} symbols x {len(timeframes)} timeframes, profile {profile}")
+    print("=" * 60)
+
+    if not provider.connect():
+        print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+        return None
+
+    t0 = time.perf_counter()
+    try:
+        data = fetch_all(provider, symbols, timeframes, bars, store)
+    finally:
+        provider.shutdown()
+    fetch_time = time.perf_counter() - t0
+    print(f"[OK] Fetched {len(data)} pairs in {fetch_time:.2f}s")
+
+    t1 = time.perf_counter()
+    combined_payload = {}
+    analysis_times = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(analyze_pair, symbol, tf, rates, profile, params,
+                        None if combined else out_dir, versioned, binary)
+            for (symbol, tf), rates in data.items()
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                symbol, tf, counts, elapsed, path, payload = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(futures)}] [ERROR] {e}")
+                continue
+
+            analysis_times.append(elapsed)
+            if payload is not None:
+                combined_payload.setdefault(symbol, {})[tf] = payload
+            summary = ', '.join(f"{k}={v}" for k, v in counts.items())
+            print(f"[{done}/{len(futures)}] {symbol} {tf}: {summary} ({elapsed * 1000:.0f} ms)")
+
+    if combined:
+        path = os.path.join(out_dir, "smc_signals_batch.json")
+        write_json_atomic(path, {
+            'generated_at': datetime.now().isoformat(),
+            'profile': profile,
+            'pairs': combined_payload
+        })
+        print(f"[OK] Combined results saved to: {path}")
+
+    wall = time.perf_counter() - t1
+    print("\n" + "=" * 60)
+    print("   Timing Summary:")
+    print(f"   - Pairs analyzed: {len(analysis_times)}/{len(data)} ({workers} workers)")
+    print(f"   - Fetch: {fetch_time:.2f}s")
+    print(f"   - Analysis wall time: {wall:.2f}s")
+    if analysis_times:
+        print(f"   - Per pair: avg {sum(analysis_times) / len(analysis_times) * 1000:.0f} ms, "
+              f"max {max(analysis_times) * 1000:.0f} ms")
+    print(f"   - Total: {fetch_time + wall:.2f}s")
+    print("=" * 60)
+
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMC batch analysis (symbols x timeframes)")
+    parser.add_argument("--symbols", nargs="+", default=FX_UNIVERSE)
+    parser.add_argument("--timeframes", nargs="+", default=DEFAULT_TIMEFRAMES, choices=list(TIMEFRAMES))
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--profile", default="v3", choices=list(PROFILES))
+    parser.add_argument("--swing-strength", type=int, default=None)
+    parser.add_argument("--fvg-min-size", type=float, default=None, help="minimum FVG height (price)")
+    parser.add_argument("--eq-tolerance", type=float, default=None, help="EQH/EQL tolerance (price), default 0.1 x ATR")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out-dir", default="signals")
+    parser.add_argument("--combined", action="store_true", help="one combined file instead of one per pair")
+    parser.add_argument("--store", default=None, help="bar store directory (incremental fetch)")
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir> | replay[:speed]")
+    parser.add_argument("--versioned", action="store_true", help="seq number + append-only delta log per pair")
+    parser.add_argument("--binary", action="store_true", help="also write fixed-width .smcb files")
+    args = parser.parse_args()
+
+    params = {}
+    if args.swing_strength is not None:
+        params['swing_strength'] = args.swing_strength
+    if args.fvg_min_size is not None:
+        params['fvg_min_size'] = args.fvg_min_size
+    if args.eq_tolerance is not None:
+        params['eq_tolerance'] = args.eq_tolerance
+
+    store = BarStore(args.store) if args.store else None
+    provider = provider_from_spec(args.provider) if args.provider else None
+    run_batch(args.symbols, args.timeframes, args.bars, args.profile, params,
+              args.out_dir, args.combined, args.workers, store, provider, args.versioned,
+              args.binary)
+
+
+if __name__ == "__main__":
+    main()
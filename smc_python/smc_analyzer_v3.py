@@ -8,114 +8,39 @@
 =============================================================================
 """
 
-import MetaTrader5 as mt5
-import pandas as pd
-import numpy as np
-import json
-from datetime import datetime
 import os
-import shutil
+import heapq
+from collections import deque
 
-class SMCAnalyzerV3:
+from data_providers import TIMEFRAMES
+from smc_base import SMCAnalyzerBase
+from smc_core import (
+    v3_swings, v3_bos_choch, v3_order_blocks, signal_payload, update_fair_value_gap
+)
+from smc_export import copy_atomic
+from smc_mitigation import MitigationTracker
+from smc_records import Swing, Break, OrderBlock, FairValueGap, to_epoch
+
+class SMCAnalyzerV3(SMCAnalyzerBase):
     """
     SMC Analyzer V3 - Cleaner output matching reference indicator
+    (rules: V3 profile in smc_core)
     """
     
-    def __init__(self, symbol="EURUSD", timeframe=mt5.TIMEFRAME_H1):
-        self.symbol = symbol
-        self.timeframe = timeframe
-        self.data = None
+    def __init__(self, symbol="EURUSD", timeframe=TIMEFRAMES['H1'], provider=None):
+        super().__init__(symbol, timeframe, provider)
         self.swings = []
         self.bos_list = []
         self.choch_list = []
         self.order_blocks = []
-        
-    def connect(self):
-        if not mt5.initialize():
-            print(f"[ERROR] Failed to connect to MT5: {mt5.last_error()}")
-            return False
-        print(f"[OK] Connected to MT5")
-        return True
-    
-    def get_data(self, bars=500):
-        rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe, 0, bars)
-        if rates is None:
-            print(f"[ERROR] Failed to get data: {mt5.last_error()}")
-            return False
-            
-        self.data = pd.DataFrame(rates)
-        self.data['time'] = pd.to_datetime(self.data['time'], unit='s')
-        print(f"[OK] Fetched {len(self.data)} bars")
-        return True
+        self._stream = None  # on_bar() state
     
     def find_swing_points(self, strength=5):
         """
         Find swing points using fractal method
         Only keep significant structure points
         """
-        self.swings = []
-        
-        highs = self.data['high'].values
-        lows = self.data['low'].values
-        times = self.data['time'].values
-        
-        swing_highs = []
-        swing_lows = []
-        
-        # Find all swing highs and lows
-        for i in range(strength, len(self.data) - strength):
-            # Swing High
-            is_high = all(highs[i] > highs[i-j] for j in range(1, strength+1)) and \
-                      all(highs[i] > highs[i+j] for j in range(1, strength+1))
-            
-            if is_high:
-                swing_highs.append({
-                    'price': float(highs[i]),
-                    'time': times[i],
-                    'bar_index': i
-                })
-            
-            # Swing Low  
-            is_low = all(lows[i] < lows[i-j] for j in range(1, strength+1)) and \
-                     all(lows[i] < lows[i+j] for j in range(1, strength+1))
-            
-            if is_low:
-                swing_lows.append({
-                    'price': float(lows[i]),
-                    'time': times[i],
-                    'bar_index': i
-                })
-        
-        # Classify swing highs as HH or LH
-        prev_high_price = None
-        for sh in swing_highs:
-            if prev_high_price is not None:
-                label = 'HH' if sh['price'] > prev_high_price else 'LH'
-                self.swings.append({
-                    'type': 'high',
-                    'label': label,
-                    'price': sh['price'],
-                    'time': str(sh['time']),
-                    'bar_index': sh['bar_index']
-                })
-            prev_high_price = sh['price']
-        
-        # Classify swing lows as HL or LL
-        prev_low_price = None
-        for sl in swing_lows:
-            if prev_low_price is not None:
-                label = 'HL' if sl['price'] > prev_low_price else 'LL'
-                self.swings.append({
-                    'type': 'low',
-                    'label': label,
-                    'price': sl['price'],
-                    'time': str(sl['time']),
-                    'bar_index': sl['bar_index']
-                })
-            prev_low_price = sl['price']
-        
-        # Sort by bar index
-        self.swings.sort(key=lambda x: x['bar_index'])
+        self.swings = v3_swings(self.core, strength)
         
         print(f"[OK] Found {len(self.swings)} Swing Points")
         return self.swings
@@ -130,199 +55,320 @@ class SMCAnalyzerV3:
         - BOS: price breaks previous swing in trend direction
         - CHoCH: price breaks previous swing against trend (reversal)
         """
-        self.bos_list = []
-        self.choch_list = []
-        
-        closes = self.data['close'].values
-        times = self.data['time'].values
-        
-        # Track current trend
-        trend = None  # 'bull' or 'bear'
-        
-        # Track last significant levels
-        last_hh = None
-        last_ll = None
-        last_hl = None
-        last_lh = None
-        
-        for swing in self.swings:
-            bar_idx = swing['bar_index']
-            
-            if swing['label'] == 'HH':
-                # Check if this breaks previous resistance
-                if last_lh is not None and swing['price'] > last_lh['price']:
-                    # Breaking LH after downtrend = CHoCH
-                    if trend == 'bear':
-                        self.choch_list.append({
-                            'type': 'BULL',
-                            'level': last_lh['price'],
-                            'start_time': last_lh['time'],
-                            'start_bar': last_lh['bar_index'],
-                            'break_time': str(times[bar_idx]),
-                            'break_bar': bar_idx
-                        })
-                        trend = 'bull'
-                    elif trend == 'bull':
-                        # BOS in uptrend
-                        self.bos_list.append({
-                            'type': 'BULL',
-                            'level': last_hh['price'] if last_hh else last_lh['price'],
-                            'start_time': (last_hh or last_lh)['time'],
-                            'start_bar': (last_hh or last_lh)['bar_index'],
-                            'break_time': str(times[bar_idx]),
-                            'break_bar': bar_idx
-                        })
-                    else:
-                        trend = 'bull'
-                
-                last_hh = swing
-                
-            elif swing['label'] == 'LL':
-                # Check if this breaks previous support
-                if last_hl is not None and swing['price'] < last_hl['price']:
-                    # Breaking HL after uptrend = CHoCH
-                    if trend == 'bull':
-                        self.choch_list.append({
-                            'type': 'BEAR',
-                            'level': last_hl['price'],
-                            'start_time': last_hl['time'],
-                            'start_bar': last_hl['bar_index'],
-                            'break_time': str(times[bar_idx]),
-                            'break_bar': bar_idx
-                        })
-                        trend = 'bear'
-                    elif trend == 'bear':
-                        # BOS in downtrend
-                        self.bos_list.append({
-                            'type': 'BEAR',
-                            'level': last_ll['price'] if last_ll else last_hl['price'],
-                            'start_time': (last_ll or last_hl)['time'],
-                            'start_bar': (last_ll or last_hl)['bar_index'],
-                            'break_time': str(times[bar_idx]),
-                            'break_bar': bar_idx
-                        })
-                    else:
-                        trend = 'bear'
-                
-                last_ll = swing
-                
-            elif swing['label'] == 'HL':
-                last_hl = swing
-                
-            elif swing['label'] == 'LH':
-                last_lh = swing
+        self.bos_list, self.choch_list = v3_bos_choch(self.core, self.swings)
         
         print(f"[OK] Found {len(self.bos_list)} BOS, {len(self.choch_list)} CHoCH")
         return self.bos_list, self.choch_list
     
-    def find_order_blocks(self, max_ob=20):
+    def find_order_blocks(self, max_ob=20, active_only=False):
         """
         Find Order Blocks at BOS and CHoCH points
         Keep only recent and significant ones
+        (active_only=True: skip OBs price already closed through)
+        """
+        self.order_blocks = v3_order_blocks(self.core, self.bos_list, self.choch_list,
+                                            max_ob, active_only)
+        
+        print(f"[OK] Found {len(self.order_blocks)} Order Blocks")
+        return self.order_blocks
+    
+    # =========================================================================
+    #                   Streaming mode - one closed bar at a time
+    # =========================================================================
+    
+    def start_stream(self, swing_strength=5, max_ob=20, fvg_min_size=0.0):
+        """
+        Reset state for on_bar() streaming
+        Results match analyze() on the same bars, but each bar costs O(1)
         """
+        self.swings = []
+        self.bos_list = []
+        self.choch_list = []
         self.order_blocks = []
+        self.fvgs = []
+        self.equal_levels = []  # batch only - call find_equal_levels() on demand
+        
+        # Enough bars to confirm a swing and search its OB candles
+        window = max(2 * swing_strength + 1, swing_strength + 10)
+        self._stream = {
+            'strength': swing_strength,
+            'max_ob': max_ob,
+            'bars': deque(maxlen=window),  # (index, time, open, high, low, close)
+            'count': 0,
+            'prev_high': None,
+            'prev_low': None,
+            'trend': None,
+            'last_hh': None,
+            'last_ll': None,
+            'last_hl': None,
+            'last_lh': None,
+            'mitigation': MitigationTracker(),  # mitigation of the kept OBs
+            'fvg_min_size': fvg_min_size,
+            # Unfilled FVGs keyed by the price that changes them next
+            # (BULL: lowest low reached so far, BEAR: highest high)
+            'fvg_bull': [],
+            'fvg_bear': [],
+            'fvg_seq': 0,
+        }
+    
+    def on_bar(self, bar):
+        """
+        Feed one CLOSED bar (MT5 rates row or dict with time/open/high/low/close)
         
-        opens = self.data['open'].values
-        closes = self.data['close'].values
-        highs = self.data['high'].values
-        lows = self.data['low'].values
-        times = self.data['time'].values
-        
-        # Combine BOS and CHoCH for OB detection
-        all_breaks = []
-        for bos in self.bos_list:
-            all_breaks.append(('BOS', bos))
-        for choch in self.choch_list:
-            all_breaks.append(('CHoCH', choch))
-        
-        for break_type, brk in all_breaks:
-            break_bar = brk['break_bar']
-            
-            if 'BULL' in brk['type']:
-                # Bullish OB: Last bearish candle before break
-                for i in range(break_bar - 1, max(0, break_bar - 10), -1):
-                    if closes[i] < opens[i]:  # Bearish candle
-                        self.order_blocks.append({
-                            'type': 'BULL',
-                            'high': float(highs[i]),
-                            'low': float(lows[i]),
-                            'open': float(opens[i]),
-                            'close': float(closes[i]),
-                            'time': str(times[i]),
-                            'bar_index': int(i),
-                            'source': break_type
-                        })
-                        break
-            else:
-                # Bearish OB: Last bullish candle before break
-                for i in range(break_bar - 1, max(0, break_bar - 10), -1):
-                    if closes[i] > opens[i]:  # Bullish candle
-                        self.order_blocks.append({
-                            'type': 'BEAR',
-                            'high': float(highs[i]),
-                            'low': float(lows[i]),
-                            'open': float(opens[i]),
-                            'close': float(closes[i]),
-                            'time': str(times[i]),
-                            'bar_index': int(i),
-                            'source': break_type
-                        })
-                        break
-        
-        # Keep only unique OBs (remove duplicates by bar_index)
-        seen_bars = set()
-        unique_obs = []
-        for ob in self.order_blocks:
-            if ob['bar_index'] not in seen_bars:
-                seen_bars.add(ob['bar_index'])
-                unique_obs.append(ob)
+        Returns the delta caused by this bar (smc_records objects):
+        {'bar_index', 'added': {swings, bos, choch, order_blocks, fvgs},
+         'changed': {order_blocks, fvgs}, 'removed': {order_blocks}}
+        changed = OB source upgraded to BOS / OB mitigated or invalidated /
+                  FVG (partially) filled on this bar
+        """
+        if self._stream is None:
+            self.start_stream()
+        state = self._stream
+        
+        index = state['count']
+        state['count'] += 1
+        new_bar = (
+            index,
+            to_epoch(bar['time']),
+            float(bar['open']),
+            float(bar['high']),
+            float(bar['low']),
+            float(bar['close'])
+        )
+        state['bars'].append(new_bar)
+        
+        delta = {
+            'bar_index': index,
+            'added': {'swings': [], 'bos': [], 'choch': [], 'order_blocks': [], 'fvgs': []},
+            'changed': {'order_blocks': [], 'fvgs': []},
+            'removed': {'order_blocks': []}
+        }
         
-        # Keep only most recent
-        unique_obs.sort(key=lambda x: x['bar_index'], reverse=True)
-        self.order_blocks = unique_obs[:max_ob]
+        # Kept OBs first - OBs found on this bar replay it themselves
+        _, time, _, high, low, close = new_bar
+        delta['changed']['order_blocks'].extend(
+            state['mitigation'].on_bar(index, time, high, low, close))
+        self._stream_fvgs(delta)
+        
+        # A swing at bar c is only confirmed 'strength' bars later
+        strength = state['strength']
+        if index < 2 * strength:
+            return delta
+        
+        bars = list(state['bars'])[-(2 * strength + 1):]
+        center = bars[strength]
+        sides = bars[:strength] + bars[strength + 1:]
+        
+        if all(center[3] > b[3] for b in sides):
+            if state['prev_high'] is not None:
+                label = 'HH' if center[3] > state['prev_high'] else 'LH'
+                self._stream_swing('high', label, center[3], center, delta)
+            state['prev_high'] = center[3]
+        
+        if all(center[4] < b[4] for b in sides):
+            if state['prev_low'] is not None:
+                label = 'HL' if center[4] > state['prev_low'] else 'LL'
+                self._stream_swing('low', label, center[4], center, delta)
+            state['prev_low'] = center[4]
+        
+        return delta
+    
+    def trim_stream(self, first_index):
+        """
+        Drop stream objects before bar `first_index` and renumber the bars so
+        that it becomes bar 0 (a resident stream keeps a bounded window)
+        Breaks are kept by break bar: start_bar < 0 = level set before the window
+        """
+        state = self._stream
+        if state is None or first_index <= 0:
+            return
         
-        print(f"[OK] Found {len(self.order_blocks)} Order Blocks")
-        return self.order_blocks
+        self.swings = [s for s in self.swings if s.bar_index >= first_index]
+        self.bos_list = [b for b in self.bos_list if b.break_bar >= first_index]
+        self.choch_list = [b for b in self.choch_list if b.break_bar >= first_index]
+        for ob in self.order_blocks:
+            if ob.bar_index < first_index:
+                state['mitigation'].discard(ob)
+        self.order_blocks = [ob for ob in self.order_blocks if ob.bar_index >= first_index]
+        self.fvgs = [g for g in self.fvgs if g.bar_index >= first_index]
+        
+        # Unfilled gaps that left the window stop being tracked
+        kept = {id(g) for g in self.fvgs}
+        for side in ('fvg_bull', 'fvg_bear'):
+            heap = [entry for entry in state[side] if id(entry[2]) in kept]
+            heapq.heapify(heap)
+            state[side] = heap
+        
+        records = {id(r): r for r in (*self.swings, *self.bos_list, *self.choch_list,
+                                      *self.order_blocks, *self.fvgs)}
+        for name in ('last_hh', 'last_ll', 'last_hl', 'last_lh'):
+            if state[name] is not None:
+                records[id(state[name])] = state[name]  # next break origins
+        for record in records.values():
+            for field in ('bar_index', 'start_bar'):
+                if hasattr(record, field):
+                    setattr(record, field, getattr(record, field) - first_index)
+            # -1 = event not happened yet
+            for field in ('break_bar', 'mitigated_bar', 'invalidated_bar', 'partial_bar', 'filled_bar'):
+                if getattr(record, field, -1) >= 0:
+                    setattr(record, field, getattr(record, field) - first_index)
+        
+        state['bars'] = deque(((b[0] - first_index,) + b[1:] for b in state['bars']),
+                              maxlen=state['bars'].maxlen)
+        state['count'] -= first_index
+    
+    def _stream_fvgs(self, delta):
+        """Fill tracking for open gaps, then the gap whose third candle just closed"""
+        state = self._stream
+        index, time, _, high, low, _ = state['bars'][-1]
+        
+        bull, bear = state['fvg_bull'], state['fvg_bear']
+        touched = []
+        while bull and -bull[0][0] > low:
+            touched.append((heapq.heappop(bull)[2], low))
+        while bear and bear[0][0] < high:
+            touched.append((heapq.heappop(bear)[2], high))
+        for gap, frontier in touched:
+            if update_fair_value_gap(gap, index, time, high, low):
+                delta['changed']['fvgs'].append(gap)
+            self._push_fvg(gap, frontier)
+        
+        if index < 2:
+            return
+        prev, mid, nxt = list(state['bars'])[-3:]
+        min_size = state['fvg_min_size']
+        gaps = []
+        if nxt[4] > prev[3] and nxt[4] - prev[3] >= min_size:
+            gaps.append(FairValueGap('BULL', nxt[4], prev[3], mid[1], mid[0]))
+        if nxt[3] < prev[4] and prev[4] - nxt[3] >= min_size:
+            gaps.append(FairValueGap('BEAR', prev[4], nxt[3], mid[1], mid[0]))
+        for gap in gaps:
+            self.fvgs.append(gap)
+            self._push_fvg(gap, gap.top if gap.type == 'BULL' else gap.bottom)
+            delta['added']['fvgs'].append(gap)
+    
+    def _push_fvg(self, gap, frontier):
+        """Queue an unfilled gap under the price that changes it next"""
+        if gap.filled:
+            return
+        state = self._stream
+        state['fvg_seq'] += 1
+        if gap.type == 'BULL':
+            heapq.heappush(state['fvg_bull'], (-frontier, state['fvg_seq'], gap))
+        else:
+            heapq.heappush(state['fvg_bear'], (frontier, state['fvg_seq'], gap))
+    
+    def _stream_swing(self, swing_type, label, price, bar, delta):
+        """Add one confirmed swing and apply the find_bos_choch rules to it"""
+        state = self._stream
+        bar_idx = bar[0]
+        swing = Swing(swing_type, label, price, bar[1], bar_idx)
+        self.swings.append(swing)
+        delta['added']['swings'].append(swing)
+        
+        last_hh, last_ll = state['last_hh'], state['last_ll']
+        last_hl, last_lh = state['last_hl'], state['last_lh']
+        
+        if label == 'HH':
+            if last_lh is not None and price > last_lh.price:
+                if state['trend'] == 'bear':
+                    self._stream_break('CHoCH', 'BULL', last_lh, bar, delta)
+                    state['trend'] = 'bull'
+                elif state['trend'] == 'bull':
+                    self._stream_break('BOS', 'BULL', last_hh or last_lh, bar, delta)
+                else:
+                    state['trend'] = 'bull'
+            state['last_hh'] = swing
+        
+        elif label == 'LL':
+            if last_hl is not None and price < last_hl.price:
+                if state['trend'] == 'bull':
+                    self._stream_break('CHoCH', 'BEAR', last_hl, bar, delta)
+                    state['trend'] = 'bear'
+                elif state['trend'] == 'bear':
+                    self._stream_break('BOS', 'BEAR', last_ll or last_hl, bar, delta)
+                else:
+                    state['trend'] = 'bear'
+            state['last_ll'] = swing
+        
+        elif label == 'HL':
+            state['last_hl'] = swing
+        
+        elif label == 'LH':
+            state['last_lh'] = swing
+    
+    def _stream_break(self, break_type, direction, origin, bar, delta):
+        """Record a BOS/CHoCH and its Order Block"""
+        brk = Break(direction, origin.price, origin.time, origin.bar_index, bar[1], bar[0])
+        if break_type == 'BOS':
+            self.bos_list.append(brk)
+            delta['added']['bos'].append(brk)
+        else:
+            self.choch_list.append(brk)
+            delta['added']['choch'].append(brk)
+        
+        # Last opposite candle before the break (same window as find_order_blocks)
+        state = self._stream
+        bars = state['bars']
+        first_index = bars[0][0]
+        break_bar = brk.break_bar
+        
+        for i in range(break_bar - 1, max(0, break_bar - 10), -1):
+            _, time, o, h, l, c = bars[i - first_index]
+            if (c < o) if direction == 'BULL' else (c > o):
+                ob = OrderBlock(direction, h, l, o, c, time, i, break_type, break_bar=break_bar)
+                self._stream_order_block(ob, delta)
+                break
+    
+    def _stream_order_block(self, ob, delta):
+        """Keep order_blocks = newest max_ob unique OBs (BOS wins over CHoCH)"""
+        obs = self.order_blocks
+        changed = delta['changed']['order_blocks']
+        
+        for existing in obs:
+            if existing.bar_index == ob.bar_index:
+                # find_order_blocks scans BOS before CHoCH, so the BOS source wins
+                # (the earlier break keeps driving mitigation)
+                if existing.source == 'CHoCH' and ob.source == 'BOS':
+                    existing.source = 'BOS'
+                    if not any(existing is c for c in changed):
+                        changed.append(existing)
+                return
+        
+        pos = next((k for k, existing in enumerate(obs) if existing.bar_index < ob.bar_index), len(obs))
+        obs.insert(pos, ob)
+        
+        tracker = self._stream['mitigation']
+        if len(obs) > self._stream['max_ob']:
+            dropped = obs.pop()
+            if dropped is ob:
+                return
+            tracker.discard(dropped)
+            changed[:] = [c for c in changed if c is not dropped]
+            delta['removed']['order_blocks'].append(dropped)
+        
+        # Bars already closed since the break
+        tracker.add(ob, ((b[0], b[1], b[3], b[4], b[5]) for b in self._stream['bars']))
+        delta['added']['order_blocks'].append(ob)
     
     def export_to_json(self, filepath="smc_signals_v3.json"):
         """Export results to JSON for EA"""
         
-        result = {
-            'symbol': self.symbol,
-            'timeframe': self._timeframe_to_string(),
-            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        records = {
             'swings': self.swings,
             'bos': self.bos_list,
             'choch': self.choch_list,
             'order_blocks': self.order_blocks,
-            'config': {
-                'bos_color': 'clrDodgerBlue',
-                'choch_color': 'clrMagenta', 
-                'ob_bull_color': 'clrDodgerBlue',
-                'ob_bear_color': 'clrCrimson',
-                'line_style': 'STYLE_SOLID',
-                'extend_lines': True
-            }
+            'fvgs': self.fvgs,
+            'equal_levels': self.equal_levels
         }
+        result = signal_payload('v3', self.symbol, self._timeframe_to_string(), records)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, default=str)
+        self._write_json(result, filepath, records)
         
         print(f"[OK] Saved to: {filepath}")
         return filepath
     
-    def _timeframe_to_string(self):
-        tf_map = {
-            mt5.TIMEFRAME_M1: 'M1',
-            mt5.TIMEFRAME_M5: 'M5',
-            mt5.TIMEFRAME_M15: 'M15',
-            mt5.TIMEFRAME_M30: 'M30',
-            mt5.TIMEFRAME_H1: 'H1',
-            mt5.TIMEFRAME_H4: 'H4',
-            mt5.TIMEFRAME_D1: 'D1',
-        }
-        return tf_map.get(self.timeframe, 'H1')
-    
     def analyze(self, bars=500, swing_strength=5):
         """Run complete analysis"""
         
@@ -331,29 +377,49 @@ class SMCAnalyzerV3:
         print("   Reference Indicator Style")
         print("="*60)
         
-        if not self.connect():
+        self._begin_stages('v3')
+        with self._stage('connect'):
+            connected = self.connect()
+        if not connected:
+            self._end_stages()
             return None
         
         if not self.get_data(bars):
+            self._end_stages()
             return None
         
+        with self._stage('core'):
+            self.core
+        
         print("\n[1] Finding Swing Points...")
-        self.find_swing_points(swing_strength)
+        with self._stage('swings'):
+            self.find_swing_points(swing_strength)
         
         print("\n[2] Finding BOS & CHoCH...")
-        self.find_bos_choch()
+        with self._stage('breaks'):
+            self.find_bos_choch()
         
         print("\n[3] Finding Order Blocks...")
-        self.find_order_blocks()
+        with self._stage('order_blocks'):
+            self.find_order_blocks()
+        
+        print("\n[4] Finding Fair Value Gaps...")
+        with self._stage('fvgs'):
+            self.find_fair_value_gaps()
+        
+        print("\n[5] Finding Equal Highs / Lows...")
+        with self._stage('equal_levels'):
+            self.find_equal_levels()
         
-        print("\n[4] Exporting results...")
-        filepath = self.export_to_json()
+        print("\n[6] Exporting results...")
+        with self._stage('export'):
+            filepath = self.export_to_json()
         
         # Copy to MT5 Files folder
         mt5_files_path = r"C:\Users\a\AppData\Roaming\MetaQuotes\Terminal\010E047102812FC0C18890992854220E\MQL5\Files"
         if os.path.exists(mt5_files_path):
             dest = os.path.join(mt5_files_path, "smc_signals_v3.json")
-            shutil.copy(filepath, dest)
+            copy_atomic(filepath, dest)
             print(f"[OK] Copied to: {dest}")
         
         # Summary
@@ -363,12 +429,15 @@ class SMCAnalyzerV3:
         print(f"   - BOS: {len(self.bos_list)}")
         print(f"   - CHoCH: {len(self.choch_list)}")
         print(f"   - Order Blocks: {len(self.order_blocks)}")
+        print(f"   - FVGs: {len(self.fvgs)}")
+        print(f"   - EQH/EQL: {len(self.equal_levels)}")
         print("="*60)
+        self._end_stages()
         
-        mt5.shutdown()
+        self.shutdown()
         return filepath
 
 
 if __name__ == "__main__":
-    analyzer = SMCAnalyzerV3(symbol="EURUSD", timeframe=mt5.TIMEFRAME_H1)
+    analyzer = SMCAnalyzerV3(symbol="EURUSD", timeframe=TIMEFRAMES['H1'])
     analyzer.analyze(bars=500, swing_strength=5)
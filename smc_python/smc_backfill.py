@@ -0,0 +1,628 @@
+"""
+=============================================================================
+    SMC Backfill - multi-year V3 history in fixed-size chunks
+    - bars are read chunk by chunk (BarStore memmap slices or provider
+      date ranges), never the whole history at once
+    - swing labels, trend / last HH-LL-HL-LH, order blocks waiting for
+      their last possible break and zones not yet invalidated / filled are
+      carried across chunk boundaries -> same result as one pass
+      (run_v3 with max_ob=None) over the full history
+    - every chunk's final signals go to their own partition:
+
+      <root>/<SYMBOL>/<TF>/part-00000.smcb ...   (closed in that chunk)
+      <root>/<SYMBOL>/<TF>/open.smcb             (still live at the last bar)
+      <root>/<SYMBOL>/<TF>/manifest.json
+
+    Equal highs / lows cluster over the whole history (one sort) and are
+    not part of the backfill.
+
+    python smc_backfill.py --symbol EURUSD --timeframe M1 --from 2015-01-01
+    python smc_backfill.py --benchmark      # peak memory vs history length
+=============================================================================
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_providers import (
+    TIMEFRAMES, TIMEFRAME_SECONDS, get_default_provider, provider_from_spec, _epoch
+)
+from smc_core import SMCCore, v3_bos_choch, run_v3
+from smc_kernels import (
+    find_swing_indices, classify_swing_prices, merge_swing_order,
+    find_first_breaks, find_fair_value_gaps
+)
+from smc_records import Swing, OrderBlock, FairValueGap
+from smc_binary import SECTIONS, write_binary, read_binary
+from smc_export import write_json_atomic
+
+# V3 order block lookback (candles before the break bar, as in v3_order_blocks)
+OB_LOOKBACK = 10
+
+# Canonical order of every collection, identical for a single pass and a backfill
+SORT_KEYS = {
+    'swings': lambda r: (r.bar_index, r.type == 'low'),
+    'bos': lambda r: (r.break_bar, r.start_bar),
+    'choch': lambda r: (r.break_bar, r.start_bar),
+    'order_blocks': lambda r: r.bar_index,
+    'fvgs': lambda r: r.bar_index,
+    'equal_levels': lambda r: r.first_time,
+}
+
+# Same order for the .smcb arrays of the store (np.lexsort keys, primary key last)
+ARRAY_SORT_KEYS = {
+    'swings': lambda a: (-a['direction'], a['bar_index']),     # high first on a shared bar
+    'bos': lambda a: (a['start_bar'], a['break_bar']),
+    'choch': lambda a: (a['start_bar'], a['break_bar']),
+    'order_blocks': lambda a: (a['bar_index'],),
+    'fvgs': lambda a: (a['bar_index'],),
+    'equal_levels': lambda a: (a['first_time'],),
+}
+
+
+def _empty_result():
+    return {name: [] for name in SECTIONS}
+
+
+def sort_result(result):
+    """Collections in SORT_KEYS order (in place)"""
+    for name, records in result.items():
+        records.sort(key=SORT_KEYS[name])
+    return result
+
+
+# =============================================================================
+#                         Chunked V3
+# =============================================================================
+
+class ChunkedV3:
+    """
+    V3 (max_ob=None) over a history fed in pieces
+
+    backfill = ChunkedV3(swing_strength=5)
+    for rates in chunks:
+        closed = backfill.feed(rates)      # records that can no longer change
+    closed, live = backfill.finish()       # + order blocks / FVGs still live
+
+    Bar indexes count from the first bar ever fed. Only the last
+    2 * strength + 10 bars are kept between chunks (swing confirmation and
+    the order block lookback), plus the zones that are still live.
+    """
+
+    def __init__(self, swing_strength=5, fvg_min_size=0.0):
+        self.strength = swing_strength
+        self.fvg_min_size = fvg_min_size
+        self.keep = 2 * swing_strength + OB_LOOKBACK
+
+        self.tail = None            # last `keep` bars of the previous window
+        self.offset = 0             # bar index of tail[0]
+        self.bars = 0               # bars fed so far
+        self.next_center = 0        # first swing center not evaluated yet
+        self.next_gap = 0           # first FVG middle candle not evaluated yet
+        self.prev_high = None       # last swing high / low price (HH / LH labels)
+        self.prev_low = None
+        self.break_state = {}       # v3_bos_choch state (trend, last HH / LL / HL / LH)
+        self.candles = {}           # OB candle bar -> [claimed by a BOS, earliest break bar]
+        self.order_blocks = []      # [OrderBlock, last bar scanned] not invalidated yet
+        self.gaps = []              # [FairValueGap, last bar scanned, deepest price] not filled
+        self.finished = False
+
+    def feed(self, rates):
+        """Process the next chunk (oldest first); returns the records closed in it"""
+        if self.finished:
+            raise RuntimeError("backfill already finished")
+        rates = np.asarray(rates)
+        if len(rates) == 0:
+            return _empty_result()
+        window = rates if self.tail is None else np.concatenate([self.tail, rates])
+        self.bars += len(rates)
+        return self._process(window, final=False)
+
+    def finish(self):
+        """
+        End of history: remaining order block candles are final
+        Returns (closed, live) - live = OBs not invalidated and FVGs not filled
+        """
+        self.finished = True
+        if self.tail is None:
+            return _empty_result(), _empty_result()
+        closed = self._process(self.tail, final=True)
+        live = _empty_result()
+        live['order_blocks'] = [ob for ob, _ in self.order_blocks]
+        live['fvgs'] = [gap for gap, _, _ in self.gaps]
+        return closed, live
+
+    # -------------------------------------------------------------------------
+    #   One window = kept tail + new chunk
+    # -------------------------------------------------------------------------
+
+    def _process(self, window, final):
+        core = SMCCore.from_rates(window)
+        start, end = self.offset, self.offset + len(core)
+        out = _empty_result()
+
+        swings = self._swings(core, start, end)
+        out['swings'] = swings
+        out['bos'], out['choch'] = v3_bos_choch(core, swings, self.break_state)
+        self._claim_candles(core, start, out['bos'], True)
+        self._claim_candles(core, start, out['choch'], False)
+        self._release_candles(core, start, final)
+        out['order_blocks'] = self._track_order_blocks(core, start, end)
+        out['fvgs'] = self._track_gaps(core, start, end)
+
+        # np.array: the tail must not keep the whole window alive
+        self.tail = np.array(window[-self.keep:])
+        self.offset = end - len(self.tail)
+        return out
+
+    def _swings(self, core, start, end):
+        """Labeled swings confirmed in this window (centers not seen before)"""
+        s = self.strength
+        high_idx, low_idx = find_swing_indices(core.highs, core.lows, s)
+        high_idx = high_idx[high_idx + start >= self.next_center]
+        low_idx = low_idx[low_idx + start >= self.next_center]
+        self.next_center = max(self.next_center, end - s)
+
+        high_prices = core.highs[high_idx]
+        low_prices = core.lows[low_idx]
+        high_higher = self._classify(self.prev_high, high_prices)
+        low_higher = self._classify(self.prev_low, low_prices)
+        if len(high_idx):
+            self.prev_high = float(high_prices[-1])
+        if len(low_idx):
+            self.prev_low = float(low_prices[-1])
+
+        bars, is_low = merge_swing_order(high_idx, low_idx)
+        higher = np.empty(len(bars), dtype=np.int8)
+        higher[~is_low] = high_higher
+        higher[is_low] = low_higher
+
+        labels = {(False, 1): 'HH', (False, 0): 'LH', (True, 1): 'HL', (True, 0): 'LL'}
+        swings = []
+        for i, low, h in zip(bars.tolist(), is_low.tolist(), higher.tolist()):
+            if h < 0:
+                continue  # first swing of its type (SH / SL) - not part of V3
+            swings.append(Swing('low' if low else 'high', labels[(low, h)],
+                                float(core.lows[i] if low else core.highs[i]),
+                                core.epochs[i], i + start))
+        return swings
+
+    @staticmethod
+    def _classify(previous, prices):
+        """higher per swing (1 / 0), -1 for the very first swing of the history"""
+        if previous is None:
+            higher = np.full(len(prices), -1, dtype=np.int8)
+            higher[1:] = classify_swing_prices(prices)
+            return higher
+        return classify_swing_prices(np.r_[previous, prices]).astype(np.int8)
+
+    def _claim_candles(self, core, start, breaks, bos):
+        """Opposite candle of every break -> pending OB candle (BOS wins, earliest break kept)"""
+        if not breaks:
+            return
+        break_bars = np.array([brk.break_bar - start for brk in breaks], dtype=np.int64)
+        found = core.opposite_candles(break_bars, ['BULL' in brk.type for brk in breaks],
+                                      OB_LOOKBACK)
+        for c, g in zip(found.tolist(), break_bars.tolist()):
+            if c < 0:
+                continue
+            entry = self.candles.setdefault(c + start, [False, g + start])
+            entry[0] = entry[0] or bos
+            entry[1] = min(entry[1], g + start)
+
+    def _release_candles(self, core, start, final):
+        """
+        Candles no future break can claim any more become order blocks
+        (a break at bar g looks back to g - 9, future breaks start at next_center)
+        """
+        limit = self.next_center - OB_LOOKBACK + 1
+        ready = sorted(c for c in self.candles if final or c < limit)
+        for c in ready:
+            bos, first_break = self.candles.pop(c)
+            i = c - start
+            ob = OrderBlock('BULL' if core.bearish[i] else 'BEAR',
+                            float(core.highs[i]), float(core.lows[i]),
+                            float(core.opens[i]), float(core.closes[i]),
+                            core.epochs[i], c, 'BOS' if bos else 'CHoCH',
+                            break_bar=first_break)
+            self.order_blocks.append([ob, max(first_break, c)])
+
+    def _track_order_blocks(self, core, start, end):
+        """mark_mitigation over the new bars of every live OB; returns the invalidated ones"""
+        closed_obs = []
+        for bullish in (True, False):
+            live = [entry for entry in self.order_blocks if entry[0].bullish == bullish]
+            if not live:
+                continue
+            starts = np.array([scanned - start for _, scanned in live], dtype=np.int64)
+            highs = np.array([ob.high for ob, _ in live])
+            lows = np.array([ob.low for ob, _ in live])
+            if bullish:
+                touched = find_first_breaks(core.lows, starts, highs, above=False, inclusive=True)
+                closed = find_first_breaks(core.closes, starts, lows, above=False)
+            else:
+                touched = find_first_breaks(core.highs, starts, lows, above=True, inclusive=True)
+                closed = find_first_breaks(core.closes, starts, highs, above=True)
+
+            for (ob, _), t, c in zip(live, touched.tolist(), closed.tolist()):
+                if t >= 0 and not ob.mitigated:
+                    ob.mitigated = True
+                    ob.mitigated_bar = t + start
+                    ob.mitigated_time = core.epochs[t]
+                if c >= 0:
+                    ob.invalidated = True
+                    ob.invalidated_bar = c + start
+                    closed_obs.append(ob)
+
+        self.order_blocks = [[ob, end - 1] for ob, _ in self.order_blocks if not ob.invalidated]
+        return closed_obs
+
+    def _track_gaps(self, core, start, end):
+        """New FVGs + fill tracking of every live one; returns the filled ones"""
+        bars, bullish, tops, bottoms = find_fair_value_gaps(core.highs, core.lows, self.fvg_min_size)
+        new = bars + start >= self.next_gap
+        self.next_gap = max(self.next_gap, end - 1)
+        for i, bull, top, bottom in zip(bars[new].tolist(), bullish[new].tolist(),
+                                        tops[new].tolist(), bottoms[new].tolist()):
+            gap = FairValueGap('BULL' if bull else 'BEAR', top, bottom, core.epochs[i], i + start)
+            self.gaps.append([gap, i + start + 1, np.inf if bull else -np.inf])
+        if not self.gaps:
+            return []
+
+        n = len(core)
+        gaps = [gap for gap, _, _ in self.gaps]
+        starts = np.array([scanned - start for _, scanned, _ in self.gaps], dtype=np.int64)
+        deepest = np.array([d for _, _, d in self.gaps])
+        bullish = np.array([gap.type == 'BULL' for gap in gaps])
+        tops = np.array([gap.top for gap in gaps])
+        bottoms = np.array([gap.bottom for gap in gaps])
+
+        # Same kernels as fair_value_gaps, started from the last scanned bar
+        partial = np.full(len(gaps), -1, dtype=np.int64)
+        filled = np.full(len(gaps), -1, dtype=np.int64)
+        for side, prices, above in ((bullish, core.lows, False), (~bullish, core.highs, True)):
+            entry, exit_ = (tops, bottoms) if not above else (bottoms, tops)
+            partial[side] = find_first_breaks(prices, starts[side], entry[side], above)
+            filled[side] = find_first_breaks(prices, starts[side], exit_[side], above, inclusive=True)
+
+        deepest_low = np.append(np.minimum.accumulate(core.lows[::-1])[::-1], np.inf)
+        deepest_high = np.append(np.maximum.accumulate(core.highs[::-1])[::-1], -np.inf)
+        after = np.minimum(starts + 1, n)
+        deepest = np.where(bullish, np.minimum(deepest, deepest_low[after]),
+                           np.maximum(deepest, deepest_high[after]))
+        reach = np.where(bullish, tops - deepest, deepest - bottoms)
+        ratio = np.clip(reach / (tops - bottoms), 0.0, 1.0)
+
+        filled_gaps = []
+        live = []
+        for gap, p, f, r, d in zip(gaps, partial.tolist(), filled.tolist(), ratio.tolist(),
+                                   deepest.tolist()):
+            if p >= 0 and not gap.partial:
+                gap.partial = True
+                gap.partial_bar = p + start
+            if f >= 0:
+                gap.filled = True
+                gap.filled_bar = f + start
+                gap.filled_time = core.epochs[f]
+                gap.fill_ratio = 1.0
+                filled_gaps.append(gap)
+            else:
+                gap.fill_ratio = r
+                live.append([gap, end - 1, d])
+        self.gaps = live
+        return filled_gaps
+
+
+# =============================================================================
+#                         Chunk sources
+# =============================================================================
+
+def chunks_from_array(rates, chunk_bars):
+    """Consecutive slices of an array / BarStore memmap (only one chunk is read at a time)"""
+    for i in range(0, len(rates), chunk_bars):
+        yield rates[i:i + chunk_bars]
+
+
+def chunks_from_provider(provider, symbol, timeframe, date_from, date_to, chunk_bars):
+    """
+    get_rates_range() over consecutive time windows of ~chunk_bars bars
+    (market gaps make some chunks shorter; empty windows are skipped)
+    """
+    span = chunk_bars * TIMEFRAME_SECONDS[timeframe]
+    t, stop = _epoch(date_from), _epoch(date_to)
+    while t <= stop:
+        to = min(t + span - 1, stop)
+        rates = provider.get_rates_range(symbol, timeframe,
+                                         datetime.fromtimestamp(t, tz=timezone.utc),
+                                         datetime.fromtimestamp(to, tz=timezone.utc))
+        if rates is None:
+            raise RuntimeError(f"{symbol}: failed to get data: {provider.last_error()}")
+        if len(rates):
+            yield rates
+        t = to + 1
+
+
+# =============================================================================
+#                         Partitioned store
+# =============================================================================
+
+class SignalStore:
+    """
+    On-disk partitions of backfilled signals (.smcb, see smc_binary)
+
+    store = SignalStore("smc_history")
+    arrays = store.load("EURUSD", "M1")    # {collection: structured array}
+    """
+
+    def __init__(self, root="smc_history"):
+        self.root = root
+
+    def path(self, symbol, tf_name):
+        return os.path.join(self.root, symbol, tf_name)
+
+    def partitions(self, symbol, tf_name):
+        return sorted(glob.glob(os.path.join(self.path(symbol, tf_name), "part-*.smcb")))
+
+    def clear(self, symbol, tf_name):
+        """Drop the partitions of a previous backfill of this symbol / timeframe"""
+        directory = self.path(symbol, tf_name)
+        for path in self.partitions(symbol, tf_name) + [os.path.join(directory, "open.smcb")]:
+            if os.path.exists(path):
+                os.remove(path)
+        os.makedirs(directory, exist_ok=True)
+
+    def write_partition(self, symbol, tf_name, number, records):
+        path = os.path.join(self.path(symbol, tf_name), f"part-{number:05d}.smcb")
+        return write_binary(path, records, symbol, tf_name, seq=number)
+
+    def write_open(self, symbol, tf_name, records):
+        path = os.path.join(self.path(symbol, tf_name), "open.smcb")
+        return write_binary(path, records, symbol, tf_name)
+
+    def write_manifest(self, symbol, tf_name, manifest):
+        return write_json_atomic(os.path.join(self.path(symbol, tf_name), "manifest.json"), manifest)
+
+    def load(self, symbol, tf_name, include_open=True):
+        """All partitions merged, every collection in bar order"""
+        files = self.partitions(symbol, tf_name)
+        open_file = os.path.join(self.path(symbol, tf_name), "open.smcb")
+        if include_open and os.path.exists(open_file):
+            files.append(open_file)
+
+        parts = {name: [] for name in SECTIONS}
+        for path in files:
+            _, arrays = read_binary(path)
+            for name in SECTIONS:
+                parts[name].append(arrays[name])
+
+        merged = {}
+        for name, arrays in parts.items():
+            if not arrays:
+                continue
+            array = np.concatenate(arrays)
+            merged[name] = array[np.lexsort(ARRAY_SORT_KEYS[name](array))]
+        return merged
+
+
+# =============================================================================
+#                         Runner
+# =============================================================================
+
+def backfill(chunks, symbol, tf_name, store, swing_strength=5, fvg_min_size=0.0, verbose=True):
+    """
+    Run ChunkedV3 over `chunks`, one partition per chunk
+    Returns the manifest (also written next to the partitions)
+    """
+    engine = ChunkedV3(swing_strength, fvg_min_size)
+    store.clear(symbol, tf_name)
+    manifest = {
+        'symbol': symbol,
+        'timeframe': tf_name,
+        'profile': 'v3',
+        'params': {'swing_strength': swing_strength, 'max_ob': None, 'fvg_min_size': fvg_min_size},
+        'started_at': datetime.now().isoformat(),
+        'complete': False,
+        'bars': 0,
+        'partitions': [],
+    }
+
+    t0 = time.perf_counter()
+    for number, rates in enumerate(chunks):
+        closed = engine.feed(rates)
+        store.write_partition(symbol, tf_name, number, sort_result(closed))
+        manifest['bars'] = engine.bars
+        manifest['partitions'].append({
+            'part': number,
+            'first_time': int(rates['time'][0]),
+            'last_time': int(rates['time'][-1]),
+            'bars': len(rates),
+            'counts': {name: len(records) for name, records in closed.items()},
+        })
+        store.write_manifest(symbol, tf_name, manifest)
+        if verbose:
+            print(f"[OK] part {number:05d}: {len(rates)} bars "
+                  f"(total {engine.bars}, live OB {len(engine.order_blocks)}, "
+                  f"live FVG {len(engine.gaps)})")
+
+    closed, live = engine.finish()
+    if any(closed.values()):
+        number = len(manifest['partitions'])
+        store.write_partition(symbol, tf_name, number, sort_result(closed))
+        manifest['partitions'].append({'part': number, 'bars': 0,
+                                       'counts': {name: len(r) for name, r in closed.items()}})
+    store.write_open(symbol, tf_name, sort_result(live))
+    manifest['open'] = {name: len(records) for name, records in live.items()}
+    manifest['complete'] = True
+    manifest['seconds'] = round(time.perf_counter() - t0, 3)
+    store.write_manifest(symbol, tf_name, manifest)
+    return manifest
+
+
+def chunked_result(rates, chunk_bars, swing_strength=5, fvg_min_size=0.0):
+    """In-memory backfill (closed + live records, SORT_KEYS order) - for checks"""
+    engine = ChunkedV3(swing_strength, fvg_min_size)
+    result = _empty_result()
+    for rates_chunk in chunks_from_array(rates, chunk_bars):
+        for name, records in engine.feed(rates_chunk).items():
+            result[name].extend(records)
+    for part in engine.finish():
+        for name, records in part.items():
+            result[name].extend(records)
+    return sort_result(result)
+
+
+def verify(rates, chunk_bars, swing_strength=5, fvg_min_size=0.0):
+    """Chunked vs single pass: {collection: (records, mismatches)}"""
+    single = run_v3(SMCCore.from_rates(rates), swing_strength, max_ob=None,
+                    fvg_min_size=fvg_min_size)
+    single['equal_levels'] = []
+    sort_result(single)
+    chunked = chunked_result(rates, chunk_bars, swing_strength, fvg_min_size)
+
+    report = {}
+    for name in SECTIONS:
+        a, b = single[name], chunked[name]
+        bad = abs(len(a) - len(b)) + sum(1 for x, y in zip(a, b) if x != y)
+        report[name] = (len(a), bad)
+    return report
+
+
+# =============================================================================
+#                         Peak memory benchmark
+# =============================================================================
+
+def benchmark_memory(sizes=(100_000, 400_000, 1_600_000), chunk_bars=50_000, single=True, seed=42):
+    """
+    tracemalloc peak of a backfill (bars read from a BarStore memmap) vs one pass
+    over the same history loaded in memory
+    """
+    from bar_store import BarStore
+    from data_providers import SyntheticProvider
+
+    tmp = tempfile.mkdtemp(prefix="smc_backfill_")
+    bar_store = BarStore(os.path.join(tmp, "bars"))
+    store = SignalStore(os.path.join(tmp, "signals"))
+    rows = []
+    for n in sizes:
+        symbol = f"BENCH{n}"
+        bar_store.append(symbol, "M1", SyntheticProvider(bars=n, seed=seed).get_rates(
+            symbol, TIMEFRAMES['M1'], n))
+
+        # Timed without tracing (tracemalloc slows the Python loops a lot)
+        manifest = backfill(chunks_from_array(bar_store.read(symbol, "M1"), chunk_bars),
+                            symbol, "M1", store, verbose=False)
+        seconds = manifest['seconds']
+        tracemalloc.start()
+        backfill(chunks_from_array(bar_store.read(symbol, "M1"), chunk_bars),
+                 symbol, "M1", store, verbose=False)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        row = {'bars': n, 'chunk_bars': chunk_bars, 'backfill_peak': peak,
+               'backfill_seconds': seconds, 'single_peak': None}
+        if single:
+            tracemalloc.start()
+            run_v3(SMCCore.from_rates(np.array(bar_store.read(symbol, "M1"))), max_ob=None)
+            row['single_peak'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked V3 history backfill into a partitioned store")
+    parser.add_argument("--symbol", default="EURUSD")
+    parser.add_argument("--timeframe", default="M1", choices=list(TIMEFRAMES))
+    parser.add_argument("--from", dest="date_from", default=None, help="YYYY-MM-DD (provider source)")
+    parser.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (default: now)")
+    parser.add_argument("--bar-store", default=None, help="read bars from this BarStore instead")
+    parser.add_argument("--chunk-bars", type=int, default=100_000)
+    parser.add_argument("--swing-strength", type=int, default=5)
+    parser.add_argument("--fvg-min-size", type=float, default=0.0)
+    parser.add_argument("--store-dir", default="smc_history")
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir>")
+    parser.add_argument("--verify", type=int, default=None, metavar="BARS",
+                        help="check chunked == single pass on the last BARS bars and exit")
+    parser.add_argument("--benchmark", action="store_true", help="peak memory vs history length")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print("=" * 72)
+        print(f"   Backfill peak memory ({datetime.now():%Y-%m-%d %H:%M}), "
+              f"chunk = {args.chunk_bars} bars")
+        print("=" * 72)
+        print(f"{'bars':>10} {'backfill MB':>12} {'seconds':>9} {'single pass MB':>15}")
+        for row in benchmark_memory(chunk_bars=args.chunk_bars):
+            single = f"{row['single_peak'] / 2 ** 20:>15.1f}" if row['single_peak'] else f"{'-':>15}"
+            print(f"{row['bars']:>10} {row['backfill_peak'] / 2 ** 20:>12.1f} "
+                  f"{row['backfill_seconds']:>9.1f} {single}")
+        print("=" * 72)
+        return 0
+
+    timeframe = TIMEFRAMES[args.timeframe]
+    provider = None
+    if args.bar_store:
+        from bar_store import BarStore
+        rates = BarStore(args.bar_store).read(args.symbol, args.timeframe)
+        if len(rates) == 0:
+            print(f"[ERROR] No bars for {args.symbol} {args.timeframe} in {args.bar_store}")
+            return 1
+        chunks = chunks_from_array(rates, args.chunk_bars)
+    else:
+        provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+        if not provider.connect():
+            print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+            return 1
+        provider.select_symbol(args.symbol)
+        if args.verify:
+            rates = provider.get_rates(args.symbol, timeframe, args.verify)
+        else:
+            date_to = (datetime.strptime(args.date_to, "%Y-%m-%d") if args.date_to
+                       else datetime.now(tz=timezone.utc))
+            date_from = (datetime.strptime(args.date_from, "%Y-%m-%d") if args.date_from
+                         else datetime(2000, 1, 1))
+            chunks = chunks_from_provider(provider, args.symbol, timeframe,
+                                          date_from, date_to, args.chunk_bars)
+
+    try:
+        if args.verify:
+            rates = np.array(rates[-args.verify:])
+            report = verify(rates, args.chunk_bars, args.swing_strength, args.fvg_min_size)
+            ok = all(bad == 0 for _, bad in report.values())
+            for name, (count, bad) in report.items():
+                print(f"   - {name}: {count} records, {bad} mismatches")
+            print(f"[{'OK' if ok else 'ERROR'}] chunked ({args.chunk_bars} bars) "
+                  f"{'==' if ok else '!='} single pass over {len(rates)} bars")
+            return 0 if ok else 1
+
+        store = SignalStore(args.store_dir)
+        manifest = backfill(chunks, args.symbol, args.timeframe, store,
+                            args.swing_strength, args.fvg_min_size)
+    finally:
+        if provider is not None:
+            provider.shutdown()
+
+    print("\n" + "=" * 60)
+    print(f"   Backfill Summary ({args.symbol} {args.timeframe}):")
+    print(f"   - Bars: {manifest['bars']} in {len(manifest['partitions'])} partitions "
+          f"({manifest['seconds']:.1f}s)")
+    for name in SECTIONS[:-1]:
+        total = sum(p['counts'][name] for p in manifest['partitions']) + manifest['open'][name]
+        print(f"   - {name}: {total}")
+    print("=" * 60)
+    print(f"[OK] Partitions saved to: {store.path(args.symbol, args.timeframe)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,740 @@
+"""
+=============================================================================
+    SMC Backtest - native, vectorized backtest of the analyzer's signals
+    - BOS / CHoCH -> market entry on the open after the signal becomes
+      known (the swings behind it confirmed - no look-ahead)
+    - order blocks -> limit entry at the zone edge, SL beyond the zone,
+      TP at ob_rr x risk
+    - SL / TP in points (the EAs' StopLoss / TakeProfit inputs) or ATR
+      multiples, spread on every ask-side price, commission per lot and side
+    - SL / TP bars of all candidate trades in two heap passes
+      (find_first_breaks), then one pass over the candidates for the
+      position limit (MaxPositions)
+    - metrics with the fields of BacktestResult (mt5_complete_automation)
+
+    No terminal: a symbol-year takes milliseconds, a prescreen before any
+    Strategy Tester run.
+
+    python smc_backtest.py --symbol EURUSD --timeframe H1 --from 2024-01-01 --to 2024-12-31
+    python smc_backtest.py --provider synthetic --entries bos choch ob --sl-atr 1.5 --tp-atr 3
+    python smc_backtest.py --benchmark      # time per symbol-year
+=============================================================================
+"""
+
+import os
+import sys
+import time
+import heapq
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_providers import (
+    TIMEFRAMES, TIMEFRAME_SECONDS, SyntheticProvider, get_default_provider, provider_from_spec
+)
+from smc_core import (
+    SMCCore, v1_swings, v1_bos, v1_choch, v1_order_blocks,
+    v2_swings, v2_structure_breaks, v2_order_blocks,
+    v3_swings, v3_bos_choch, v3_order_blocks
+)
+from smc_kernels import find_first_breaks
+from smc_records import epochs_of
+from smc_export import write_json_atomic
+
+# analyze() defaults per profile
+SWING_STRENGTH = {'v1': 3, 'v2': 5, 'v3': 5}
+OB_LOOKBACK = {'v1': 10, 'v2': 5, 'v3': 10}
+
+SOURCES = ('BOS', 'CHoCH', 'OB')
+EXIT_REASONS = ('SL', 'TP', 'END')
+
+TRADE_DTYPE = np.dtype([
+    ('signal_bar', '<i8'),   # bar on whose close the signal was known
+    ('entry_bar', '<i8'),
+    ('exit_bar', '<i8'),
+    ('direction', 'i1'),     # 1 = buy, -1 = sell
+    ('source', 'i1'),        # SOURCES index
+    ('reason', 'i1'),        # EXIT_REASONS index
+    ('entry', '<f8'),
+    ('sl', '<f8'),
+    ('tp', '<f8'),
+    ('exit', '<f8'),
+    ('profit', '<f8'),       # account money, commission included
+])
+
+# Fields of mt5_complete_automation.BacktestResult
+RESULT_FIELDS = ('success', 'total_profit', 'total_trades', 'win_rate', 'max_drawdown',
+                 'profit_factor', 'sharpe_ratio', 'recovery_factor', 'expected_payoff',
+                 'report_path', 'error')
+
+
+# =============================================================================
+#                         Signals
+# =============================================================================
+
+def market_structure(core, profile='v3', swing_strength=None, order_blocks=True, ob_lookback=None):
+    """
+    Swings, BOS, CHoCH and OBs of a profile - the part of PROFILES[profile]
+    a backtest trades (no FVGs / equal levels). V3 keeps every OB (max_ob=None)
+    """
+    if profile not in SWING_STRENGTH:
+        raise ValueError(f"Unknown profile: {profile}")
+    strength = swing_strength or SWING_STRENGTH[profile]
+    lookback = ob_lookback or OB_LOOKBACK[profile]
+    if profile == 'v1':
+        swings = v1_swings(core, strength)
+        bos = v1_bos(core, swings)
+        choch = v1_choch(core, swings)
+        obs = v1_order_blocks(core, bos + choch, lookback) if order_blocks else []
+    elif profile == 'v2':
+        swings = v2_swings(core, strength)
+        breaks = v2_structure_breaks(core, swings)
+        bos = [b for b in breaks if 'BOS' in b.type]
+        choch = [b for b in breaks if 'CHoCH' in b.type]
+        obs = v2_order_blocks(core, breaks, lookback) if order_blocks else []
+    else:
+        swings = v3_swings(core, strength)
+        bos, choch = v3_bos_choch(core, swings)
+        obs = (v3_order_blocks(core, bos, choch, max_ob=None, lookback=lookback)
+               if order_blocks and (bos or choch) else [])
+    return {'swings': swings, 'bos': bos, 'choch': choch, 'order_blocks': obs}
+
+
+def signal_bars(profile, structure, swing_strength=None, core=None):
+    """
+    Bar on whose close each BOS / CHoCH is known to a live EA
+    (a swing is confirmed `strength` bars after it formed):
+    v3 - the new HH / LL at break_bar has to be confirmed
+    v2 - the break is recorded with the next swing high / low (the HH / LL)
+    v1 - BOS: a level counts once the next swing of its type is confirmed;
+         CHoCH: the close where v1_choch on the history so far first emits
+         it (see _v1_choch_known - needs `core`)
+    Returns {'bos': int64 array, 'choch': int64 array} aligned with the lists
+    """
+    strength = swing_strength or SWING_STRENGTH[profile]
+    swings = structure['swings']
+    swing_bars = {
+        kind: np.array([s.bar_index for s in swings if s.type == kind], dtype=np.int64)
+        for kind in ('high', 'low')
+    }
+    known = {}
+    for name in ('bos', 'choch'):
+        breaks = structure[name]
+        start = np.array([b.start_bar for b in breaks], dtype=np.int64)
+        brk = np.array([b.break_bar for b in breaks], dtype=np.int64)
+        if profile == 'v3':
+            bars = brk + strength
+        elif (profile == 'v2' or name == 'bos') and len(breaks):
+            # v2: the HH / LL that records the break, v1 BOS: the swing after the level
+            bull = np.array(['BULL' in b.type for b in breaks])
+            trigger = np.empty(len(breaks), dtype=np.int64)
+            for kind, mask in (('high', bull), ('low', ~bull)):
+                pool = swing_bars[kind]
+                nxt = np.searchsorted(pool, start[mask], side='right')
+                trigger[mask] = pool[np.minimum(nxt, len(pool) - 1)] if len(pool) else brk[mask]
+            bars = np.maximum(brk, trigger + strength)
+        elif len(breaks):
+            if core is None:
+                raise ValueError("signal_bars: v1 CHoCH timing needs the core")
+            bars = _v1_choch_known(core, swings, breaks, strength)
+        else:
+            bars = brk
+        known[name] = bars
+    return known
+
+
+def _v1_choch_known(core, swings, choch, strength):
+    """
+    v1_choch labels a CHoCH while walking the swings (trend from HH / LL,
+    last HL / LH, each level once), so whether a break is emitted depends on
+    the whole walk before it - a later close can break an older HL / LH and
+    change every emission after it. Replays the walk as the history grows:
+    after each close that confirms a swing or breaks an HL / LH, the walk is
+    redone from the first swing it touches until it rejoins the previous
+    one. A CHoCH is known on the close where it is first emitted.
+    """
+    n = len(swings)
+    confirmed = [s.bar_index + strength for s in swings]
+    prices = [s.price for s in swings]
+    first_break = [-1] * n
+    until = [-1] * n  # last swing where an HL / LH is still the last of its kind
+    last = {}         # side -> HL / LH current at each swing
+    checked = {}      # (side, price) -> last swing where a level at that price is checked
+    for side, label, above in (('CHOCH_BEAR', 'HL', False), ('CHOCH_BULL', 'LH', True)):
+        idx = [i for i, s in enumerate(swings) if s.label == label]
+        breaks = find_first_breaks(core.closes, [swings[i].bar_index for i in idx],
+                                   [prices[i] for i in idx], above=above)
+        for i, bar, nxt in zip(idx, breaks.tolist(), idx[1:] + [n]):
+            first_break[i], until[i] = bar, nxt - 1
+        for i in idx:
+            checked[(side, prices[i])] = until[i]
+        current, last[side] = -1, []
+        for s in swings:
+            current = len(last[side]) if s.label == label else current
+            last[side].append(current)
+    broken_at = {}
+    for i, bar in enumerate(first_break):
+        if bar >= 0:
+            broken_at.setdefault(bar, []).append(i)
+
+    seen = {'CHOCH_BEAR': {}, 'CHOCH_BULL': {}}  # price -> swings of the walk that emitted it
+    trend = []   # (bullish, bearish) after each swing of the current walk
+    emits = []   # [(side, swing)] emitted at each swing of the current walk
+    first_seen = {}
+
+    def step(i, bullish, bearish, now):
+        label = swings[i].label
+        if label == 'HH':
+            bullish, bearish = True, False
+        elif label == 'LL':
+            bullish, bearish = False, True
+        out = []
+        for side in ('CHOCH_BEAR', 'CHOCH_BULL'):
+            j = last[side][i]
+            if (bullish if side == 'CHOCH_BEAR' else bearish) and j >= 0 \
+                    and 0 <= first_break[j] <= now \
+                    and not any(k <= i for k in seen[side].get(prices[j], ())):
+                out.append((side, j))
+                seen[side].setdefault(prices[j], set()).add(i)
+                first_seen.setdefault((side, swings[j].bar_index), now)
+                bullish, bearish = side == 'CHOCH_BULL', side == 'CHOCH_BEAR'
+        return bullish, bearish, out
+
+    def fires(i, now):
+        """A level broken at `now` could be emitted at swing i of the current walk"""
+        bullish, bearish = trend[i - 1] if i else (False, False)
+        label = swings[i].label
+        if label in ('HH', 'LL'):
+            bullish, bearish = label == 'HH', label == 'LL'
+        # the bull check runs after the bear one (which flips the trend if it fired)
+        bearish = bearish or any(side == 'CHOCH_BEAR' for side, _ in emits[i])
+        for side, active in (('CHOCH_BEAR', bullish), ('CHOCH_BULL', bearish)):
+            j = last[side][i]
+            if active and j >= 0 and first_break[j] == now \
+                    and not any(k <= i for k in seen[side].get(prices[j], ())):
+                return True
+        return False
+
+    def walk(i, stop, now, touched):
+        """
+        Redo swings i..stop-1 - until back on the old walk and past `touched`;
+        before that only the swings where a newly broken level could fire
+        """
+        bullish, bearish = trend[i - 1] if i else (False, False)
+        diff = {}
+        while i < stop:
+            for side, j in emits[i]:
+                seen[side][prices[j]].discard(i)
+                diff[(side, j)] = diff.get((side, j), 0) - 1
+            bullish, bearish, out = step(i, bullish, bearish, now)
+            for key in out:
+                diff[key] = diff.get(key, 0) + 1
+            if diff:
+                # an emission only matters while a level at its price can still be checked
+                diff = {key: d for key, d in diff.items()
+                        if d and checked[(key[0], prices[key[1]])] > i}
+            same = trend[i] == (bullish, bearish)
+            trend[i], emits[i] = (bullish, bearish), out
+            i += 1
+            if same and not diff:
+                while i <= touched and i < stop and not fires(i, now):
+                    i += 1
+                if i > touched:
+                    return
+                bullish, bearish = trend[i - 1]
+
+    for now in sorted(set(confirmed) | set(broken_at)):
+        visible = len(trend)
+        broken = [j for j in broken_at.get(now, ()) if j < visible]
+        if broken:
+            # a broken HL / LH can change the walk while it is the last of its kind
+            walk(broken[0], visible, now, max(until[j] for j in broken))
+        while visible < n and confirmed[visible] <= now:
+            bullish, bearish = trend[-1] if trend else (False, False)
+            bullish, bearish, out = step(visible, bullish, bearish, now)
+            trend.append((bullish, bearish))
+            emits.append(out)
+            visible += 1
+
+    return np.array([first_seen[('CHOCH_BEAR' if 'BEAR' in b.type else 'CHOCH_BULL', b.start_bar)]
+                     for b in choch], dtype=np.int64)
+
+
+def guess_point(prices):
+    """Point size from the price level when the symbol's digits are unknown"""
+    level = float(np.median(prices[-1000:])) if len(prices) else 1.0
+    if level >= 500:
+        return 0.01       # metals / indices
+    if level >= 20:
+        return 0.001      # JPY pairs
+    return 0.00001        # 5-digit FX
+
+
+# =============================================================================
+#                         Candidate trades
+# =============================================================================
+
+def _break_candidates(core, breaks, known, source, sp, point, sl_points, tp_points,
+                      sl_atr, tp_atr, atr_period, start, end):
+    """Market order on the open after `known` (entries in bars [start, end))"""
+    direction = np.where(['BULL' in b.type for b in breaks], 1, -1).astype(np.int8)
+    signal = np.asarray(known, dtype=np.int64)
+    keep = (signal + 1 >= start) & (signal + 1 < end)
+    direction, signal = direction[keep], signal[keep]
+    entry_bar = signal + 1
+
+    entry = core.opens[entry_bar] + np.where(direction > 0, sp[entry_bar], 0.0)
+    if sl_atr or tp_atr:
+        atr = core.atr(atr_period)[signal]
+    sl_dist = sl_atr * atr if sl_atr else np.full(len(signal), sl_points * point)
+    tp_dist = tp_atr * atr if tp_atr else np.full(len(signal), tp_points * point)
+    valid = np.isfinite(sl_dist) & np.isfinite(tp_dist) & (sl_dist > 0) & (tp_dist > 0)
+
+    return _candidates(signal, entry_bar, direction, source, entry,
+                       entry - direction * sl_dist, entry + direction * tp_dist, valid)
+
+
+def _ob_candidates(core, structure, known, sp, point, ob_rr, ob_sl_buffer, ob_expiry, max_ob,
+                   start, end):
+    """
+    Limit order at the near edge of the zone once the OB's break is known
+    max_ob: only the newest `max_ob` known OBs keep their order (like the
+    EAs' drawn OBs) - an order is cancelled when the max_ob-th newer OB appears
+    """
+    first_known = {}
+    for name in ('bos', 'choch'):
+        for brk, k in zip(structure[name], known[name].tolist()):
+            first_known[brk.break_bar] = min(k, first_known.get(brk.break_bar, k))
+
+    obs = [ob for ob in structure['order_blocks'] if ob.break_bar in first_known]
+    if not obs:
+        return None
+    signal = np.array([first_known[ob.break_bar] for ob in obs], dtype=np.int64)
+    bull = np.array([ob.bullish for ob in obs])
+    highs = np.array([ob.high for ob in obs])
+    lows = np.array([ob.low for ob in obs])
+    direction = np.where(bull, 1, -1).astype(np.int8)
+
+    # Buy limit at the zone high fills when the ask gets there, sell limit at the zone low
+    # (only orders that can still be live inside [start, end) are scanned)
+    live = (signal < end - 1) & (signal + ob_expiry >= start)
+    fill = np.full(len(obs), -1, dtype=np.int64)
+    buy, sell = bull & live, ~bull & live
+    fill[buy] = find_first_breaks(core.lows[:end], signal[buy], highs[buy] - sp[signal[buy]],
+                                  above=False, inclusive=True)
+    fill[sell] = find_first_breaks(core.highs[:end], signal[sell], lows[sell],
+                                   above=True, inclusive=True)
+    valid = (fill >= start) & (fill - signal <= ob_expiry)
+    if max_ob is not None:
+        order = np.argsort(signal, kind='stable')
+        dropped = np.full(len(obs), np.iinfo(np.int64).max)
+        dropped[order[:-max_ob or None]] = signal[order][max_ob:]
+        valid &= fill <= dropped
+    entry_bar = np.where(valid, fill, 0)
+
+    # A gap through the limit fills at the open
+    opens = core.opens[entry_bar]
+    entry = np.where(bull, np.minimum(opens + sp[entry_bar], highs), np.maximum(opens, lows))
+    buffer = ob_sl_buffer * point
+    sl = np.where(bull, lows - buffer, highs + buffer)
+    risk = direction * (entry - sl)
+    valid &= risk > 0
+    tp = entry + direction * ob_rr * risk
+
+    return _candidates(signal, entry_bar, direction, 2, entry, sl, tp, valid)
+
+
+def _candidates(signal, entry_bar, direction, source, entry, sl, tp, valid):
+    out = np.zeros(int(np.count_nonzero(valid)), dtype=TRADE_DTYPE)
+    out['signal_bar'] = signal[valid]
+    out['entry_bar'] = entry_bar[valid]
+    out['direction'] = direction[valid]
+    out['source'] = source
+    out['entry'] = entry[valid]
+    out['sl'] = sl[valid]
+    out['tp'] = tp[valid]
+    return out
+
+
+# =============================================================================
+#                         Simulation
+# =============================================================================
+
+def _resolve_exits(core, trades, sp, end):
+    """
+    Exit bar / price / reason of every candidate independently
+    Longs exit on the bid (bar prices), shorts on the ask (+ spread);
+    SL wins when SL and TP trade in the same bar, still open = closed on bar end - 1
+    """
+    n = end                                   # sentinel: not hit before the window ends
+    long = trades['direction'] > 0
+    start = trades['entry_bar'] - 1           # find_first_breaks checks bars > start
+    spread = sp[trades['entry_bar']]
+
+    up = find_first_breaks(core.highs[:end], start,
+                           np.where(long, trades['tp'], trades['sl'] - spread),
+                           above=True, inclusive=True)
+    down = find_first_breaks(core.lows[:end], start,
+                             np.where(long, trades['sl'], trades['tp'] - spread),
+                             above=False, inclusive=True)
+    sl_bar = np.where(long, down, up)
+    tp_bar = np.where(long, up, down)
+    sl_bar = np.where(sl_bar < 0, n, sl_bar)
+    tp_bar = np.where(tp_bar < 0, n, tp_bar)
+
+    exit_bar = np.minimum(sl_bar, tp_bar)
+    reason = np.where(exit_bar == n, 2, np.where(sl_bar <= tp_bar, 0, 1))
+    exit_bar = np.minimum(exit_bar, n - 1)
+
+    # Gap past the level on a later bar: filled at that bar's open
+    gap = exit_bar > trades['entry_bar']
+    open_px = core.opens[exit_bar] + np.where(long, 0.0, spread)
+    stop_px = np.where(long, np.minimum(trades['sl'], open_px), np.maximum(trades['sl'], open_px))
+    take_px = np.where(long, np.maximum(trades['tp'], open_px), np.minimum(trades['tp'], open_px))
+    stop_px = np.where(gap, stop_px, trades['sl'])
+    take_px = np.where(gap, take_px, trades['tp'])
+    last_px = core.closes[end - 1] + np.where(long, 0.0, spread)
+
+    trades['exit_bar'] = exit_bar
+    trades['reason'] = reason
+    trades['exit'] = np.select([reason == 0, reason == 1], [stop_px, take_px], last_px)
+
+
+def _select(trades, max_positions):
+    """Candidates in entry order, skipped while `max_positions` trades are open"""
+    order = np.lexsort((trades['source'], trades['entry_bar']))
+    entry_bars = trades['entry_bar'][order].tolist()
+    exit_bars = trades['exit_bar'][order].tolist()
+    taken = []
+    open_exits = []
+    for i, entry_bar, exit_bar in zip(order.tolist(), entry_bars, exit_bars):
+        # A position closed on the entry bar was still open at its open
+        while open_exits and open_exits[0] < entry_bar:
+            heapq.heappop(open_exits)
+        if len(open_exits) < max_positions:
+            heapq.heappush(open_exits, exit_bar)
+            taken.append(i)
+    return trades[np.array(taken, dtype=np.int64)]
+
+
+def _equity(core, trades, deposit, money_per_price, sp, start, end):
+    """
+    Per-bar equity on the close and at the worst intrabar price
+    (balance + floating P/L of the open positions), bars [start, end)
+    """
+    n = end - start
+    realized = np.bincount(trades['exit_bar'] - start, weights=trades['profit'], minlength=n)
+    balance = deposit + np.cumsum(realized)
+    floating = np.zeros(n)
+    worst = np.zeros(n)
+
+    lengths = trades['exit_bar'] - trades['entry_bar']
+    total = int(lengths.sum())
+    if total:
+        owner = np.repeat(np.arange(len(trades)), lengths)
+        bars = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) \
+            + trades['entry_bar'][owner]
+        direction = trades['direction'][owner].astype(np.float64)
+        entry = trades['entry'][owner]
+        spread = np.where(direction > 0, 0.0, sp[trades['entry_bar']][owner])
+        close_px = core.closes[bars] + spread
+        worst_px = np.where(direction > 0, core.lows[bars], core.highs[bars] + spread)
+        floating = np.bincount(bars - start, direction * (close_px - entry) * money_per_price,
+                               minlength=n)
+        worst = np.bincount(bars - start, direction * (worst_px - entry) * money_per_price,
+                            minlength=n)
+
+    return balance + floating, balance + worst
+
+
+class BacktestReport:
+    """
+    Outcome of one backtest - the BacktestResult fields plus the trades
+    (TRADE_DTYPE, exit order) and the per-bar equity
+
+    BacktestResult(**report.metrics())     # mt5_complete_automation
+    """
+
+    def __init__(self, symbol, timeframe, params, trades, equity, times, bars, structure_ms, elapsed_ms,
+                 deposit, start=0):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.params = params
+        self.trades = trades
+        self.equity = equity
+        self.times = times
+        self.bars = bars
+        self.structure_ms = structure_ms
+        self.elapsed_ms = elapsed_ms
+        self.deposit = deposit
+        self.start = start          # bar of the core where times / equity begin
+        self.success = True
+        self.report_path = ""
+        self.error = ""
+
+        profit = trades['profit']
+        self.total_trades = len(trades)
+        self.total_profit = float(profit.sum())
+        self.gross_profit = float(profit[profit > 0].sum())
+        self.gross_loss = float(-profit[profit < 0].sum())
+        self.win_rate = float((profit > 0).mean() * 100) if len(profit) else 0.0
+        # No losing trade -> 0, like an empty tester report field
+        self.profit_factor = self.gross_profit / self.gross_loss if self.gross_loss else 0.0
+        self.expected_payoff = self.total_profit / len(profit) if len(profit) else 0.0
+
+        # Per-trade return on the balance before it (tester-style Sharpe)
+        before = deposit + np.concatenate([[0.0], np.cumsum(profit)[:-1]])
+        returns = profit / before
+        std = returns.std() if len(returns) > 1 else 0.0
+        self.sharpe_ratio = float(returns.mean() / std) if std > 0 else 0.0
+
+        self.max_drawdown = 0.0
+        self.max_drawdown_pct = 0.0
+        if equity is not None and len(equity[0]):
+            close_equity, worst_equity = equity
+            peak = np.maximum.accumulate(np.concatenate([[deposit], close_equity]))[:-1]
+            drawdown = peak - worst_equity
+            at = int(drawdown.argmax())
+            self.max_drawdown = float(max(drawdown[at], 0.0))
+            self.max_drawdown_pct = float(self.max_drawdown / peak[at] * 100) if peak[at] > 0 else 0.0
+        self.recovery_factor = self.total_profit / self.max_drawdown if self.max_drawdown else 0.0
+        self.final_balance = deposit + self.total_profit
+
+    def metrics(self):
+        """Exactly the BacktestResult fields"""
+        return {name: getattr(self, name) for name in RESULT_FIELDS}
+
+    def _time(self, bar):
+        return str(datetime.fromtimestamp(int(self.times[bar - self.start]), tz=timezone.utc))
+
+    def trade_dicts(self):
+        return [
+            {
+                'signal_bar': int(t['signal_bar']),
+                'entry_bar': int(t['entry_bar']),
+                'exit_bar': int(t['exit_bar']),
+                'entry_time': self._time(t['entry_bar']),
+                'exit_time': self._time(t['exit_bar']),
+                'type': 'BUY' if t['direction'] > 0 else 'SELL',
+                'source': SOURCES[t['source']],
+                'entry': float(t['entry']),
+                'sl': float(t['sl']),
+                'tp': float(t['tp']),
+                'exit': float(t['exit']),
+                'reason': EXIT_REASONS[t['reason']],
+                'profit': round(float(t['profit']), 2),
+            }
+            for t in self.trades
+        ]
+
+    def to_dict(self, trades=False):
+        out = {
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'params': self.params,
+            'bars': self.bars,
+            **self.metrics(),
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'final_balance': self.final_balance,
+            'long_trades': int((self.trades['direction'] > 0).sum()),
+            'short_trades': int((self.trades['direction'] < 0).sum()),
+            'by_source': {name: int((self.trades['source'] == i).sum()) for i, name in enumerate(SOURCES)},
+            'structure_ms': self.structure_ms,
+            'elapsed_ms': self.elapsed_ms,
+        }
+        if trades:
+            out['trades'] = self.trade_dicts()
+        return out
+
+
+def backtest(core, structure=None, profile='v3', swing_strength=None, entries=('bos', 'choch'),
+             sl_points=500, tp_points=1000, sl_atr=None, tp_atr=None, atr_period=14,
+             ob_rr=2.0, ob_sl_buffer=0, ob_expiry=50, max_ob=None, ob_lookback=None, spread=10,
+             commission=0.0, lots=0.1, contract_size=100_000, point=None, deposit=10_000.0,
+             max_positions=1, window=None, symbol="", timeframe=""):
+    """
+    Backtest the profile's signals on one SMCCore
+
+    structure: market_structure() output to reuse (e.g. cached across a sweep)
+    entries: any of 'bos', 'choch' (TradeOnBOS / TradeOnCHoCH), 'ob' (OB retest)
+    ob_lookback: candles searched before a break for its OB (profile default)
+    sl_points / tp_points: fixed distances, replaced by sl_atr / tp_atr x ATR when set
+    spread: points, scalar or per bar; commission: money per lot and side
+    window: (start, end) bars - entries inside it, open trades closed on bar end - 1;
+            the structure still comes from the whole core (signals are point-in-time)
+    """
+    started = time.perf_counter()
+    n = len(core)
+    start, end = window or (0, n)
+    start, end = max(0, start), min(n, end)
+    strength = swing_strength or SWING_STRENGTH[profile]
+    entries = tuple(entries)
+    if structure is None:
+        structure = market_structure(core, profile, strength, 'ob' in entries, ob_lookback)
+    structure_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    point = point or guess_point(core.closes)
+    sp = np.broadcast_to(np.asarray(spread, dtype=np.float64) * point, (n,))
+    known = signal_bars(profile, structure, strength, core)
+
+    parts = []
+    for source, name in enumerate(('bos', 'choch')):
+        if name in entries and structure[name]:
+            parts.append(_break_candidates(core, structure[name], known[name], source, sp, point,
+                                           sl_points, tp_points, sl_atr, tp_atr, atr_period,
+                                           start, end))
+    if 'ob' in entries and structure['order_blocks']:
+        parts.append(_ob_candidates(core, structure, known, sp, point, ob_rr, ob_sl_buffer,
+                                    ob_expiry, max_ob, start, end))
+    parts = [p for p in parts if p is not None and len(p)]
+    trades = np.concatenate(parts) if parts else np.zeros(0, dtype=TRADE_DTYPE)
+
+    money_per_price = contract_size * lots
+    if len(trades):
+        _resolve_exits(core, trades, sp, end)
+        trades = _select(trades, max_positions)
+        trades['profit'] = (trades['direction'] * (trades['exit'] - trades['entry']) * money_per_price
+                            - 2 * commission * lots)
+        trades = trades[np.lexsort((trades['entry_bar'], trades['exit_bar']))]
+
+    equity = _equity(core, trades, deposit, money_per_price, sp, start, end) if end > start else None
+    params = {
+        'profile': profile, 'swing_strength': strength, 'entries': list(entries),
+        'sl_points': sl_points, 'tp_points': tp_points, 'sl_atr': sl_atr, 'tp_atr': tp_atr,
+        'ob_rr': ob_rr, 'ob_sl_buffer': ob_sl_buffer, 'ob_expiry': ob_expiry, 'max_ob': max_ob,
+        'ob_lookback': ob_lookback or OB_LOOKBACK[profile],
+        'spread': spread if np.ndim(spread) == 0 else 'per bar', 'commission': commission,
+        'lots': lots, 'point': point, 'deposit': deposit, 'max_positions': max_positions,
+    }
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    return BacktestReport(symbol, timeframe, params, trades, equity, epochs_of(core.times[start:end]),
+                          end - start, structure_ms, elapsed_ms, deposit, start)
+
+
+def backtest_rates(rates, spread=None, **params):
+    """backtest() on mt5.copy_rates_* output - spread=None uses the rates' spread column"""
+    if spread is None:
+        spread = rates['spread'].astype(np.float64) if 'spread' in rates.dtype.names else 10
+    return backtest(SMCCore.from_rates(rates), spread=spread, **params)
+
+
+# =============================================================================
+#                         Benchmark / CLI
+# =============================================================================
+
+def bars_per_year(timeframe):
+    """Trading bars in a year (5 days x 24 h) for a MT5 timeframe constant"""
+    return int(52 * 5 * 86400 // TIMEFRAME_SECONDS[timeframe])
+
+
+def benchmark(timeframes=('M5', 'M15', 'H1', 'H4'), entries=('bos', 'choch', 'ob'), repeat=3, seed=42):
+    """Best-of-`repeat` time for one synthetic symbol-year per timeframe"""
+    rows = []
+    for name in timeframes:
+        timeframe = TIMEFRAMES[name]
+        bars = bars_per_year(timeframe)
+        rates = SyntheticProvider(bars=bars, seed=seed).get_rates("EURUSD", timeframe, bars)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            report = backtest_rates(rates, entries=entries)
+            seconds = time.perf_counter() - started
+            if best is None or seconds < best[0]:
+                best = (seconds, report)
+        seconds, report = best
+        rows.append({'timeframe': name, 'bars': bars, 'trades': report.total_trades,
+                     'structure_ms': report.structure_ms, 'seconds': seconds})
+    return rows
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print(f"   Backtest ({report.symbol} {report.timeframe}, {report.params['profile']}, "
+          f"{'+'.join(report.params['entries'])}):")
+    print(f"   - Bars: {report.bars}")
+    print(f"   - Trades: {report.total_trades} (win rate {report.win_rate:.1f}%)")
+    print(f"   - Net profit: {report.total_profit:.2f} (PF {report.profit_factor:.2f}, "
+          f"payoff {report.expected_payoff:.2f})")
+    print(f"   - Max drawdown: {report.max_drawdown:.2f} ({report.max_drawdown_pct:.2f}%)")
+    print(f"   - Sharpe: {report.sharpe_ratio:.3f}, recovery factor: {report.recovery_factor:.2f}")
+    print(f"   - Time: {report.elapsed_ms:.1f} ms (structure {report.structure_ms:.1f} ms)")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native vectorized SMC backtest (no terminal)")
+    parser.add_argument("--symbol", default="EURUSD")
+    parser.add_argument("--timeframe", default="H1", choices=list(TIMEFRAMES))
+    parser.add_argument("--from", dest="date_from", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (default: now)")
+    parser.add_argument("--bars", type=int, default=None, help="last N bars instead of a date range")
+    parser.add_argument("--profile", default="v3", choices=list(SWING_STRENGTH))
+    parser.add_argument("--swing-strength", type=int, default=None)
+    parser.add_argument("--entries", nargs="+", default=["bos", "choch"], choices=["bos", "choch", "ob"])
+    parser.add_argument("--sl", type=float, default=500, help="stop loss (points)")
+    parser.add_argument("--tp", type=float, default=1000, help="take profit (points)")
+    parser.add_argument("--sl-atr", type=float, default=None, help="stop loss as ATR multiple")
+    parser.add_argument("--tp-atr", type=float, default=None, help="take profit as ATR multiple")
+    parser.add_argument("--ob-rr", type=float, default=2.0, help="OB take profit / risk")
+    parser.add_argument("--spread", type=float, default=None, help="points (default: bars' spread)")
+    parser.add_argument("--commission", type=float, default=0.0, help="money per lot and side")
+    parser.add_argument("--lots", type=float, default=0.1)
+    parser.add_argument("--deposit", type=float, default=10_000.0)
+    parser.add_argument("--max-positions", type=int, default=1)
+    parser.add_argument("--json", default=None, help="write the report (with trades) here")
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir>")
+    parser.add_argument("--benchmark", action="store_true", help="time per symbol-year")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print("=" * 60)
+        print(f"   Backtest speed per symbol-year ({datetime.now():%Y-%m-%d %H:%M})")
+        print("=" * 60)
+        print(f"{'timeframe':>10} {'bars':>8} {'trades':>7} {'structure ms':>13} {'total ms':>9}")
+        for row in benchmark():
+            print(f"{row['timeframe']:>10} {row['bars']:>8} {row['trades']:>7} "
+                  f"{row['structure_ms']:>13.1f} {row['seconds'] * 1000:>9.1f}")
+        print("=" * 60)
+        return 0
+
+    timeframe = TIMEFRAMES[args.timeframe]
+    provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+    if not provider.connect():
+        print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+        return 1
+    try:
+        provider.select_symbol(args.symbol)
+        if args.bars or not args.date_from:
+            rates = provider.get_rates(args.symbol, timeframe, args.bars or bars_per_year(timeframe))
+        else:
+            date_to = (datetime.strptime(args.date_to, "%Y-%m-%d") if args.date_to
+                       else datetime.now(tz=timezone.utc))
+            rates = provider.get_rates_range(args.symbol, timeframe,
+                                             datetime.strptime(args.date_from, "%Y-%m-%d"), date_to)
+    finally:
+        provider.shutdown()
+    if rates is None or len(rates) == 0:
+        print(f"[ERROR] No bars for {args.symbol} {args.timeframe}: {provider.last_error()}")
+        return 1
+
+    report = backtest_rates(
+        rates, spread=args.spread, profile=args.profile, swing_strength=args.swing_strength,
+        entries=args.entries, sl_points=args.sl, tp_points=args.tp, sl_atr=args.sl_atr,
+        tp_atr=args.tp_atr, ob_rr=args.ob_rr, commission=args.commission, lots=args.lots,
+        deposit=args.deposit, max_positions=args.max_positions,
+        symbol=args.symbol, timeframe=args.timeframe
+    )
+    print_report(report)
+    if args.json:
+        report.report_path = write_json_atomic(args.json, report.to_dict(trades=True))
+        print(f"[OK] Report saved to: {report.report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+=============================================================================
+    SMC Analyzer Base - data provider, bars and export shared by
+    SMCAnalyzer / SMCAnalyzerV2 / SMCAnalyzerV3
+=============================================================================
+"""
+
+import os
+
+import pandas as pd
+
+from data_providers import TIMEFRAMES, timeframe_name, get_default_provider
+from smc_core import SMCCore, fair_value_gaps, equal_levels
+from smc_export import SignalWriter, write_json_atomic
+from smc_binary import binary_path, write_binary
+from smc_profiling import Instrumentation, REGISTRY, format_stages
+
+
+class SMCAnalyzerBase:
+    """
+    Common plumbing - subclasses only choose a rule profile from smc_core
+    """
+
+    def __init__(self, symbol="EURUSD", timeframe=TIMEFRAMES['H1'], provider=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.provider = provider or get_default_provider()
+        self.data = None
+        self.fvgs = []
+        self.equal_levels = []
+        self.bar_store = None  # optional BarStore - get_data() tops it up instead of a full fetch
+        self.versioned_export = False  # True: export_to_json adds "seq" + <file>.delta.jsonl
+        self.binary_export = False     # True: export_to_json also writes <file>.smcb (fixed-width)
+        self._writers = {}
+        self._core = None
+        self._core_data = None
+        # Per-stage timing of analyze() (SMC_INSTRUMENT=memory,cprofile / off)
+        self.instrument = Instrumentation.from_env()
+        self.last_report = None
+
+    def connect(self):
+        if not self.provider.connect():
+            print(f"[ERROR] Failed to connect to {self.provider.name}: {self.provider.last_error()}")
+            return False
+        print(f"[OK] Connected to {self.provider.name}")
+        return True
+
+    def shutdown(self):
+        self.provider.shutdown()
+
+    def get_data(self, bars=500):
+        if self.bar_store is not None:
+            return self._get_data_from_store(bars)
+
+        with self._stage('fetch') as stage:
+            rates = self.provider.get_rates(self.symbol, self.timeframe, bars)
+            stage['bars'] = None if rates is None else len(rates)
+        if rates is None:
+            print(f"[ERROR] Failed to get data: {self.provider.last_error()}")
+            return False
+
+        with self._stage('dataframe', bars=len(rates)):
+            self.data = pd.DataFrame(rates)
+            self.data['time'] = pd.to_datetime(self.data['time'], unit='s')
+        print(f"[OK] Fetched {len(self.data)} bars")
+        return True
+
+    def _get_data_from_store(self, bars):
+        """Top up the bar store, then analyze a zero-copy slice of it"""
+        tf_name = self._timeframe_to_string()
+        # Release the previous memmap views - a deeper history replaces the file
+        self._core = None
+        self._core_data = None
+        with self._stage('fetch') as stage:
+            added = self.bar_store.update(self.symbol, tf_name, self.timeframe, bars, self.provider)
+            stage['new_bars'] = added
+        if added is None:
+            return False
+
+        rates = self.bar_store.read(self.symbol, tf_name, bars)
+        with self._stage('dataframe', bars=len(rates)):
+            self.data = pd.DataFrame(rates)
+            self.data['time'] = pd.to_datetime(self.data['time'], unit='s')
+            # Core arrays are views on the memmap (no copy)
+            self._core = SMCCore.from_rates(rates)
+            self._core_data = self.data
+        print(f"[OK] {len(self.data)} bars from store ({added} new)")
+        return True
+
+    # -------------------------------------------------------------------------
+    #   Stage instrumentation (smc_profiling)
+    # -------------------------------------------------------------------------
+
+    def _begin_stages(self, profile):
+        self.instrument.begin(self.symbol, self._timeframe_to_string(), profile)
+
+    def _stage(self, name, bars=None):
+        """with self._stage('swings'): ... - bars defaults to len(self.data)"""
+        if bars is None and self.data is not None:
+            bars = len(self.data)
+        return self.instrument.stage(name, bars)
+
+    def _end_stages(self):
+        """
+        Close the run: stage table after the summary, and with SMC_INSTRUMENT_DIR
+        set, smc_stages.json / smc_stages.prom for every run of the process
+        """
+        self.last_report = self.instrument.end()
+        if self.last_report is None or not self.instrument.enabled:
+            return self.last_report
+        print("\n[Stages]")
+        print(format_stages(self.last_report))
+        out_dir = os.environ.get('SMC_INSTRUMENT_DIR')
+        if out_dir:
+            json_path, prom_path = REGISTRY.write(out_dir)
+            print(f"[OK] Stage metrics saved to: {json_path}, {prom_path}")
+        return self.last_report
+
+    @property
+    def core(self):
+        """SMCCore over self.data (rebuilt only when self.data is replaced)"""
+        if self._core is None or self._core_data is not self.data:
+            self._core = SMCCore.from_frame(self.data)
+            self._core_data = self.data
+        return self._core
+
+    def find_fair_value_gaps(self, min_size=0.0):
+        """
+        Three-candle Fair Value Gaps (same rule as SMC_Indicator_Pro)
+        with partial / full fill tracking; min_size in price units
+        """
+        self.fvgs = fair_value_gaps(self.core, min_size)
+
+        open_gaps = sum(1 for gap in self.fvgs if not gap.filled)
+        print(f"[OK] Found {len(self.fvgs)} FVGs ({open_gaps} unfilled)")
+        return self.fvgs
+
+    def find_equal_levels(self, tolerance=None, atr_mult=0.1, max_gap=None):
+        """
+        Equal highs / lows (EQH / EQL) among self.swings
+        tolerance in price units (e.g. 0.0002 = 2 pips), else atr_mult x ATR(14)
+        max_gap: most bars between two members of one level (None = no limit)
+        """
+        self.equal_levels = equal_levels(self.core, self.swings, tolerance, atr_mult,
+                                         max_gap=max_gap)
+
+        eqh = sum(1 for level in self.equal_levels if level.type == 'EQH')
+        print(f"[OK] Found {eqh} EQH, {len(self.equal_levels) - eqh} EQL")
+        return self.equal_levels
+
+    def _write_json(self, result, filepath, records=None):
+        """
+        Atomic write (temp file + rename); versioned mode also appends the delta
+        records: the collections behind `result`, for the binary file
+        """
+        seq = 0
+        if not self.versioned_export:
+            write_json_atomic(filepath, result)
+        else:
+            writer = self._writers.get(filepath)
+            if writer is None:
+                writer = self._writers[filepath] = SignalWriter(filepath)
+            seq = writer.write(result)
+            if seq is None:
+                print(f"[OK] No changes since seq {writer.seq} - {filepath} kept")
+                return filepath
+            print(f"[OK] seq {seq} written, delta appended to {writer.log_path}")
+
+        if self.binary_export and records is not None:
+            path = write_binary(binary_path(filepath), records, self.symbol,
+                                self._timeframe_to_string(), seq)
+            print(f"[OK] Binary signals saved to: {path}")
+        return filepath
+
+    def _timeframe_to_string(self):
+        return timeframe_name(self.timeframe) or 'H1'
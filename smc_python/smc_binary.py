@@ -0,0 +1,247 @@
+"""
+=============================================================================
+    SMC Binary - fixed-width signal file for the MQL5 drawer (.smcb)
+    - one header + typed record arrays, little-endian, no padding
+      (MQL5 structs are pack(1) by default -> FileReadStruct / FileReadArray)
+    - times are epoch seconds (MQL5 datetime), no string parsing on load
+
+    [Header][Swing x n0][Break x n1 (BOS)][Break x n2 (CHoCH)]
+    [OrderBlock x n3][FVG x n4][EqualLevel x n5]
+
+    python smc_binary.py            # load-time benchmark: JSON vs binary
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smc_export import write_bytes_atomic
+
+
+MAGIC = b'SMCB'
+VERSION = 1
+
+# Record section order in the file (= order of header 'counts')
+SECTIONS = ('swings', 'bos', 'choch', 'order_blocks', 'fvgs', 'equal_levels')
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('header_size', '<u2'),
+    ('seq', '<i8'),
+    ('generated', '<i8'),
+    ('symbol', 'S16'),
+    ('timeframe', 'S8'),
+    ('counts', '<i4', (len(SECTIONS),)),
+])
+
+SWING_DTYPE = np.dtype([
+    ('time', '<i8'), ('price', '<f8'), ('bar_index', '<i4'),
+    ('direction', 'i1'), ('label', 'i1'),
+])
+
+BREAK_DTYPE = np.dtype([
+    ('start_time', '<i8'), ('break_time', '<i8'), ('level', '<f8'),
+    ('start_bar', '<i4'), ('break_bar', '<i4'), ('direction', 'i1'),
+])
+
+ORDER_BLOCK_DTYPE = np.dtype([
+    ('time', '<i8'), ('mitigated_time', '<i8'),
+    ('high', '<f8'), ('low', '<f8'), ('open', '<f8'), ('close', '<f8'),
+    ('bar_index', '<i4'), ('direction', 'i1'), ('source', 'i1'), ('flags', 'u1'),
+])
+
+FVG_DTYPE = np.dtype([
+    ('time', '<i8'), ('filled_time', '<i8'),
+    ('top', '<f8'), ('bottom', '<f8'), ('fill_ratio', '<f8'),
+    ('bar_index', '<i4'), ('direction', 'i1'), ('flags', 'u1'),
+])
+
+EQUAL_LEVEL_DTYPE = np.dtype([
+    ('first_time', '<i8'), ('last_time', '<i8'), ('swept_time', '<i8'),
+    ('level', '<f8'), ('top', '<f8'), ('bottom', '<f8'),
+    ('count', '<i4'), ('direction', 'i1'), ('flags', 'u1'),
+])
+
+RECORD_DTYPES = {
+    'swings': SWING_DTYPE,
+    'bos': BREAK_DTYPE,
+    'choch': BREAK_DTYPE,
+    'order_blocks': ORDER_BLOCK_DTYPE,
+    'fvgs': FVG_DTYPE,
+    'equal_levels': EQUAL_LEVEL_DTYPE,
+}
+
+# Codes shared with SMC_Drawer_V2.mq5
+SWING_LABELS = ('', 'HH', 'HL', 'LH', 'LL', 'SH', 'SL')    # label index
+OB_SOURCES = (None, 'BOS', 'CHoCH')                        # source index
+FLAG_MITIGATED, FLAG_INVALIDATED = 1, 2                    # order_blocks flags
+FLAG_PARTIAL, FLAG_FILLED = 1, 2                           # fvgs flags
+FLAG_SWEPT = 1                                             # equal_levels flags
+
+
+def _direction(record_type):
+    """+1 bullish / high side, -1 bearish / low side"""
+    kind = str(record_type).upper()
+    return 1 if ('BULL' in kind or kind in ('HIGH', 'EQH')) else -1
+
+
+def _epoch(value):
+    return 0 if value is None else int(value)
+
+
+def _rows(name, records):
+    """Records of one collection -> tuples in RECORD_DTYPES[name] order"""
+    if name == 'swings':
+        return [(r.time, r.price, r.bar_index, _direction(r.type),
+                 SWING_LABELS.index(r.label) if r.label in SWING_LABELS else 0)
+                for r in records]
+    if name in ('bos', 'choch'):
+        return [(r.start_time, r.break_time, r.level, r.start_bar, r.break_bar,
+                 _direction(r.type)) for r in records]
+    if name == 'order_blocks':
+        return [(r.time, _epoch(r.mitigated_time), r.high, r.low, r.open, r.close, r.bar_index,
+                 _direction(r.type), OB_SOURCES.index(r.source) if r.source in OB_SOURCES else 0,
+                 FLAG_MITIGATED * bool(r.mitigated) | FLAG_INVALIDATED * bool(r.invalidated))
+                for r in records]
+    if name == 'fvgs':
+        return [(r.time, _epoch(r.filled_time), r.top, r.bottom, r.fill_ratio, r.bar_index,
+                 _direction(r.type), FLAG_PARTIAL * bool(r.partial) | FLAG_FILLED * bool(r.filled))
+                for r in records]
+    return [(r.first_time, r.last_time, _epoch(r.swept_time), r.level, r.top, r.bottom, r.count,
+             _direction(r.type), FLAG_SWEPT * bool(r.swept))
+            for r in records]
+
+
+def pack_signals(result, symbol, timeframe, seq=0):
+    """{'swings': [Swing], ...} (profile output) -> .smcb bytes"""
+    arrays = [np.array(_rows(name, result.get(name, [])), dtype=RECORD_DTYPES[name])
+              for name in SECTIONS]
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['header_size'] = HEADER_DTYPE.itemsize
+    header['seq'] = seq or 0
+    header['generated'] = int(time.time())
+    header['symbol'] = symbol.encode('ascii')[:16]
+    header['timeframe'] = str(timeframe).encode('ascii')[:8]
+    header['counts'] = [len(a) for a in arrays]
+
+    return b''.join([header.tobytes()] + [a.tobytes() for a in arrays])
+
+
+def binary_path(json_path):
+    """smc_signals_v3.json -> smc_signals_v3.smcb"""
+    return os.path.splitext(json_path)[0] + ".smcb"
+
+
+def write_binary(path, result, symbol, timeframe, seq=0):
+    """Atomic .smcb write (temp file + rename), like the JSON export"""
+    return write_bytes_atomic(path, pack_signals(result, symbol, timeframe, seq))
+
+
+def unpack_signals(data):
+    """.smcb bytes -> (header record, {collection: structured array}) - zero copy"""
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != MAGIC or header['version'] != VERSION:
+        raise ValueError(f"not an SMCB v{VERSION} file (magic={header['magic']!r}, "
+                         f"version={header['version']})")
+
+    offset = int(header['header_size'])
+    arrays = {}
+    for name, count in zip(SECTIONS, header['counts'].tolist()):
+        dtype = RECORD_DTYPES[name]
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+    return header, arrays
+
+
+def read_binary(path):
+    with open(path, 'rb') as f:
+        return unpack_signals(f.read())
+
+
+# =============================================================================
+#                         Load-time benchmark (JSON vs binary)
+# =============================================================================
+
+def benchmark_load(sizes=(500, 5_000, 50_000, 200_000), repeat=5, seed=42):
+    """
+    Bytes on disk and best-of-`repeat` load time (file read + parse) per format
+    for V3 results; binary arrays are copied out like FileReadArray does
+    """
+    from data_providers import SyntheticProvider, TIMEFRAMES
+    from smc_core import SMCCore, PROFILES, signal_payload
+
+    rates = SyntheticProvider(bars=max(sizes), seed=seed).get_rates(
+        "BENCH", TIMEFRAMES['H1'], max(sizes))
+    tmp = tempfile.mkdtemp(prefix="smcb_")
+    json_file = os.path.join(tmp, "bench.json")
+    rows = []
+    for n in sizes:
+        result = PROFILES['v3'](SMCCore.from_rates(rates[-n:]), max_ob=None)
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(signal_payload('v3', "BENCH", "H1", result), f, indent=2, default=str)
+        smcb_file = write_binary(binary_path(json_file), result, "BENCH", "H1")
+
+        def load_json():
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        def load_binary():
+            header, arrays = read_binary(smcb_file)
+            return header, {name: a.copy() for name, a in arrays.items()}
+
+        def best(fn):
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+            return min(times)
+
+        rows.append({
+            'bars': n,
+            'objects': sum(len(v) for v in result.values()),
+            'json_bytes': os.path.getsize(json_file),
+            'binary_bytes': os.path.getsize(smcb_file),
+            'json_load': best(load_json),
+            'binary_load': best(load_binary),
+        })
+    for path in (json_file, binary_path(json_file)):
+        os.remove(path)
+    os.rmdir(tmp)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMCB load benchmark (JSON vs fixed-width binary)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5_000, 50_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"   SMCB vs JSON ({datetime.now():%Y-%m-%d %H:%M}) - Python side load")
+    print("=" * 72)
+    print(f"{'bars':>8} {'objects':>8} {'json KB':>9} {'smcb KB':>9} {'json ms':>9} {'smcb ms':>9} {'x':>7}")
+    for row in benchmark_load(args.sizes, args.repeat):
+        print(f"{row['bars']:>8} {row['objects']:>8} {row['json_bytes'] / 1024:>9.0f} "
+              f"{row['binary_bytes'] / 1024:>9.0f} {row['json_load'] * 1000:>9.2f} "
+              f"{row['binary_load'] * 1000:>9.3f} {row['json_load'] / row['binary_load']:>7.0f}")
+    print("=" * 72)
+    print("[OK] In MT5: SMC_Drawer_V2 prints the load time of each format (InpUseBinary)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
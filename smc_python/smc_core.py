@@ -0,0 +1,759 @@
+"""
+=============================================================================
+    SMC Core - shared columnar engine for all analyzer versions
+    - OHLC as NumPy arrays, intermediates computed once and cached
+    - V1 / V2 / V3 rules as cheap profile passes over the same core
+    - results are slot records (smc_records), dicts only on export
+=============================================================================
+"""
+
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+
+from smc_kernels import (
+    find_swing_indices,
+    classify_swing_prices,
+    merge_swing_order,
+    find_first_breaks,
+    last_true_index,
+    lookup_before,
+    newest_unique,
+    find_fair_value_gaps,
+    true_range_average,
+    cluster_equal_levels,
+)
+from smc_records import Swing, Break, OrderBlock, FairValueGap, EqualLevel, epochs_of, to_dicts
+from smc_mitigation import mark_mitigation
+
+
+class SMCCore:
+    """
+    Columnar OHLC data + shared intermediates
+    (swing masks per strength, candle direction, epoch times)
+    """
+
+    def __init__(self, times, opens, highs, lows, closes):
+        self.times = np.asarray(times)
+        self.epochs = epochs_of(self.times).tolist()
+        self.opens = np.asarray(opens, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.closes = np.asarray(closes, dtype=np.float64)
+        self._swings = {}
+        self._atr = {}
+
+    @classmethod
+    def from_rates(cls, rates):
+        """Build straight from mt5.copy_rates_* output (epoch-int times)"""
+        return cls(rates['time'], rates['open'], rates['high'], rates['low'], rates['close'])
+
+    @classmethod
+    def from_frame(cls, data):
+        """Build from the analyzers' DataFrame (time, open, high, low, close)"""
+        return cls(
+            data['time'].values,
+            data['open'].values,
+            data['high'].values,
+            data['low'].values,
+            data['close'].values
+        )
+
+    def __len__(self):
+        return len(self.closes)
+
+    # -------------------------------------------------------------------------
+    #   Candle direction
+    # -------------------------------------------------------------------------
+
+    @cached_property
+    def bullish(self):
+        """close > open"""
+        return self.closes > self.opens
+
+    @cached_property
+    def bearish(self):
+        """close < open"""
+        return self.closes < self.opens
+
+    @cached_property
+    def last_bearish(self):
+        """Index of the last bearish candle <= i (-1 = none)"""
+        return last_true_index(self.bearish)
+
+    @cached_property
+    def last_bullish(self):
+        """Index of the last bullish candle <= i (-1 = none)"""
+        return last_true_index(self.bullish)
+
+    def atr(self, period=14):
+        """Average true range per bar (cached per period)"""
+        if period not in self._atr:
+            self._atr[period] = true_range_average(self.highs, self.lows, self.closes, period)
+        return self._atr[period]
+
+    # -------------------------------------------------------------------------
+    #   Swings (cached per strength)
+    # -------------------------------------------------------------------------
+
+    def swing_sequence(self, strength):
+        """
+        All swings ordered by bar (high first on a shared bar)
+
+        Returns (bars, is_low, higher):
+        higher = 1 (HH/HL), 0 (LH/LL), -1 (first swing of its type)
+        """
+        if strength not in self._swings:
+            high_idx, low_idx = find_swing_indices(self.highs, self.lows, strength)
+
+            high_higher = np.full(len(high_idx), -1, dtype=np.int8)
+            high_higher[1:] = classify_swing_prices(self.highs[high_idx])
+            low_higher = np.full(len(low_idx), -1, dtype=np.int8)
+            low_higher[1:] = classify_swing_prices(self.lows[low_idx])
+
+            bars, is_low = merge_swing_order(high_idx, low_idx)
+            # merge_swing_order keeps each type in bar order, so scatter labels back
+            higher = np.empty(len(bars), dtype=np.int8)
+            higher[~is_low] = high_higher
+            higher[is_low] = low_higher
+
+            self._swings[strength] = (bars, is_low, higher)
+        return self._swings[strength]
+
+    # -------------------------------------------------------------------------
+    #   Helpers shared by the profiles
+    # -------------------------------------------------------------------------
+
+    def last_opposite_candle(self, break_bar, bullish_break, lookback):
+        """
+        Last candle against the break direction within `lookback` bars
+        (bearish candle for a bullish break and vice versa), -1 if none
+        """
+        return int(self.opposite_candles([break_bar], [bullish_break], lookback)[0])
+
+    def opposite_candles(self, break_bars, bullish_breaks, lookback):
+        """last_opposite_candle for many breaks at once (prefix-index lookups)"""
+        break_bars = np.asarray(break_bars, dtype=np.int64)
+        bullish_breaks = np.asarray(bullish_breaks, dtype=bool)
+        return np.where(
+            bullish_breaks,
+            lookup_before(self.last_bearish, break_bars, lookback),
+            lookup_before(self.last_bullish, break_bars, lookback)
+        )
+
+
+# =============================================================================
+#                         V1 profile (SMCAnalyzer)
+# =============================================================================
+
+_SWING_LABELS = {(False, -1): 'SH', (False, 1): 'HH', (False, 0): 'LH',
+                 (True, -1): 'SL', (True, 1): 'HL', (True, 0): 'LL'}
+
+
+def v1_swings(core, strength=3):
+    """All swings, first of each type labeled SH / SL"""
+    bars, is_low, higher = core.swing_sequence(strength)
+    epochs = core.epochs
+    swings = []
+    for i, low, h in zip(bars.tolist(), is_low.tolist(), higher.tolist()):
+        swings.append(Swing(
+            'low' if low else 'high',
+            _SWING_LABELS[(low, h)],
+            float(core.lows[i] if low else core.highs[i]),
+            epochs[i],
+            i
+        ))
+    return swings
+
+
+def v1_bos(core, swings):
+    """
+    BOS Bullish: close above a previous swing high
+    BOS Bearish: close below a previous swing low
+    (first break per level, every level broken in one pass)
+    """
+    bos_list = []
+    highs = [s for s in swings if s.type == 'high']
+    lows = [s for s in swings if s.type == 'low']
+
+    for group, above, bos_type in ((highs[:-1], True, 'BOS_BULL'),
+                                   (lows[:-1], False, 'BOS_BEAR')):
+        breaks = find_first_breaks(
+            core.closes,
+            [s.bar_index for s in group],
+            [s.price for s in group],
+            above=above
+        )
+
+        seen = set()
+        for swing, bar in zip(group, breaks.tolist()):
+            level = swing.price
+            if bar < 0 or level in seen:
+                continue
+            seen.add(level)
+            bos_list.append(Break(bos_type, level, swing.time, swing.bar_index,
+                                  core.epochs[bar], bar))
+    return bos_list
+
+
+def v1_choch(core, swings):
+    """
+    CHoCH Bearish: in an uptrend, close below the last HL
+    CHoCH Bullish: in a downtrend, close above the last LH
+    """
+    choch_list = []
+
+    hl_idx = [i for i, s in enumerate(swings) if s.label == 'HL']
+    lh_idx = [i for i, s in enumerate(swings) if s.label == 'LH']
+    first_break = {}
+    for idx, above in ((hl_idx, False), (lh_idx, True)):
+        breaks = find_first_breaks(
+            core.closes,
+            [swings[i].bar_index for i in idx],
+            [swings[i].price for i in idx],
+            above=above
+        )
+        first_break.update(zip(idx, breaks.tolist()))
+
+    is_bullish = False
+    is_bearish = False
+    last_hl = None
+    last_lh = None
+    seen_bear = set()
+    seen_bull = set()
+
+    for i, swing in enumerate(swings):
+        if swing.label == 'HH':
+            is_bullish = True
+            is_bearish = False
+        elif swing.label == 'LL':
+            is_bearish = True
+            is_bullish = False
+
+        if swing.label == 'HL':
+            last_hl = i
+        elif swing.label == 'LH':
+            last_lh = i
+
+        if is_bullish and last_hl is not None:
+            hl = swings[last_hl]
+            bar = first_break[last_hl]
+            if bar >= 0 and hl.price not in seen_bear:
+                seen_bear.add(hl.price)
+                choch_list.append(Break('CHOCH_BEAR', hl.price, hl.time, hl.bar_index,
+                                        core.epochs[bar], bar))
+                is_bullish = False
+                is_bearish = True
+
+        if is_bearish and last_lh is not None:
+            lh = swings[last_lh]
+            bar = first_break[last_lh]
+            if bar >= 0 and lh.price not in seen_bull:
+                seen_bull.add(lh.price)
+                choch_list.append(Break('CHOCH_BULL', lh.price, lh.time, lh.bar_index,
+                                        core.epochs[bar], bar))
+                is_bearish = False
+                is_bullish = True
+
+    return choch_list
+
+
+def _order_block(core, i, ob_type, source=None, break_bar=-1):
+    return OrderBlock(
+        ob_type,
+        float(core.highs[i]),
+        float(core.lows[i]),
+        float(core.opens[i]),
+        float(core.closes[i]),
+        core.epochs[i],
+        i,
+        source,
+        break_bar=break_bar
+    )
+
+
+def _break_order_blocks(core, breaks, lookback, bull_type, bear_type):
+    """One OB per directional break (in break order), all lookups vectorized"""
+    breaks = [brk for brk in breaks if 'BULL' in brk.type or 'BEAR' in brk.type]
+    bullish = [('BULL' in brk.type) for brk in breaks]
+    break_bars = [brk.break_bar for brk in breaks]
+    found = core.opposite_candles(break_bars, bullish, lookback)
+    return mark_mitigation(core, [
+        _order_block(core, i, bull_type if bull else bear_type, break_bar=b)
+        for i, bull, b in zip(found.tolist(), bullish, break_bars) if i >= 0
+    ])
+
+
+def v1_order_blocks(core, breaks, lookback=10):
+    """Last opposite candle within `lookback` bars before every BOS / CHoCH"""
+    return _break_order_blocks(core, breaks, lookback, 'OB_BULL', 'OB_BEAR')
+
+
+# =============================================================================
+#                         V2 profile (SMCAnalyzerV2)
+# =============================================================================
+
+def v2_swings(core, strength=5):
+    """Labeled swings only (HH, HL, LH, LL) - first swing of each type dropped"""
+    return [s for s in v1_swings(core, strength) if s.label in ('HH', 'HL', 'LH', 'LL')]
+
+
+def v2_structure_breaks(core, swings):
+    """
+    BOS / CHoCH on the close that breaks the previous swing
+    before the new HH / LL forms (CHoCH when it flips the trend)
+    """
+    structure_breaks = []
+    closes = core.closes
+    trend = None
+    last_swing_high = None
+    last_swing_low = None
+
+    for swing in swings:
+        if swing.label == 'HH' and last_swing_high:
+            level = last_swing_high.price
+            for bar in range(last_swing_high.bar_index + 1, swing.bar_index + 1):
+                if bar < len(closes) and closes[bar] > level:
+                    break_type = 'CHoCH' if trend == 'bear' else 'BOS'
+                    structure_breaks.append(Break(
+                        f'{break_type}_BULL', level, last_swing_high.time,
+                        last_swing_high.bar_index, core.epochs[bar], bar
+                    ))
+                    trend = 'bull'
+                    break
+
+        if swing.label == 'LL' and last_swing_low:
+            level = last_swing_low.price
+            for bar in range(last_swing_low.bar_index + 1, swing.bar_index + 1):
+                if bar < len(closes) and closes[bar] < level:
+                    break_type = 'CHoCH' if trend == 'bull' else 'BOS'
+                    structure_breaks.append(Break(
+                        f'{break_type}_BEAR', level, last_swing_low.time,
+                        last_swing_low.bar_index, core.epochs[bar], bar
+                    ))
+                    trend = 'bear'
+                    break
+
+        if swing.type == 'high':
+            last_swing_high = swing
+        else:
+            last_swing_low = swing
+
+    # Remove duplicates (same type and level)
+    seen = set()
+    unique_breaks = []
+    for brk in structure_breaks:
+        key = (brk.type, brk.level)
+        if key not in seen:
+            seen.add(key)
+            unique_breaks.append(brk)
+    return unique_breaks
+
+
+def v2_order_blocks(core, structure_breaks, lookback=5):
+    """Last opposite candle within `lookback` bars before every structure break"""
+    return _break_order_blocks(core, structure_breaks, lookback, 'OB_BULL', 'OB_BEAR')
+
+
+# =============================================================================
+#                         V3 profile (SMCAnalyzerV3)
+# =============================================================================
+
+def v3_swings(core, strength=5):
+    """Labeled swings (first of each type dropped)"""
+    return v2_swings(core, strength)
+
+
+def v3_bos_choch(core, swings, state=None):
+    """
+    Swing-driven BOS / CHoCH (reference indicator style)
+    - HH above the last LH: CHoCH in a downtrend, BOS in an uptrend
+    - LL below the last HL: CHoCH in an uptrend, BOS in a downtrend
+    state: dict carried between calls when swings arrive in pieces
+    (chunked backfill) - trend and the last HH / LL / HL / LH, updated in place
+    """
+    bos_list = []
+    choch_list = []
+    state = {} if state is None else state
+    trend = state.get('trend')
+    last_hh = state.get('last_hh')
+    last_ll = state.get('last_ll')
+    last_hl = state.get('last_hl')
+    last_lh = state.get('last_lh')
+
+    for swing in swings:
+        if swing.label == 'HH':
+            if last_lh is not None and swing.price > last_lh.price:
+                if trend == 'bear':
+                    choch_list.append(_v3_break('BULL', last_lh, swing))
+                    trend = 'bull'
+                elif trend == 'bull':
+                    bos_list.append(_v3_break('BULL', last_hh or last_lh, swing))
+                else:
+                    trend = 'bull'
+            last_hh = swing
+
+        elif swing.label == 'LL':
+            if last_hl is not None and swing.price < last_hl.price:
+                if trend == 'bull':
+                    choch_list.append(_v3_break('BEAR', last_hl, swing))
+                    trend = 'bear'
+                elif trend == 'bear':
+                    bos_list.append(_v3_break('BEAR', last_ll or last_hl, swing))
+                else:
+                    trend = 'bear'
+            last_ll = swing
+
+        elif swing.label == 'HL':
+            last_hl = swing
+
+        elif swing.label == 'LH':
+            last_lh = swing
+
+    state.update(trend=trend, last_hh=last_hh, last_ll=last_ll, last_hl=last_hl, last_lh=last_lh)
+    return bos_list, choch_list
+
+
+def _v3_break(direction, origin, swing):
+    """Break confirmed on the bar of the new HH / LL"""
+    return Break(direction, origin.price, origin.time, origin.bar_index,
+                 swing.time, swing.bar_index)
+
+
+def v3_order_blocks(core, bos_list, choch_list, max_ob=20, active_only=False, lookback=10):
+    """
+    Unique OBs (by bar, BOS before CHoCH), newest `max_ob` first
+    (last opposite candle within `lookback` bars before the break)
+    The candle at a bar fixes the OB direction (bearish candle = BULL OB),
+    so dedupe only has to decide the source. Mitigation is tracked from the
+    earliest break that produced the OB; active_only drops invalidated OBs
+    before keeping the newest `max_ob`
+    """
+    def candles(breaks):
+        break_bars = np.array([brk.break_bar for brk in breaks], dtype=np.int64)
+        found = core.opposite_candles(break_bars, ['BULL' in brk.type for brk in breaks], lookback)
+        keep = found >= 0
+        return found[keep], break_bars[keep]
+
+    bos_bars, bos_breaks = candles(bos_list)
+    choch_bars, choch_breaks = candles(choch_list)
+    all_bars = np.concatenate([bos_bars, choch_bars])
+    all_breaks = np.concatenate([bos_breaks, choch_breaks])
+
+    if max_ob is None:
+        max_ob = len(all_bars)
+    bars = np.unique(all_bars)[::-1] if active_only else newest_unique(all_bars, max_ob)
+
+    # Earliest break per selected bar
+    selected = np.isin(all_bars, bars)
+    order = np.lexsort((all_breaks[selected], all_bars[selected]))
+    sel_bars, sel_breaks = all_bars[selected][order], all_breaks[selected][order]
+    unique_bars, first = np.unique(sel_bars, return_index=True)
+    first_break = dict(zip(unique_bars.tolist(), sel_breaks[first].tolist()))
+
+    order_blocks = mark_mitigation(core, [
+        _order_block(core, i, 'BULL' if core.bearish[i] else 'BEAR',
+                     'BOS' if bos else 'CHoCH', first_break[i])
+        for i, bos in zip(bars.tolist(), np.isin(bars, bos_bars).tolist())
+    ])
+    if active_only:
+        order_blocks = [ob for ob in order_blocks if not ob.invalidated][:max_ob]
+    return order_blocks
+
+
+# =============================================================================
+#                         Fair Value Gaps (all profiles)
+# =============================================================================
+
+def fair_value_gaps(core, min_size=0.0):
+    """
+    Three-candle FVGs with fill tracking from the bar after the third candle
+    BULL: partial when low < top, filled when low <= bottom
+    BEAR: partial when high > bottom, filled when high >= top
+    """
+    bars, bullish, tops, bottoms = find_fair_value_gaps(core.highs, core.lows, min_size)
+    if len(bars) == 0:
+        return []
+
+    n = len(core)
+    starts = bars + 1
+
+    # Bull gaps are filled from above by lows, bear gaps from below by highs
+    partial = np.full(len(bars), -1, dtype=np.int64)
+    filled = np.full(len(bars), -1, dtype=np.int64)
+    for side, prices, above in ((bullish, core.lows, False), (~bullish, core.highs, True)):
+        entry, exit_ = (tops, bottoms) if not above else (bottoms, tops)
+        partial[side] = find_first_breaks(prices, starts[side], entry[side], above)
+        filled[side] = find_first_breaks(prices, starts[side], exit_[side], above, inclusive=True)
+
+    # Deepest price after the gap: suffix min of lows / max of highs
+    deepest_low = np.append(np.minimum.accumulate(core.lows[::-1])[::-1], np.inf)
+    deepest_high = np.append(np.maximum.accumulate(core.highs[::-1])[::-1], -np.inf)
+    after = np.minimum(starts + 1, n)
+    reach = np.where(bullish, tops - deepest_low[after], deepest_high[after] - bottoms)
+    ratio = np.clip(reach / (tops - bottoms), 0.0, 1.0)
+    ratio[filled >= 0] = 1.0
+
+    gaps = []
+    for i, bull, top, bottom, p, f, r in zip(bars.tolist(), bullish.tolist(), tops.tolist(),
+                                             bottoms.tolist(), partial.tolist(), filled.tolist(),
+                                             ratio.tolist()):
+        gap = FairValueGap('BULL' if bull else 'BEAR', top, bottom, core.epochs[i], i)
+        if p >= 0:
+            gap.partial = True
+            gap.partial_bar = p
+        if f >= 0:
+            gap.filled = True
+            gap.filled_bar = f
+            gap.filled_time = core.epochs[f]
+        gap.fill_ratio = r
+        gaps.append(gap)
+    return gaps
+
+
+def update_fair_value_gap(gap, index, time, high, low):
+    """One closed bar after the gap (streaming); True if the gap state changed"""
+    size = gap.top - gap.bottom
+    if gap.type == 'BULL':
+        entered, crossed, reach = low < gap.top, low <= gap.bottom, gap.top - low
+    else:
+        entered, crossed, reach = high > gap.bottom, high >= gap.top, high - gap.bottom
+
+    changed = False
+    if entered and not gap.partial:
+        gap.partial = True
+        gap.partial_bar = index
+        changed = True
+    if crossed and not gap.filled:
+        gap.filled = True
+        gap.filled_bar = index
+        gap.filled_time = time
+        changed = True
+    ratio = 1.0 if gap.filled else min(max(reach / size, 0.0), 1.0)
+    if ratio > gap.fill_ratio:
+        gap.fill_ratio = ratio
+        changed = True
+    return changed
+
+
+# =============================================================================
+#                         Equal highs / lows (all profiles)
+# =============================================================================
+
+def _unswept_runs(core, runs, above, max_gap=None):
+    """
+    Split price clusters (members in bar order) where price traded beyond the
+    cluster before its next member, or more than `max_gap` bars separate two
+    members - liquidity taken in between makes them separate levels.
+    Single-swing pieces are dropped, so repeat until the runs' own edges
+    split nothing more
+    """
+    extremes = core.highs if above else core.lows
+    edge_of = max if above else min
+    while runs:
+        members = [m for run in runs for m in run]
+        edges = [edge_of(m.price for m in run) for run in runs for _ in run]
+        swept = find_first_breaks(extremes, [m.bar_index for m in members], edges,
+                                  above=above).tolist()
+        pieces = []
+        pos = 0
+        for run in runs:
+            piece = [run[0]]
+            for prev, member in zip(run, run[1:]):
+                bar = swept[pos]
+                pos += 1
+                if 0 <= bar < member.bar_index or \
+                        (max_gap is not None and member.bar_index - prev.bar_index > max_gap):
+                    pieces.append(piece)
+                    piece = []
+                piece.append(member)
+            pieces.append(piece)
+            pos += 1
+        if len(pieces) == len(runs):
+            return runs
+        runs = [piece for piece in pieces if len(piece) >= 2]
+    return runs
+
+
+def equal_levels(core, swings, tolerance=None, atr_mult=0.1, atr_period=14, max_gap=None):
+    """
+    EQH / EQL clusters from a profile's swings
+    tolerance: fixed price distance (e.g. 2 pips = 0.0002),
+               else atr_mult x ATR(atr_period) at the cluster's lowest swing
+    A cluster ends where price trades beyond it (or after max_gap bars)
+    before the next member - see _unswept_runs
+    swept: first bar after the first member trading beyond the cluster
+    """
+    levels = []
+    for swing_type, level_type in (('high', 'EQH'), ('low', 'EQL')):
+        members = [s for s in swings if s.type == swing_type]
+        if len(members) < 2:
+            continue
+        prices = np.array([s.price for s in members])
+        if tolerance is None:
+            bars = np.array([s.bar_index for s in members], dtype=np.int64)
+            tol = atr_mult * core.atr(atr_period)[bars]
+        else:
+            tol = tolerance
+
+        runs = [[members[k] for k in idx.tolist()] for idx in cluster_equal_levels(prices, tol)]
+        clusters = [EqualLevel(level_type, run)
+                    for run in _unswept_runs(core, runs, level_type == 'EQH', max_gap)]
+        if not clusters:
+            continue
+
+        first_bars = np.array([c.members[0].bar_index for c in clusters], dtype=np.int64)
+        if level_type == 'EQH':
+            swept = find_first_breaks(core.highs, first_bars, [c.top for c in clusters], above=True)
+        else:
+            swept = find_first_breaks(core.lows, first_bars, [c.bottom for c in clusters], above=False)
+        for cluster, bar in zip(clusters, swept.tolist()):
+            if bar >= 0:
+                cluster.swept = True
+                cluster.swept_bar = bar
+                cluster.swept_time = core.epochs[bar]
+        levels.extend(clusters)
+
+    levels.sort(key=lambda c: (c.last_bar, c.type))
+    return levels
+
+
+# =============================================================================
+#                         Export layouts (records -> dicts, on export only)
+# =============================================================================
+
+FVG_LAYOUT = (('type', 'top', 'bottom', 'time', 'bar_index', 'partial', 'filled',
+               'filled_time', 'fill_ratio'), ())
+
+EQUAL_LEVEL_LAYOUT = (('type', 'level', 'top', 'bottom', 'count', 'first_time', 'last_time',
+                       'swept', 'swept_time', 'members'), ())
+
+# collection -> (fields in JSON order, fields formatted as pandas Timestamp)
+LAYOUTS = {
+    'v1': {
+        'swings': (('type', 'price', 'time', 'bar_index', 'label'), ()),
+        'bos': (('type', 'level', 'break_bar', 'break_time', 'start_time'), ('break_time',)),
+        'choch': (('type', 'level', 'break_bar', 'break_time', 'start_time'), ('break_time',)),
+        'order_blocks': (('type', 'high', 'low', 'time', 'bar_index'), ()),
+        'fvgs': FVG_LAYOUT,
+        'equal_levels': EQUAL_LEVEL_LAYOUT,
+    },
+    'v2': {
+        'swings': (('type', 'price', 'time', 'bar_index', 'label'), ()),
+        'bos': (('type', 'level', 'start_time', 'break_time', 'break_bar'), ()),
+        'choch': (('type', 'level', 'start_time', 'break_time', 'break_bar'), ()),
+        'order_blocks': (('type', 'high', 'low', 'time', 'bar_index', 'mitigated'), ()),
+        'fvgs': FVG_LAYOUT,
+        'equal_levels': EQUAL_LEVEL_LAYOUT,
+    },
+    'v3': {
+        'swings': (('type', 'label', 'price', 'time', 'bar_index'), ()),
+        'bos': (('type', 'level', 'start_time', 'start_bar', 'break_time', 'break_bar'), ()),
+        'choch': (('type', 'level', 'start_time', 'start_bar', 'break_time', 'break_bar'), ()),
+        'order_blocks': (('type', 'high', 'low', 'open', 'close', 'time', 'bar_index', 'source',
+                          'mitigated', 'mitigated_time', 'invalidated'), ()),
+        'fvgs': FVG_LAYOUT,
+        'equal_levels': EQUAL_LEVEL_LAYOUT,
+    },
+}
+
+
+# Drawing settings the V3 drawer EA reads from the signal file
+V3_DRAW_CONFIG = {
+    'bos_color': 'clrDodgerBlue',
+    'choch_color': 'clrMagenta',
+    'ob_bull_color': 'clrDodgerBlue',
+    'ob_bear_color': 'clrCrimson',
+    'line_style': 'STYLE_SOLID',
+    'extend_lines': True
+}
+
+
+def export_collections(profile, result):
+    """{'swings': [Swing], ...} -> {'swings': [dict], ...} in the profile's JSON layout"""
+    layout = LAYOUTS[profile]
+    return {
+        name: to_dicts(records, *layout[name]) if name in layout else records
+        for name, records in result.items()
+    }
+
+
+def signal_payload(profile, symbol, timeframe, result):
+    """Complete signal file content for one symbol / timeframe"""
+    if profile == 'v3':
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        generated_at = datetime.now().isoformat()
+
+    payload = {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'generated_at': generated_at,
+        **export_collections(profile, result)
+    }
+    if profile == 'v3':
+        payload['config'] = dict(V3_DRAW_CONFIG)
+    return payload
+
+
+# =============================================================================
+#                         Profiles - several rule sets, one core
+# =============================================================================
+
+def run_v1(core, swing_strength=3, fvg_min_size=0.0, eq_tolerance=None, eq_atr_mult=0.1,
+           ob_lookback=10):
+    swings = v1_swings(core, swing_strength)
+    bos = v1_bos(core, swings)
+    choch = v1_choch(core, swings)
+    return {
+        'swings': swings,
+        'bos': bos,
+        'choch': choch,
+        'order_blocks': v1_order_blocks(core, bos + choch, ob_lookback),
+        'fvgs': fair_value_gaps(core, fvg_min_size),
+        'equal_levels': equal_levels(core, swings, eq_tolerance, eq_atr_mult)
+    }
+
+
+def run_v2(core, swing_strength=5, fvg_min_size=0.0, eq_tolerance=None, eq_atr_mult=0.1,
+           ob_lookback=5):
+    swings = v2_swings(core, swing_strength)
+    structure_breaks = v2_structure_breaks(core, swings)
+    return {
+        'swings': swings,
+        'bos': [b for b in structure_breaks if 'BOS' in b.type],
+        'choch': [b for b in structure_breaks if 'CHoCH' in b.type],
+        'order_blocks': v2_order_blocks(core, structure_breaks, ob_lookback),
+        'fvgs': fair_value_gaps(core, fvg_min_size),
+        'equal_levels': equal_levels(core, swings, eq_tolerance, eq_atr_mult)
+    }
+
+
+def run_v3(core, swing_strength=5, max_ob=20, active_only=False, fvg_min_size=0.0,
+           eq_tolerance=None, eq_atr_mult=0.1, ob_lookback=10):
+    swings = v3_swings(core, swing_strength)
+    bos, choch = v3_bos_choch(core, swings)
+    return {
+        'swings': swings,
+        'bos': bos,
+        'choch': choch,
+        'order_blocks': v3_order_blocks(core, bos, choch, max_ob, active_only, ob_lookback),
+        'fvgs': fair_value_gaps(core, fvg_min_size),
+        'equal_levels': equal_levels(core, swings, eq_tolerance, eq_atr_mult)
+    }
+
+
+PROFILES = {
+    'v1': run_v1,
+    'v2': run_v2,
+    'v3': run_v3,
+}
+
+
+def run_profiles(core, profiles=('v1', 'v2', 'v3'), **params):
+    """
+    Apply several rule profiles to one core (data fetched and scanned once)
+    params: per-profile keyword arguments, e.g. v3={'swing_strength': 5}
+    """
+    return {name: PROFILES[name](core, **params.get(name, {})) for name in profiles}
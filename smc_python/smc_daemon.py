@@ -0,0 +1,509 @@
+"""
+=============================================================================
+    SMC Daemon - resident analysis service, triggered on bar close
+    - one provider connection for the whole session (reconnects on failure)
+    - every poll asks each symbol / timeframe for its last 2 bars; a new
+      forming bar means the previous one just closed
+    - V3: the closed bars go through on_bar() (O(1) per bar),
+      V1 / V2: the profile reruns on the kept window of that pair only
+    - signals are published through SignalWriter (atomic, seq + delta log)
+    - health + lag metrics: <out-dir>/smc_daemon_health.json and optional
+      HTTP /health (JSON) and /metrics (Prometheus text)
+
+    python smc_daemon.py --symbols EURUSD GBPUSD --timeframes M15 H1
+    python smc_daemon.py --provider replay:600 --http-port 8765   # no terminal
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_providers import (
+    TIMEFRAMES, TIMEFRAME_SECONDS, RATES_DTYPE, get_default_provider, provider_from_spec
+)
+from smc_core import SMCCore, PROFILES, signal_payload, equal_levels
+from smc_analyzer_v3 import SMCAnalyzerV3
+from smc_export import SignalWriter, write_json_atomic
+from smc_binary import binary_path, write_binary
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+class Subscription:
+    """
+    One symbol / timeframe kept up to date by the daemon
+    rates: the last history_bars .. max_bars bars fed (once the buffer reaches
+    max_bars it is cut back to history_bars and the V3 stream is rebased),
+    last_time: last closed bar
+    """
+
+    def __init__(self, symbol, tf_name, profile='v3', params=None, history_bars=5000):
+        self.symbol = symbol
+        self.tf_name = tf_name
+        self.timeframe = TIMEFRAMES[tf_name]
+        self.seconds = TIMEFRAME_SECONDS[self.timeframe]
+        self.profile = profile
+        self.params = dict(params or {})
+        self.history_bars = history_bars
+        # Trim in steps, not on every bar
+        self.max_bars = history_bars + max(256, history_bars // 4)
+
+        self._rates = np.zeros(self.max_bars, dtype=RATES_DTYPE)
+        self._count = 0
+        self.last_time = None
+        self.analyzer = None
+        self.result = None
+        self.writer = None
+
+        # Metrics
+        self.bars_processed = 0
+        self.publishes = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_detect_wall = None
+        self.last_publish_wall = None
+        self.last_seq = 0
+        self.latency_ms = deque(maxlen=500)    # close detected -> signals published
+        self.close_lag_s = deque(maxlen=500)   # bar close -> detected (server clock)
+        self.catch_up = 0                      # polls that found more than one closed bar
+
+    @property
+    def key(self):
+        return f"{self.symbol}_{self.tf_name}"
+
+    @property
+    def rates(self):
+        return self._rates[:self._count]
+
+    def _append(self, rates):
+        need = self._count + len(rates)
+        if need > len(self._rates):
+            grown = np.zeros(max(need, 2 * len(self._rates)), dtype=RATES_DTYPE)
+            grown[:self._count] = self.rates
+            self._rates = grown
+        self._rates[self._count:need] = rates
+        self._count = need
+
+    def _trim(self):
+        """Keep the last history_bars bars once the buffer is full"""
+        if self._count < self.max_bars:
+            return
+        drop = self._count - self.history_bars
+        self._rates[:self.history_bars] = self._rates[drop:self._count]
+        self._count = self.history_bars
+        if self.analyzer is not None:
+            self.analyzer.trim_stream(drop)
+
+    def warmup(self, closed, provider=None):
+        """History (closed bars only) -> initial state"""
+        closed = np.asarray(closed).astype(RATES_DTYPE, copy=False)
+        if self.profile == 'v3':
+            self.analyzer = SMCAnalyzerV3(self.symbol, self.timeframe, provider)
+            self.analyzer.start_stream(**{k: v for k, v in self.params.items()
+                                          if k in ('swing_strength', 'max_ob', 'fvg_min_size')})
+        self.result = None
+        self._count = 0
+        self.last_time = None
+        self.feed(closed)
+
+    def feed(self, closed):
+        """Apply newly closed bars (oldest first)"""
+        if len(closed) == 0:
+            return 0
+        self._append(closed)
+        if self.analyzer is not None:
+            for bar in closed:
+                self.analyzer.on_bar(bar)
+        self._trim()
+        self.last_time = int(closed['time'][-1])
+        self.bars_processed += len(closed)
+        self.result = None
+        return len(closed)
+
+    def current_result(self):
+        """Profile output for the kept bars (V3: stream state + batch EQH/EQL)"""
+        if self.result is not None:
+            return self.result
+        if self.analyzer is not None:
+            a = self.analyzer
+            # EQH/EQL are batch-only; stream bar indexes count from the first kept bar
+            levels = equal_levels(SMCCore.from_rates(self.rates), a.swings,
+                                  self.params.get('eq_tolerance'), self.params.get('eq_atr_mult', 0.1))
+            self.result = {
+                'swings': a.swings, 'bos': a.bos_list, 'choch': a.choch_list,
+                'order_blocks': a.order_blocks, 'fvgs': a.fvgs, 'equal_levels': levels,
+            }
+        else:
+            window = self.rates[-self.history_bars:]
+            self.result = PROFILES[self.profile](SMCCore.from_rates(window), **self.params)
+        return self.result
+
+    def health(self, now_wall):
+        stale_after = 2 * self.seconds + 60
+        return {
+            'symbol': self.symbol,
+            'timeframe': self.tf_name,
+            'last_bar_time': self.last_time,
+            'bars_processed': self.bars_processed,
+            'publishes': self.publishes,
+            'seq': self.last_seq,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'seconds_since_new_bar': (None if self.last_detect_wall is None
+                                      else round(now_wall - self.last_detect_wall, 3)),
+            # No new bar for 2 bars + 1 min: feed stalled or market closed
+            'stale': (self.last_detect_wall is not None
+                      and now_wall - self.last_detect_wall > stale_after),
+            'latency_ms_p50': _percentile(list(self.latency_ms), 50),
+            'latency_ms_p95': _percentile(list(self.latency_ms), 95),
+            'latency_ms_max': max(self.latency_ms) if self.latency_ms else None,
+            'close_lag_s_p50': _percentile(list(self.close_lag_s), 50),
+            'close_lag_s_max': max(self.close_lag_s) if self.close_lag_s else None,
+            'catch_up_polls': self.catch_up,
+        }
+
+
+class SMCDaemon:
+    """
+    daemon = SMCDaemon([Subscription("EURUSD", "H1")], out_dir="signals")
+    daemon.run()               # until stop() / Ctrl+C
+    daemon.run_once()          # one poll of every subscription (tests, cron)
+    """
+
+    def __init__(self, subscriptions, provider=None, out_dir="signals", poll_interval=0.5,
+                 binary=False, health_interval=5.0, reconnect_delay=5.0):
+        self.subscriptions = list(subscriptions)
+        self.provider = provider or get_default_provider()
+        self.out_dir = out_dir
+        self.poll_interval = poll_interval
+        self.binary = binary
+        self.health_interval = health_interval
+        self.reconnect_delay = reconnect_delay
+        self.health_path = os.path.join(out_dir, "smc_daemon_health.json")
+
+        self.connected = False
+        self.started_wall = None
+        self.polls = 0
+        self.last_poll_ms = None
+        self.reconnects = 0
+        self.errors = 0
+        self.last_error = None
+        self._last_health_write = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._http = None
+
+    # -------------------------------------------------------------------------
+    #   Connection
+    # -------------------------------------------------------------------------
+
+    def connect(self):
+        if not self.provider.connect():
+            self._error(None, f"connect to {self.provider.name} failed: {self.provider.last_error()}")
+            self.connected = False
+            return False
+        self.connected = True
+        for sub in self.subscriptions:
+            self.provider.select_symbol(sub.symbol)
+        print(f"[OK] Connected to {self.provider.name}")
+        return True
+
+    def _reconnect(self):
+        self.provider.shutdown()
+        self.connected = False
+        self.reconnects += 1
+        while not self._stop.is_set():
+            if self.connect():
+                return True
+            self._stop.wait(self.reconnect_delay)
+        return False
+
+    def _error(self, sub, message):
+        self.errors += 1
+        self.last_error = message
+        if sub is not None:
+            sub.errors += 1
+            sub.last_error = message
+            print(f"[ERROR] {sub.key}: {message}")
+        else:
+            print(f"[ERROR] {message}")
+
+    # -------------------------------------------------------------------------
+    #   Bar close detection / analysis / publishing
+    # -------------------------------------------------------------------------
+
+    def start(self):
+        """Connect, load history and publish the initial signals"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.started_wall = time.time()
+        if not self.connect():
+            return False
+        for sub in self.subscriptions:
+            rates = self.provider.get_rates(sub.symbol, sub.timeframe, sub.history_bars + 1)
+            if rates is None or len(rates) < 2:
+                self._error(sub, f"no history ({self.provider.last_error()})")
+                continue
+            sub.warmup(rates[:-1], self.provider)  # last row is still forming
+            sub.writer = SignalWriter(os.path.join(self.out_dir, f"smc_signals_{sub.key}.json"))
+            self._publish(sub, time.perf_counter())
+            print(f"[OK] {sub.key}: {sub.bars_processed} bars, last closed "
+                  f"{datetime.fromtimestamp(sub.last_time, tz=timezone.utc):%Y-%m-%d %H:%M}")
+        self._write_health(force=True)
+        return True
+
+    def _closed_since(self, sub):
+        """Closed bars newer than sub.last_time (None on provider error)"""
+        rates = self.provider.get_rates(sub.symbol, sub.timeframe, 2)
+        if rates is None:
+            return None
+        if len(rates) < 2 or int(rates['time'][-2]) <= sub.last_time:
+            return rates[:0]
+        if int(rates['time'][-2]) - sub.last_time > sub.seconds:
+            # More than one bar closed since the last poll (or a session gap)
+            rates = self.provider.get_rates_range(sub.symbol, sub.timeframe,
+                                                  sub.last_time + 1, int(rates['time'][-1]))
+            if rates is None:
+                return None
+        closed = rates[:-1]
+        return closed[closed['time'] > sub.last_time]
+
+    def _publish(self, sub, detected):
+        payload = signal_payload(sub.profile, sub.symbol, sub.tf_name, sub.current_result())
+        seq = sub.writer.write(payload)
+        if seq is not None:
+            sub.last_seq = seq
+            if self.binary:
+                write_binary(binary_path(sub.writer.filepath), sub.current_result(),
+                             sub.symbol, sub.tf_name, seq)
+        sub.publishes += 1
+        sub.last_publish_wall = time.time()
+        sub.latency_ms.append((time.perf_counter() - detected) * 1000)
+
+    def run_once(self):
+        """Poll every subscription once; returns the number of pairs republished"""
+        started = time.perf_counter()
+        published = 0
+        for sub in self.subscriptions:
+            if sub.writer is None or sub.last_time is None:
+                continue
+            detected = time.perf_counter()
+            try:
+                closed = self._closed_since(sub)
+                if closed is None:
+                    self._error(sub, f"get_rates failed: {self.provider.last_error()}")
+                    if not self._reconnect():
+                        break
+                    continue
+                if len(closed) == 0:
+                    continue
+
+                server_now = self.provider.server_time(sub.symbol)
+                with self._lock:
+                    sub.last_detect_wall = time.time()
+                    if len(closed) > 1:
+                        sub.catch_up += 1
+                    if server_now is not None:
+                        sub.close_lag_s.append(server_now - (int(closed['time'][-1]) + sub.seconds))
+                    sub.feed(closed)
+                    self._publish(sub, detected)
+                published += 1
+            except Exception as e:  # keep serving the other pairs
+                self._error(sub, repr(e))
+
+        self.polls += 1
+        self.last_poll_ms = (time.perf_counter() - started) * 1000
+        self._write_health()
+        return published
+
+    def run(self, max_seconds=None):
+        """Poll loop - returns on stop(), Ctrl+C or after max_seconds"""
+        if self.started_wall is None and not self.start():
+            return False
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        try:
+            while not self._stop.is_set():
+                began = time.monotonic()
+                self.run_once()
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                self._stop.wait(max(0.0, self.poll_interval - (time.monotonic() - began)))
+        except KeyboardInterrupt:
+            print("\n[OK] Stopping")
+        finally:
+            self._write_health(force=True)
+            self.provider.shutdown()
+            self.connected = False
+            self.stop_http()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    # -------------------------------------------------------------------------
+    #   Health / metrics
+    # -------------------------------------------------------------------------
+
+    def health(self):
+        now = time.time()
+        with self._lock:
+            pairs = [sub.health(now) for sub in self.subscriptions]
+        latencies = [v for sub in self.subscriptions for v in sub.latency_ms]
+        return {
+            'status': ('ok' if self.connected and not any(p['stale'] for p in pairs)
+                       else 'degraded' if self.connected else 'down'),
+            'provider': self.provider.name,
+            'connected': self.connected,
+            'uptime_s': None if self.started_wall is None else round(now - self.started_wall, 1),
+            'poll_interval_s': self.poll_interval,
+            'polls': self.polls,
+            'last_poll_ms': self.last_poll_ms,
+            'reconnects': self.reconnects,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'latency_ms_p95': _percentile(latencies, 95),
+            'updated_at': datetime.now().isoformat(),
+            'pairs': pairs,
+        }
+
+    def metrics_text(self):
+        """Prometheus text exposition of health()"""
+        h = self.health()
+        lines = [
+            "# TYPE smc_daemon_up gauge",
+            f"smc_daemon_up {int(h['connected'])}",
+            "# TYPE smc_daemon_polls_total counter",
+            f"smc_daemon_polls_total {h['polls']}",
+            "# TYPE smc_daemon_errors_total counter",
+            f"smc_daemon_errors_total {h['errors']}",
+            "# TYPE smc_daemon_reconnects_total counter",
+            f"smc_daemon_reconnects_total {h['reconnects']}",
+        ]
+        if h['last_poll_ms'] is not None:
+            lines += ["# TYPE smc_daemon_poll_ms gauge", f"smc_daemon_poll_ms {h['last_poll_ms']:.3f}"]
+
+        series = (
+            ('smc_bars_processed_total', 'counter', 'bars_processed'),
+            ('smc_publishes_total', 'counter', 'publishes'),
+            ('smc_pair_errors_total', 'counter', 'errors'),
+            ('smc_signal_seq', 'gauge', 'seq'),
+            ('smc_last_bar_time_seconds', 'gauge', 'last_bar_time'),
+            ('smc_seconds_since_new_bar', 'gauge', 'seconds_since_new_bar'),
+            ('smc_publish_latency_ms_p50', 'gauge', 'latency_ms_p50'),
+            ('smc_publish_latency_ms_p95', 'gauge', 'latency_ms_p95'),
+            ('smc_publish_latency_ms_max', 'gauge', 'latency_ms_max'),
+            ('smc_close_lag_seconds_p50', 'gauge', 'close_lag_s_p50'),
+            ('smc_close_lag_seconds_max', 'gauge', 'close_lag_s_max'),
+            ('smc_stale', 'gauge', 'stale'),
+        )
+        for name, kind, field in series:
+            lines.append(f"# TYPE {name} {kind}")
+            for pair in h['pairs']:
+                value = pair[field]
+                if value is None:
+                    continue
+                labels = f'symbol="{pair["symbol"]}",timeframe="{pair["timeframe"]}"'
+                lines.append(f"{name}{{{labels}}} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def _write_health(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_health_write < self.health_interval:
+            return
+        self._last_health_write = now
+        try:
+            write_json_atomic(self.health_path, self.health())
+        except OSError as e:
+            self._error(None, f"health file: {e}")
+
+    def serve_http(self, port, host="127.0.0.1"):
+        """GET /health (JSON) and /metrics (Prometheus) from a background thread"""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/health"):
+                    body = json.dumps(daemon.health(), indent=2, default=str).encode()
+                    kind = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = daemon.metrics_text().encode()
+                    kind = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        print(f"[OK] Health on http://{host}:{self._http.server_address[1]}/health and /metrics")
+        return self._http.server_address[1]
+
+    def stop_http(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident SMC analysis, republished on every bar close")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"])
+    parser.add_argument("--timeframes", nargs="+", default=["H1"], choices=list(TIMEFRAMES))
+    parser.add_argument("--profile", default="v3", choices=list(PROFILES))
+    parser.add_argument("--bars", type=int, default=5000, help="history loaded at start and kept in memory (analysis window)")
+    parser.add_argument("--swing-strength", type=int, default=None)
+    parser.add_argument("--poll", type=float, default=0.5, help="poll interval (s) - bounds the detection delay")
+    parser.add_argument("--out-dir", default="signals")
+    parser.add_argument("--mt5-files", action="store_true", help="publish into the terminal's MQL5/Files")
+    parser.add_argument("--binary", action="store_true", help="also publish .smcb files")
+    parser.add_argument("--http-port", type=int, default=None, help="serve /health and /metrics")
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--provider", default=None, help="mt5 | replay[:speed] | synthetic[:seed] | files:<dir>")
+    args = parser.parse_args()
+
+    params = {}
+    if args.swing_strength is not None:
+        params['swing_strength'] = args.swing_strength
+
+    provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+    out_dir = args.out_dir
+    if args.mt5_files:
+        import MetaTrader5 as mt5
+        if not provider.connect():
+            print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+            return 1
+        out_dir = os.path.join(mt5.terminal_info().data_path, "MQL5", "Files")
+
+    subscriptions = [Subscription(symbol, tf, args.profile, params, args.bars)
+                     for symbol in args.symbols for tf in args.timeframes]
+    daemon = SMCDaemon(subscriptions, provider, out_dir, args.poll, args.binary)
+    if not daemon.start():
+        return 1
+    if args.http_port is not None:
+        daemon.serve_http(args.http_port)
+    daemon.run(args.max_seconds)
+    print(json.dumps(daemon.health(), indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+=============================================================================
+    SMC Export - atomic, versioned signal files
+    - every write goes to <file>.tmp, then os.replace() - readers (the EA)
+      never see a half-written file
+    - versioned mode: the snapshot carries a monotonically increasing "seq"
+      and every change is appended to <file>.delta.jsonl:
+
+      {"seq": 7, "base_seq": 6, "added": {...}, "changed": {...}, "removed": {...}}
+
+    Objects are matched by IDENTITY (e.g. an order block = type + candle time),
+    so a consumer can apply added, changed and removed (keys) in place;
+    delta objects leave out the window-relative bar indexes
+=============================================================================
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+
+# collection -> fields that identify one object across runs
+IDENTITY = {
+    'swings': ('type', 'time'),
+    'bos': ('type', 'start_time', 'break_time'),
+    'choch': ('type', 'start_time', 'break_time'),
+    'order_blocks': ('type', 'time'),
+    'fvgs': ('type', 'time'),
+    'equal_levels': ('type', 'first_time'),
+}
+
+# Bar indexes count from the start of the analyzed window - they shift on every
+# new bar when the last N bars are analyzed, so deltas carry times only
+RELATIVE_FIELDS = frozenset(('bar_index', 'start_bar', 'break_bar'))
+
+
+# =============================================================================
+#                         Atomic writes
+# =============================================================================
+
+def _replace(tmp, path, retries=20, delay=0.05):
+    """os.replace with retries - on Windows it fails while a reader holds the file open"""
+    for attempt in range(retries):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(delay)
+
+
+def write_text_atomic(path, text, fsync=False):
+    """Write text to path through a temp file in the same directory + rename"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    _replace(tmp, path)
+    return path
+
+
+def write_json_atomic(path, payload, indent=2):
+    """json.dump(payload) to path without ever exposing a partial file"""
+    return write_text_atomic(path, json.dumps(payload, indent=indent, default=str))
+
+
+def write_bytes_atomic(path, data):
+    """Binary counterpart of write_text_atomic"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    _replace(tmp, path)
+    return path
+
+
+def copy_atomic(src, dst):
+    """shutil.copy replacement: the destination is swapped in whole"""
+    with open(src, 'rb') as f:
+        return write_bytes_atomic(dst, f.read())
+
+
+# =============================================================================
+#                         Deltas
+# =============================================================================
+
+def stable_object(obj):
+    """Exported dict without RELATIVE_FIELDS (also inside EQH/EQL members)"""
+    out = {k: v for k, v in obj.items() if k not in RELATIVE_FIELDS}
+    if 'members' in out:
+        out['members'] = [stable_object(m) for m in out['members']]
+    return out
+
+
+def object_keys(collection, objects):
+    """
+    Identity key of every exported dict (tuple of IDENTITY values)
+    Repeated keys get an occurrence number so every key stays unique
+    """
+    fields = IDENTITY.get(collection)
+    keys = []
+    seen = {}
+    for obj in objects:
+        key = tuple(obj.get(f) for f in fields) if fields else (json.dumps(obj, sort_keys=True),)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        keys.append(key + (n,) if n else key)
+    return keys
+
+
+def key_dict(collection, key):
+    """Key tuple -> {"type": ..., "time": ...} as written to the delta log"""
+    fields = IDENTITY.get(collection) or ('_json',)
+    out = dict(zip(fields, key))
+    if len(key) > len(fields):
+        out['_n'] = key[len(fields)]
+    return out
+
+
+def diff_collections(old, new):
+    """
+    {collection: [dict]} x 2 (stable objects) -> (added, changed, removed)
+    added / changed: full objects, removed: key dicts; empty collections omitted
+    """
+    added, changed, removed = {}, {}, {}
+    for name in new.keys() | old.keys():
+        before = dict(zip(object_keys(name, old.get(name, [])), old.get(name, [])))
+        after = new.get(name, [])
+        after_keys = object_keys(name, after)
+
+        add = [obj for key, obj in zip(after_keys, after) if key not in before]
+        chg = [obj for key, obj in zip(after_keys, after) if key in before and before[key] != obj]
+        gone = set(before) - set(after_keys)
+        if add:
+            added[name] = add
+        if chg:
+            changed[name] = chg
+        if gone:
+            removed[name] = [key_dict(name, key) for key in before if key in gone]
+    return added, changed, removed
+
+
+def apply_delta(state, delta):
+    """
+    Consumer side: apply one delta record to {collection: [dict]} in place
+    A delta with "reset" replaces the whole state
+    Repeated keys (identical objects, e.g. one V1 OB per break) count as copies
+    """
+    if delta.get('reset'):
+        state.clear()
+    for name, keys in delta.get('removed', {}).items():
+        fields = IDENTITY.get(name) or ('_json',)
+        objects = state.get(name, [])
+        drop = {}
+        for k in keys:
+            base = tuple(k.get(f) for f in fields)
+            drop[base] = drop.get(base, 0) + 1
+        kept = []
+        for key, obj in reversed(list(zip(object_keys(name, objects), objects))):
+            base = key[:len(fields)]
+            if drop.get(base, 0):
+                drop[base] -= 1
+                continue
+            kept.append(obj)
+        state[name] = kept[::-1]
+    for name, objects in delta.get('changed', {}).items():
+        current = state.setdefault(name, [])
+        index = dict(zip(object_keys(name, current), range(len(current))))
+        for obj, key in zip(objects, object_keys(name, objects)):
+            if key in index:
+                current[index[key]] = obj
+    for name, objects in delta.get('added', {}).items():
+        state.setdefault(name, []).extend(objects)
+    return state
+
+
+def read_deltas(log_path, after_seq=0):
+    """Delta records with seq > after_seq, oldest first (torn last line skipped)"""
+    deltas = []
+    if not os.path.exists(log_path):
+        return deltas
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                delta = json.loads(line)
+            except ValueError:
+                break
+            if delta.get('seq', 0) > after_seq:
+                deltas.append(delta)
+    return deltas
+
+
+def _last_logged_seq(log_path):
+    """seq of the last complete line of the delta log (0 = none)"""
+    if not os.path.exists(log_path):
+        return 0
+    with open(log_path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        window = 65536
+        while True:
+            f.seek(max(0, size - window))
+            lines = f.read().splitlines()
+            if size > window:
+                lines = lines[1:]  # first line may be cut by the window
+            for line in reversed(lines):
+                try:
+                    return int(json.loads(line).get('seq', 0))
+                except ValueError:
+                    continue
+            if window >= size:
+                return 0
+            window *= 4
+
+
+# =============================================================================
+#                         Versioned writer
+# =============================================================================
+
+class SignalWriter:
+    """
+    Versioned signal file: atomic snapshot + append-only delta log
+
+    writer = SignalWriter("smc_signals_v3.json")
+    seq = writer.write(payload)   # None when nothing changed (file left as is)
+    """
+
+    def __init__(self, filepath, log_path=None, indent=2, max_log_bytes=16 * 1024 * 1024,
+                 fsync=False):
+        self.filepath = filepath
+        self.log_path = log_path or os.path.splitext(filepath)[0] + ".delta.jsonl"
+        self.indent = indent
+        self.max_log_bytes = max_log_bytes
+        self.fsync = fsync
+        self.seq = 0
+        self._state = None      # collections of the current snapshot, None = unknown
+        self._load()
+
+    def _load(self):
+        """Resume from the files on disk (seq and the last snapshot)"""
+        snapshot_seq = 0
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                snapshot_seq = int(snapshot.get('seq', 0))
+                self._state = {name: [stable_object(obj) for obj in snapshot[name]]
+                               for name in IDENTITY if name in snapshot}
+            except (ValueError, OSError) as e:
+                print(f"[ERROR] Cannot read {self.filepath}: {e} - next delta is a reset")
+        logged_seq = _last_logged_seq(self.log_path)
+        self.seq = max(snapshot_seq, logged_seq)
+        if logged_seq != snapshot_seq:
+            # Snapshot and log disagree (crash in between) - consumers must resync
+            self._state = None
+
+    def write(self, payload, force=False):
+        """
+        Write a full payload (signal_payload output)
+        Returns the new seq, or None when no object changed and force is False
+        """
+        # JSON round trip - compare exactly what a reader of the file sees
+        state = json.loads(json.dumps({name: [stable_object(obj) for obj in payload[name]]
+                                       for name in IDENTITY if name in payload}, default=str))
+        reset = self._state is None
+        added, changed, removed = diff_collections({} if reset else self._state, state)
+        if not (added or changed or removed or reset or force):
+            return None
+
+        self.seq += 1
+        delta = {
+            'seq': self.seq,
+            'base_seq': self.seq - 1,
+            'generated_at': datetime.now().isoformat(),
+            'symbol': payload.get('symbol'),
+            'timeframe': payload.get('timeframe'),
+        }
+        if reset:
+            delta['reset'] = True
+        delta.update({'added': added, 'changed': changed, 'removed': removed})
+
+        # Log first: a snapshot with seq N always has deltas up to N on disk
+        self._append_log(delta)
+        write_text_atomic(self.filepath,
+                          json.dumps({'seq': self.seq, **payload}, indent=self.indent, default=str),
+                          self.fsync)
+        self._state = state
+        return self.seq
+
+    def _append_log(self, delta):
+        if (self.max_log_bytes and os.path.exists(self.log_path)
+                and os.path.getsize(self.log_path) > self.max_log_bytes):
+            # Old deltas move to <log>.1 - consumers further behind resync from the snapshot
+            _replace(self.log_path, self.log_path + ".1")
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(delta, separators=(',', ':'), default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
@@ -0,0 +1,456 @@
+"""
+=============================================================================
+    SMC Kernels - Vectorized building blocks for the SMC analyzers
+    NumPy versions of the per-bar Python loops
+=============================================================================
+"""
+
+import heapq
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# =============================================================================
+#                         1. SWING POINTS
+# =============================================================================
+
+def _window_max(values, size):
+    """Max over every window of `size` bars: out[k] = max(values[k:k+size])"""
+    return sliding_window_view(values, size).max(axis=1)
+
+
+def _window_min(values, size):
+    """Min over every window of `size` bars: out[k] = min(values[k:k+size])"""
+    return sliding_window_view(values, size).min(axis=1)
+
+
+def find_swing_indices(highs, lows, strength=3):
+    """
+    Find swing highs and swing lows with sliding-window max/min
+
+    Swing High: high[i] strictly above the 'strength' highs on each side
+    Swing Low: low[i] strictly below the 'strength' lows on each side
+
+    Returns (high_idx, low_idx) - sorted int arrays of bar indexes
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    n = len(highs)
+
+    if n < 2 * strength + 1:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.copy()
+
+    if strength < 1:
+        every = np.arange(n, dtype=np.int64)
+        return every, every.copy()
+
+    # left[i] = max(highs[i-strength:i]), right[i] = max(highs[i+1:i+strength+1])
+    center = slice(strength, n - strength)
+    high_max = _window_max(highs, strength)
+    low_min = _window_min(lows, strength)
+
+    is_high = (highs[center] > high_max[:n - 2 * strength]) & \
+              (highs[center] > high_max[strength + 1:])
+    is_low = (lows[center] < low_min[:n - 2 * strength]) & \
+             (lows[center] < low_min[strength + 1:])
+
+    high_idx = np.flatnonzero(is_high) + strength
+    low_idx = np.flatnonzero(is_low) + strength
+    return high_idx, low_idx
+
+
+def classify_swing_prices(prices):
+    """
+    Compare every swing with the previous swing of the same type
+
+    Returns a bool array of len(prices) - 1:
+    True = higher than previous (HH / HL), False = lower or equal (LH / LL)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices[1:] > prices[:-1]
+
+
+def merge_swing_order(high_idx, low_idx):
+    """
+    Order of highs + lows by bar index (high first when both share a bar)
+
+    Returns (bar_index, is_low) for the merged sequence
+    """
+    bars = np.concatenate([high_idx, low_idx])
+    is_low = np.concatenate([np.zeros(len(high_idx), dtype=bool),
+                             np.ones(len(low_idx), dtype=bool)])
+    order = np.lexsort((is_low, bars))
+    return bars[order], is_low[order]
+
+
+# =============================================================================
+#                         2. STRUCTURE BREAKS
+# =============================================================================
+
+def find_first_breaks(closes, start_bars, levels, above=True, inclusive=False):
+    """
+    First bar after each level's start bar where the close breaks the level
+
+    Walks the bars once keeping a heap of pending (unbroken) levels:
+    above=True  -> break when close > level (min-heap, lowest level breaks first)
+    above=False -> break when close < level (max-heap, highest level breaks first)
+    inclusive=True also counts a touch (>= / <=) - pass highs / lows as `closes`
+
+    Returns an int64 array aligned with `levels`, -1 = never broken
+    """
+    start_bars = np.asarray(start_bars, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.float64)
+    breaks = np.full(len(levels), -1, dtype=np.int64)
+    if len(levels) == 0:
+        return breaks
+
+    closes = np.asarray(closes, dtype=np.float64)
+    sign = 1.0 if above else -1.0
+    order = np.argsort(start_bars, kind='stable')
+    starts = start_bars[order].tolist()
+    keys = (levels[order] * sign).tolist()
+    ids = order.tolist()
+
+    pending = []
+    nxt = 0
+    first = starts[0] + 1
+    for bar, close in enumerate((closes[first:] * sign).tolist(), start=first):
+        # Levels become active on the bar after their swing
+        while nxt < len(starts) and starts[nxt] < bar:
+            heapq.heappush(pending, (keys[nxt], ids[nxt]))
+            nxt += 1
+        while pending and (pending[0][0] <= close if inclusive else pending[0][0] < close):
+            breaks[heapq.heappop(pending)[1]] = bar
+        if not pending and nxt == len(starts):
+            break
+
+    return breaks
+
+
+# =============================================================================
+#                         3. ORDER BLOCKS
+# =============================================================================
+
+def last_true_index(mask):
+    """
+    Prefix index: out[i] = largest j <= i with mask[j], -1 if none
+    (one pass, replaces a backward scan per lookup)
+    """
+    mask = np.asarray(mask, dtype=bool)
+    idx = np.where(mask, np.arange(len(mask), dtype=np.int64), -1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+
+def lookup_before(prefix, break_bars, lookback):
+    """
+    For every break bar: prefix[break_bar - 1] if it lies inside the
+    analyzers' window range(break_bar - 1, max(0, break_bar - lookback), -1),
+    else -1
+    """
+    break_bars = np.asarray(break_bars, dtype=np.int64)
+    found = np.full(len(break_bars), -1, dtype=np.int64)
+    valid = break_bars >= 1
+    found[valid] = prefix[break_bars[valid] - 1]
+    floor = np.maximum(0, break_bars - lookback)
+    found[found <= floor] = -1
+    return found
+
+
+def newest_unique(values, k):
+    """
+    The k largest distinct values, descending
+    Partial selection (argpartition) on a growing top slice - no full sort
+    """
+    values = np.asarray(values)
+    if k <= 0 or len(values) == 0:
+        return values[:0]
+
+    m = k
+    while m < len(values):
+        top = np.unique(values[np.argpartition(values, len(values) - m)[len(values) - m:]])
+        # top holds every distinct value >= the m-th largest
+        if len(top) >= k:
+            return top[::-1][:k]
+        m *= 2
+    return np.unique(values)[::-1][:k]
+
+
+# =============================================================================
+#                         4. FAIR VALUE GAPS
+# =============================================================================
+
+def find_fair_value_gaps(highs, lows, min_size=0.0):
+    """
+    Three-candle gaps, candle i = middle (same rule as SMC_Indicator_Pro):
+    bullish: low[i+1] > high[i-1] -> top = low[i+1],  bottom = high[i-1]
+    bearish: high[i+1] < low[i-1] -> top = low[i-1],  bottom = high[i+1]
+
+    Returns (bars, bullish, tops, bottoms) sorted by bar (bullish first on a tie),
+    gaps smaller than min_size dropped
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    if len(highs) < 3:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype(bool), empty.astype(np.float64), empty.astype(np.float64)
+
+    prev_high, prev_low = highs[:-2], lows[:-2]
+    next_high, next_low = highs[2:], lows[2:]
+
+    bull = next_low - prev_high
+    bear = prev_low - next_high
+    bull_bars = np.flatnonzero((bull > 0) & (bull >= min_size))
+    bear_bars = np.flatnonzero((bear > 0) & (bear >= min_size))
+
+    bars = np.concatenate([bull_bars, bear_bars])
+    bullish = np.concatenate([np.ones(len(bull_bars), bool), np.zeros(len(bear_bars), bool)])
+    tops = np.concatenate([next_low[bull_bars], prev_low[bear_bars]])
+    bottoms = np.concatenate([prev_high[bull_bars], next_high[bear_bars]])
+
+    order = np.lexsort((~bullish, bars))
+    return bars[order] + 1, bullish[order], tops[order], bottoms[order]
+
+
+# =============================================================================
+#                         5. EQUAL HIGHS / LOWS
+# =============================================================================
+
+def true_range_average(highs, lows, closes, period=14):
+    """ATR as a simple average of the true range (expanding for the first bars)"""
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(highs) == 0:
+        return highs.copy()
+
+    prev_close = np.concatenate([[closes[0]], closes[:-1]])
+    tr = np.maximum(highs, prev_close) - np.minimum(lows, prev_close)
+    csum = np.concatenate([[0.0], np.cumsum(tr)])
+    idx = np.arange(1, len(tr) + 1)
+    lo = np.maximum(0, idx - period)
+    return (csum[idx] - csum[lo]) / (idx - lo)
+
+
+def cluster_equal_levels(prices, tolerance):
+    """
+    Group prices lying within `tolerance` of a cluster's lowest price
+    Sort once, then jump cluster to cluster with searchsorted: O(n log n)
+
+    tolerance: scalar or one value per price (the lowest member's applies)
+    Returns a list of index arrays (into prices), 2+ members each, by price
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+    if n < 2:
+        return []
+
+    order = np.argsort(prices, kind='stable')
+    sorted_prices = prices[order]
+    tol = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (n,))[order]
+
+    clusters = []
+    i = 0
+    while i < n - 1:
+        end = int(np.searchsorted(sorted_prices, sorted_prices[i] + tol[i], side='right'))
+        if end - i >= 2:
+            clusters.append(np.sort(order[i:end]))
+            i = end
+        else:
+            i += 1
+    return clusters
+
+
+# =============================================================================
+#                         Parity check against the original loops
+# =============================================================================
+
+def _find_swing_indices_loop(highs, lows, strength=3):
+    """Reference implementation - the per-bar loop used by the analyzers"""
+    high_idx = []
+    low_idx = []
+
+    for i in range(strength, len(highs) - strength):
+        is_swing_high = True
+        for j in range(1, strength + 1):
+            if highs[i] <= highs[i-j] or highs[i] <= highs[i+j]:
+                is_swing_high = False
+                break
+        if is_swing_high:
+            high_idx.append(i)
+
+        is_swing_low = True
+        for j in range(1, strength + 1):
+            if lows[i] >= lows[i-j] or lows[i] >= lows[i+j]:
+                is_swing_low = False
+                break
+        if is_swing_low:
+            low_idx.append(i)
+
+    return high_idx, low_idx
+
+
+def _find_first_breaks_loop(closes, start_bars, levels, above=True):
+    """Reference implementation - forward rescan from every swing"""
+    breaks = []
+    for start_bar, level in zip(start_bars, levels):
+        found = -1
+        for bar in range(start_bar + 1, len(closes)):
+            if (closes[bar] > level) if above else (closes[bar] < level):
+                found = bar
+                break
+        breaks.append(found)
+    return breaks
+
+
+def _last_opposite_loop(opposite, break_bar, lookback):
+    """Reference implementation - backward scan from the break"""
+    for i in range(break_bar - 1, max(0, break_bar - lookback), -1):
+        if opposite[i]:
+            return i
+    return -1
+
+
+def _find_fair_value_gaps_loop(highs, lows, min_size=0.0):
+    """Reference implementation - the indicator's per-bar loop"""
+    gaps = []
+    for i in range(1, len(highs) - 1):
+        if lows[i + 1] > highs[i - 1] and lows[i + 1] - highs[i - 1] >= min_size:
+            gaps.append((i, True, lows[i + 1], highs[i - 1]))
+        if highs[i + 1] < lows[i - 1] and lows[i - 1] - highs[i + 1] >= min_size:
+            gaps.append((i, False, lows[i - 1], highs[i + 1]))
+    return gaps
+
+
+def _cluster_equal_levels_loop(prices, tolerance):
+    """Reference implementation - rescan the remaining prices for every anchor"""
+    n = len(prices)
+    tol = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (n,))
+    order = sorted(range(n), key=lambda k: prices[k])
+    clusters, used = [], set()
+    for pos, anchor in enumerate(order):
+        if anchor in used:
+            continue
+        members = [k for k in order[pos:] if prices[k] <= prices[anchor] + tol[anchor]]
+        if len(members) >= 2:
+            clusters.append(sorted(members))
+            used.update(members)
+    return clusters
+
+
+def _random_walk(bars, rng):
+    """Rounded random-walk OHLC - plenty of equal highs/lows (tie handling)"""
+    closes = np.round(1.1 + np.cumsum(rng.normal(0, 0.0005, bars)), 4)
+    highs = closes + np.round(np.abs(rng.normal(0, 0.0003, bars)), 4)
+    lows = closes - np.round(np.abs(rng.normal(0, 0.0003, bars)), 4)
+    return highs, lows, closes
+
+
+def check_swing_parity(bars=5000, strengths=(1, 2, 3, 5, 8), seed=7):
+    """Compare the vectorized swing kernel with the loop on random-walk and flat data"""
+    rng = np.random.default_rng(seed)
+
+    for strength in strengths:
+        highs, lows, _ = _random_walk(bars, rng)
+
+        for h, l in ((highs, lows), (np.ones(bars), np.ones(bars)), (highs[:strength * 2], lows[:strength * 2])):
+            ref_high, ref_low = _find_swing_indices_loop(h, l, strength)
+            vec_high, vec_low = find_swing_indices(h, l, strength)
+            if list(vec_high) != ref_high or list(vec_low) != ref_low:
+                print(f"[ERROR] Swing mismatch at strength={strength}")
+                return False
+
+        vec_high, _ = find_swing_indices(highs, lows, strength)
+        labels_ref = []
+        prev = None
+        for price in highs[vec_high]:
+            if prev is not None:
+                labels_ref.append(price > prev)
+            prev = price
+        if list(classify_swing_prices(highs[vec_high])) != labels_ref:
+            print(f"[ERROR] Label mismatch at strength={strength}")
+            return False
+
+    print(f"[OK] Swing kernel matches loop for strengths {list(strengths)}")
+    return True
+
+
+def check_break_parity(bars=5000, strength=3, seed=11):
+    """Compare the single-pass break detector with the forward rescans"""
+    rng = np.random.default_rng(seed)
+    highs, lows, closes = _random_walk(bars, rng)
+    high_idx, low_idx = find_swing_indices(highs, lows, strength)
+
+    for idx, prices, above in ((high_idx, highs, True), (low_idx, lows, False)):
+        ref = _find_first_breaks_loop(closes, idx.tolist(), prices[idx].tolist(), above)
+        vec = find_first_breaks(closes, idx, prices[idx], above)
+        if vec.tolist() != ref:
+            print(f"[ERROR] Break mismatch (above={above})")
+            return False
+
+    print(f"[OK] Break detector matches rescans for {len(high_idx) + len(low_idx)} levels")
+    return True
+
+
+def check_order_block_parity(bars=5000, seed=13):
+    """Compare the prefix-index lookup and partial selection with the loops"""
+    rng = np.random.default_rng(seed)
+    bearish = rng.random(bars) < 0.4
+    break_bars = rng.integers(0, bars, 2000)
+    prefix = last_true_index(bearish)
+
+    for lookback in (1, 5, 10):
+        ref = [_last_opposite_loop(bearish, b, lookback) for b in break_bars.tolist()]
+        if lookup_before(prefix, break_bars, lookback).tolist() != ref:
+            print(f"[ERROR] Order block lookup mismatch (lookback={lookback})")
+            return False
+
+    for k in (0, 1, 20, 500, 5000):
+        ref = sorted(set(break_bars.tolist()), reverse=True)[:k]
+        if newest_unique(break_bars, k).tolist() != ref:
+            print(f"[ERROR] newest_unique mismatch (k={k})")
+            return False
+
+    print(f"[OK] Order block lookup matches backward scans for {len(break_bars)} breaks")
+    return True
+
+
+def check_fvg_parity(bars=5000, seed=17):
+    """Compare the vectorized FVG detector with the indicator loop"""
+    rng = np.random.default_rng(seed)
+    highs, lows, _ = _random_walk(bars, rng)
+
+    for min_size in (0.0, 0.0003, 0.001):
+        ref = _find_fair_value_gaps_loop(highs, lows, min_size)
+        vec = list(zip(*(a.tolist() for a in find_fair_value_gaps(highs, lows, min_size))))
+        if vec != ref:
+            print(f"[ERROR] FVG mismatch (min_size={min_size})")
+            return False
+
+    print(f"[OK] FVG detector matches loop ({len(ref)} gaps at the largest min size)")
+    return True
+
+
+def check_equal_levels_parity(levels=3000, seed=19):
+    """Compare the sorted clustering with the rescanning loop"""
+    rng = np.random.default_rng(seed)
+    prices = np.round(1.1 + rng.normal(0, 0.01, levels), 5)
+
+    for tolerance in (0.0, 0.0001, 0.0005, rng.uniform(0, 0.0005, levels)):
+        ref = _cluster_equal_levels_loop(prices, tolerance)
+        vec = [c.tolist() for c in cluster_equal_levels(prices, tolerance)]
+        if vec != ref:
+            print("[ERROR] Equal levels mismatch")
+            return False
+
+    print(f"[OK] Equal levels clustering matches loop ({len(ref)} clusters)")
+    return True
+
+
+if __name__ == "__main__":
+    check_swing_parity()
+    check_break_parity()
+    check_order_block_parity()
+    check_fvg_parity()
+    check_equal_levels_parity()
@@ -0,0 +1,149 @@
+"""
+=============================================================================
+    SMC Mitigation - when price comes back to an order block
+    - mitigated:   first bar after the break that trades into the zone
+                   (low <= high for a BULL OB, high >= low for a BEAR OB)
+    - invalidated: first bar that closes through the far side
+                   (close < low for a BULL OB, close > high for a BEAR OB)
+
+    Zones are kept in heaps sorted by the edge price has to reach, so each
+    bar only pops the zones it actually hits: O((bars + zones) log zones)
+=============================================================================
+"""
+
+import heapq
+
+import numpy as np
+
+from smc_kernels import find_first_breaks
+
+
+def mark_mitigation(core, order_blocks):
+    """
+    Batch: fill mitigated / invalidated fields of every OB in place
+    One heap pass over the bars per side and event
+    """
+    if not order_blocks:
+        return order_blocks
+
+    bull = [ob for ob in order_blocks if ob.bullish]
+    bear = [ob for ob in order_blocks if not ob.bullish]
+
+    for obs, bullish in ((bull, True), (bear, False)):
+        if not obs:
+            continue
+        starts = np.array([max(ob.break_bar, ob.bar_index) for ob in obs], dtype=np.int64)
+        highs = np.array([ob.high for ob in obs])
+        lows = np.array([ob.low for ob in obs])
+
+        if bullish:
+            touched = find_first_breaks(core.lows, starts, highs, above=False, inclusive=True)
+            closed = find_first_breaks(core.closes, starts, lows, above=False)
+        else:
+            touched = find_first_breaks(core.highs, starts, lows, above=True, inclusive=True)
+            closed = find_first_breaks(core.closes, starts, highs, above=True)
+
+        for ob, t, c in zip(obs, touched.tolist(), closed.tolist()):
+            if t >= 0:
+                ob.mitigated = True
+                ob.mitigated_bar = t
+                ob.mitigated_time = core.epochs[t]
+            if c >= 0:
+                ob.invalidated = True
+                ob.invalidated_bar = c
+
+    return order_blocks
+
+
+class MitigationTracker:
+    """
+    Incremental version of mark_mitigation for streaming
+
+    tracker.add(ob, history)                 # once the OB is known
+    changed = tracker.on_bar(i, t, h, l, c)  # OBs whose state changed on bar i
+    """
+
+    def __init__(self):
+        # (sort key, seq) - the zone nearest to price is always on top
+        self._touch_bull = []   # max high  -> -high
+        self._touch_bear = []   # min low
+        self._close_bull = []   # max low   -> -low
+        self._close_bear = []   # min high
+        self._live = {}         # seq -> OB not invalidated yet
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._live)
+
+    def add(self, ob, history=()):
+        """
+        Start tracking an OB - `history`: bars (index, time, high, low, close)
+        already closed after its break bar, replayed for this OB only
+        """
+        start = max(ob.break_bar, ob.bar_index)
+        for index, time, high, low, close in history:
+            if index > start:
+                self._apply(ob, index, time, high, low, close)
+        if ob.invalidated:
+            return
+
+        self._seq += 1
+        seq = self._seq
+        self._live[seq] = ob
+        if ob.bullish:
+            if not ob.mitigated:
+                heapq.heappush(self._touch_bull, (-ob.high, seq))
+            heapq.heappush(self._close_bull, (-ob.low, seq))
+        else:
+            if not ob.mitigated:
+                heapq.heappush(self._touch_bear, (ob.low, seq))
+            heapq.heappush(self._close_bear, (ob.high, seq))
+
+    def discard(self, ob):
+        """Stop tracking an OB (dropped from the result); heap entries go lazily"""
+        for seq, live in self._live.items():
+            if live is ob:
+                del self._live[seq]
+                break
+        heaps = (self._touch_bull, self._touch_bear, self._close_bull, self._close_bear)
+        if sum(len(h) for h in heaps) > 4 * len(self._live) + 64:
+            for heap in heaps:
+                heap[:] = [entry for entry in heap if entry[1] in self._live]
+                heapq.heapify(heap)
+
+    def on_bar(self, index, time, high, low, close):
+        """Apply one closed bar; returns the OBs that got mitigated / invalidated"""
+        changed = []
+
+        for heap, hit in (
+            (self._touch_bull, lambda key: -key >= low),
+            (self._touch_bear, lambda key: key <= high),
+            (self._close_bull, lambda key: -key > close),
+            (self._close_bear, lambda key: key < close),
+        ):
+            while heap and hit(heap[0][0]):
+                seq = heapq.heappop(heap)[1]
+                ob = self._live.get(seq)
+                if ob is None:
+                    continue
+                if self._apply(ob, index, time, high, low, close) and not any(ob is o for o in changed):
+                    changed.append(ob)
+                if ob.invalidated:
+                    del self._live[seq]
+
+        return changed
+
+    @staticmethod
+    def _apply(ob, index, time, high, low, close):
+        """Update one OB with one bar; True if its state changed"""
+        changed = False
+        if not ob.mitigated and ((low <= ob.high) if ob.bullish else (high >= ob.low)):
+            ob.mitigated = True
+            ob.mitigated_bar = index
+            ob.mitigated_time = time
+            changed = True
+        if not ob.invalidated and ((close < ob.low) if ob.bullish else (close > ob.high)):
+            ob.invalidated = True
+            ob.invalidated_bar = index
+            changed = True
+        return changed
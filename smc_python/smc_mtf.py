@@ -0,0 +1,309 @@
+"""
+=============================================================================
+    SMC Multi-Timeframe - one base-timeframe fetch, every timeframe analyzed
+    - the base timeframe is resampled in memory (H1 -> H4 -> D1 ...)
+    - the same rule profile runs on each timeframe
+    - every base-timeframe signal gets the HTF trend and the HTF order block
+      it sits inside, using only HTF information known at that moment
+
+    python smc_mtf.py --symbol EURUSD --base M15 --higher H1 H4 D1
+    python smc_mtf.py --check       (contexts vs runs on cut-off history)
+=============================================================================
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_providers import (
+    TIMEFRAMES, TIMEFRAME_SECONDS, RATES_DTYPE, get_default_provider, provider_from_spec
+)
+from smc_core import SMCCore, PROFILES, signal_payload, export_collections
+from smc_backtest import signal_bars
+from smc_records import Record, to_dicts
+from smc_export import write_json_atomic
+
+
+# Collections that get HTF context: (price of the signal, bar it becomes known)
+CONTEXT_SIGNALS = {
+    'bos': (lambda r: r.level, lambda r: r.break_bar),
+    'choch': (lambda r: r.level, lambda r: r.break_bar),
+    'order_blocks': (lambda r: (r.high + r.low) / 2, lambda r: max(r.break_bar, r.bar_index)),
+    'fvgs': (lambda r: (r.top + r.bottom) / 2, lambda r: r.bar_index + 1),
+}
+
+
+class HTFContext(Record):
+    """
+    Where one base-timeframe signal sits on a higher timeframe
+    index: position in the base collection, time: bar the signal is known on
+    """
+
+    __slots__ = ('collection', 'index', 'time', 'price', 'timeframe', 'trend',
+                 'ob_type', 'ob_time', 'ob_high', 'ob_low')
+
+    def __init__(self, collection, index, time, price, timeframe, trend,
+                 ob_type=None, ob_time=None, ob_high=None, ob_low=None):
+        self.collection = collection
+        self.index = index
+        self.time = time
+        self.price = price
+        self.timeframe = timeframe
+        self.trend = trend
+        self.ob_type = ob_type
+        self.ob_time = ob_time
+        self.ob_high = ob_high
+        self.ob_low = ob_low
+
+
+CONTEXT_LAYOUT = ('collection', 'index', 'time', 'price', 'timeframe', 'trend',
+                  'ob_type', 'ob_time', 'ob_high', 'ob_low')
+
+
+# =============================================================================
+#                         Resampling
+# =============================================================================
+
+def resample_rates(rates, timeframe):
+    """
+    Base rates -> `timeframe` rates (RATES_DTYPE), bars aligned like MT5
+    (bar time = epoch floored to the timeframe; the last bar may still be forming)
+    """
+    rates = np.asarray(rates)
+    out = np.zeros(0, dtype=RATES_DTYPE)
+    if len(rates) == 0:
+        return out
+
+    seconds = TIMEFRAME_SECONDS[TIMEFRAMES[timeframe]]
+    keys = rates['time'].astype(np.int64) // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(rates)] - 1
+
+    out = np.zeros(len(starts), dtype=RATES_DTYPE)
+    out['time'] = keys[starts]
+    out['open'] = rates['open'][starts]
+    out['high'] = np.maximum.reduceat(rates['high'], starts)
+    out['low'] = np.minimum.reduceat(rates['low'], starts)
+    out['close'] = rates['close'][ends]
+    for field in ('tick_volume', 'real_volume'):
+        if field in rates.dtype.names:
+            out[field] = np.add.reduceat(rates[field], starts)
+    if 'spread' in rates.dtype.names:
+        out['spread'] = np.minimum.reduceat(rates['spread'], starts)
+    return out
+
+
+# =============================================================================
+#                         HTF state known at a given time
+# =============================================================================
+
+def _known_at(core, bars, seconds):
+    """Close time of bar, inf when not closed yet"""
+    bars = np.asarray(bars, dtype=np.int64)
+    known = np.full(len(bars), np.inf)
+    ok = bars < len(core)
+    known[ok] = np.asarray(core.epochs)[bars[ok]] + seconds
+    return known
+
+
+def _htf_index(profile, core, result, timeframe, params):
+    """Arrays to look up trend / order blocks of one HTF by time"""
+    seconds = TIMEFRAME_SECONDS[TIMEFRAMES[timeframe]]
+    # Same timing as the backtest: V3 waits for the swing, V2 for the HH / LL
+    # that records the break, V1 CHoCH for the walk that labels it
+    known = signal_bars(profile, result, params.get('swing_strength'), core)
+    breaks = result['bos'] + result['choch']
+    break_bars = np.concatenate([known['bos'], known['choch']]).astype(np.int64)
+    break_known = _known_at(core, break_bars, seconds)
+    order = np.lexsort(([b.break_bar for b in breaks], break_known))
+
+    # An OB shows up with its break (the first known one when a bar breaks several levels)
+    first_known = {}
+    for brk, k in zip(breaks, break_bars.tolist()):
+        first_known[brk.break_bar] = min(k, first_known.get(brk.break_bar, k))
+
+    obs = result['order_blocks']
+    return {
+        'timeframe': timeframe,
+        'break_known': break_known[order],
+        'break_bull': np.array(['BULL' in breaks[k].type for k in order.tolist()], dtype=bool),
+        'obs': obs,
+        'ob_known': _known_at(core, [max(first_known.get(ob.break_bar, len(core)), ob.bar_index)
+                                     for ob in obs], seconds),
+        'ob_dead': _known_at(core, [ob.invalidated_bar if ob.invalidated else len(core)
+                                    for ob in obs], seconds),
+        'ob_high': np.array([ob.high for ob in obs]),
+        'ob_low': np.array([ob.low for ob in obs]),
+        'ob_bar': np.array([ob.bar_index for ob in obs], dtype=np.int64),
+    }
+
+
+def htf_context(base_core, base_result, htf_indexes, base_timeframe):
+    """HTFContext for every signal of CONTEXT_SIGNALS x every higher timeframe"""
+    base_seconds = TIMEFRAME_SECONDS[TIMEFRAMES[base_timeframe]]
+    contexts = []
+
+    for collection, (price_of, bar_of) in CONTEXT_SIGNALS.items():
+        records = base_result.get(collection, [])
+        if not records:
+            continue
+        prices = np.array([price_of(r) for r in records])
+        bars = [bar_of(r) for r in records]
+        known = _known_at(base_core, bars, base_seconds)
+
+        for index in htf_indexes:
+            # Trend = direction of the last HTF break known by then
+            last = np.searchsorted(index['break_known'], known, side='right') - 1
+
+            for k in range(len(records)):
+                trend = None
+                if last[k] >= 0:
+                    trend = 'bull' if index['break_bull'][last[k]] else 'bear'
+
+                ctx = HTFContext(collection, k, base_core.epochs[bars[k]], float(prices[k]),
+                                 index['timeframe'], trend)
+                if len(index['obs']):
+                    inside = ((index['ob_known'] <= known[k]) & (index['ob_dead'] > known[k]) &
+                              (index['ob_low'] <= prices[k]) & (prices[k] <= index['ob_high']))
+                    hits = np.flatnonzero(inside)
+                    if len(hits):
+                        ob = index['obs'][hits[np.argmax(index['ob_bar'][hits])]]
+                        ctx.ob_type, ctx.ob_time = ob.type, ob.time
+                        ctx.ob_high, ctx.ob_low = ob.high, ob.low
+                contexts.append(ctx)
+
+    return contexts
+
+
+# =============================================================================
+#                         Runner
+# =============================================================================
+
+def run_mtf(rates, base_timeframe='M15', higher=('H1', 'H4', 'D1'), profile='v3', **params):
+    """
+    Analyze the base timeframe and its resampled higher timeframes
+    Returns {'base': result, 'htf': {tf: result}, 'context': [HTFContext]}
+    V3 keeps every HTF order block (max_ob=None) so containment is complete
+    """
+    base_seconds = TIMEFRAME_SECONDS[TIMEFRAMES[base_timeframe]]
+    base_core = SMCCore.from_rates(rates)
+    base_result = PROFILES[profile](base_core, **params)
+
+    htf_results = {}
+    indexes = []
+    for tf in higher:
+        if TIMEFRAME_SECONDS[TIMEFRAMES[tf]] <= base_seconds:
+            print(f"[ERROR] {tf} is not higher than {base_timeframe} - skipped")
+            continue
+        core = SMCCore.from_rates(resample_rates(rates, tf))
+        htf_params = dict(params, max_ob=None) if profile == 'v3' else params
+        htf_results[tf] = PROFILES[profile](core, **htf_params)
+        indexes.append(_htf_index(profile, core, htf_results[tf], tf, params))
+
+    return {
+        'base': base_result,
+        'htf': htf_results,
+        'context': htf_context(base_core, base_result, indexes, base_timeframe),
+    }
+
+
+def check_point_in_time(rates, base_timeframe='M15', higher=('H1', 'H4', 'D1'), profile='v3',
+                        cuts=(0.4, 0.6, 0.8), **params):
+    """
+    Runs run_mtf on the history cut at each fraction of `cuts`: every context
+    of a cut run has to match the full run's context of the same signal
+    (nothing an HTF did after the cut may leak into it)
+    Returns (contexts compared, [(cut, signal, full context, cut context)])
+    """
+    def key(c):
+        return c.collection, c.time, c.price, c.timeframe
+
+    def state(c):
+        return c.trend, c.ob_type, c.ob_time, c.ob_high, c.ob_low
+
+    full = {key(c): state(c) for c in run_mtf(rates, base_timeframe, higher, profile, **params)['context']}
+    compared = 0
+    mismatches = []
+    for fraction in cuts:
+        cut = int(len(rates) * fraction)
+        for c in run_mtf(rates[:cut], base_timeframe, higher, profile, **params)['context']:
+            if key(c) not in full:
+                continue
+            compared += 1
+            if full[key(c)] != state(c):
+                mismatches.append((cut, key(c), full[key(c)], state(c)))
+    return compared, mismatches
+
+
+def mtf_payload(profile, symbol, base_timeframe, mtf):
+    """Signal file: base payload + 'htf' results + 'htf_context'"""
+    payload = signal_payload(profile, symbol, base_timeframe, mtf['base'])
+    payload['htf'] = {tf: export_collections(profile, result) for tf, result in mtf['htf'].items()}
+    payload['htf_context'] = to_dicts(mtf['context'], CONTEXT_LAYOUT)
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMC multi-timeframe analysis from one fetch")
+    parser.add_argument("--symbol", default="EURUSD")
+    parser.add_argument("--base", default="M15", choices=list(TIMEFRAMES))
+    parser.add_argument("--higher", nargs="+", default=["H1", "H4", "D1"], choices=list(TIMEFRAMES))
+    parser.add_argument("--bars", type=int, default=20_000, help="base-timeframe bars")
+    parser.add_argument("--profile", default="v3", choices=list(PROFILES))
+    parser.add_argument("--swing-strength", type=int, default=None)
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir> | replay[:speed]")
+    parser.add_argument("--output", default="smc_signals_mtf.json")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the contexts with runs cut at 40/60/80%% of the bars")
+    args = parser.parse_args()
+
+    provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+    if not provider.connect():
+        print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+        return 1
+    try:
+        provider.select_symbol(args.symbol)
+        rates = provider.get_rates(args.symbol, TIMEFRAMES[args.base], args.bars)
+    finally:
+        provider.shutdown()
+    if rates is None or len(rates) == 0:
+        print(f"[ERROR] No data: {provider.last_error()}")
+        return 1
+    print(f"[OK] Fetched {len(rates)} {args.base} bars (one request)")
+
+    params = {}
+    if args.swing_strength is not None:
+        params['swing_strength'] = args.swing_strength
+    if args.check:
+        compared, mismatches = check_point_in_time(rates, args.base, args.higher, args.profile,
+                                                   **params)
+        for cut, signal, full, partial in mismatches[:20]:
+            print(f"   cut {cut}: {signal} full={full} cut={partial}")
+        if mismatches:
+            print(f"[ERROR] {len(mismatches)}/{compared} contexts differ on cut-off history")
+            return 1
+        print(f"[OK] {compared} contexts match on cut-off history")
+        return 0
+
+    mtf = run_mtf(rates, args.base, args.higher, args.profile, **params)
+
+    write_json_atomic(args.output, mtf_payload(args.profile, args.symbol, args.base, mtf))
+
+    print("\n" + "=" * 60)
+    print(f"   Multi-timeframe Summary ({args.base} base):")
+    for tf, result in [(args.base, mtf['base'])] + list(mtf['htf'].items()):
+        counts = ', '.join(f"{k}={len(v)}" for k, v in result.items())
+        print(f"   - {tf}: {counts}")
+    inside = sum(1 for c in mtf['context'] if c.ob_time is not None)
+    print(f"   - Signals inside an HTF order block: {inside}/{len(mtf['context'])}")
+    print("=" * 60)
+    print(f"[OK] Results saved to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+=============================================================================
+    SMC Profiling - per-stage instrumentation of analyze()
+    - every stage (fetch, dataframe, core, swings, breaks, order_blocks,
+      fvgs, equal_levels, export) records wall time, CPU time and bars
+    - memory mode: tracemalloc bytes allocated / peak + allocated blocks
+    - cprofile mode: cProfile over the whole run, top functions in the report
+    - reports as JSON, or Prometheus text (per symbol / timeframe / stage)
+
+    Switch on demand without code changes:
+    SMC_INSTRUMENT=memory,cprofile      # off (default: timing only)
+    SMC_INSTRUMENT_DIR=metrics          # write smc_stages.json / smc_stages.prom
+
+    python smc_profiling.py --symbols EURUSD GBPUSD --bars 5000 --memory
+=============================================================================
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smc_export import write_json_atomic, write_text_atomic
+
+
+class Instrumentation:
+    """
+    Stage recorder for one analyze() run at a time
+
+    inst = Instrumentation(memory=True)
+    inst.begin("EURUSD", "H1", "v3")
+    with inst.stage('swings', bars=500):
+        ...
+    report = inst.end()        # dict, also recorded in REGISTRY
+    """
+
+    def __init__(self, memory=False, cprofile=False, top=25, registry=None, enabled=True):
+        self.enabled = enabled
+        self.memory = memory
+        self.cprofile = cprofile
+        self.top = top
+        self.registry = REGISTRY if registry is None else registry
+        self.stages = []
+        self.context = {}
+        self.profiler = None
+        self._started = None
+        self._own_tracing = False
+
+    @classmethod
+    def from_env(cls, spec=None):
+        """SMC_INSTRUMENT = "off" | "timing" | "memory" | "cprofile" | "memory,cprofile" """
+        spec = os.environ.get('SMC_INSTRUMENT', '') if spec is None else spec
+        modes = {m.strip().lower() for m in spec.split(',') if m.strip()}
+        return cls(memory='memory' in modes, cprofile=bool(modes & {'cprofile', 'profile'}),
+                   enabled='off' not in modes)
+
+    # -------------------------------------------------------------------------
+    #   Run
+    # -------------------------------------------------------------------------
+
+    def begin(self, symbol, timeframe, profile, **context):
+        """Start a run (drops stages recorded before, e.g. by a lone get_data())"""
+        self.stages = []
+        self.context = {'symbol': symbol, 'timeframe': timeframe, 'profile': profile, **context}
+        self._started = (time.perf_counter(), time.process_time(), datetime.now().isoformat())
+        if not self.enabled:
+            return
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracing = True
+        if self.cprofile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextmanager
+    def stage(self, name, bars=None):
+        """Time one stage; the yielded dict can take extra fields (e.g. items found)"""
+        entry = {'stage': name, 'bars': bars}
+        if not self.enabled:
+            yield entry
+            return
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+            blocks_start = sys.getallocatedblocks()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield entry
+        finally:
+            entry['wall_ms'] = round((time.perf_counter() - wall_start) * 1000, 3)
+            entry['cpu_ms'] = round((time.process_time() - cpu_start) * 1000, 3)
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                entry['alloc_bytes'] = current - mem_start
+                entry['peak_bytes'] = peak - mem_start
+                entry['blocks'] = sys.getallocatedblocks() - blocks_start
+            self.stages.append(entry)
+
+    def end(self):
+        """Finish the run -> report dict (None if begin() was never called)"""
+        if self._started is None:
+            return None
+        wall_start, cpu_start, started_at = self._started
+        self._started = None
+
+        report = {
+            **self.context,
+            'started_at': started_at,
+            'wall_ms': round((time.perf_counter() - wall_start) * 1000, 3),
+            'cpu_ms': round((time.process_time() - cpu_start) * 1000, 3),
+            'bars': max((s['bars'] for s in self.stages if s['bars'] is not None), default=None),
+            'memory': self.memory and self.enabled,
+            'stages': list(self.stages),
+        }
+        if self.profiler is not None:
+            self.profiler.disable()
+            report['cprofile'] = top_functions(self.profiler, self.top)
+        if self._own_tracing:
+            tracemalloc.stop()
+            self._own_tracing = False
+        if self.enabled:
+            self.registry.record(report)
+        return report
+
+    def write_pstats(self, path):
+        """Raw cProfile data of the last run (snakeviz / pstats)"""
+        if self.profiler is None:
+            return None
+        self.profiler.dump_stats(path)
+        return path
+
+
+def top_functions(profiler, top=25):
+    """cProfile -> [{function, calls, tottime_ms, cumtime_ms}] by cumulative time"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({func})",
+            'calls': nc,
+            'tottime_ms': round(tt * 1000, 3),
+            'cumtime_ms': round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:top]
+
+
+def format_stages(report):
+    """Text table of one report (printed after the analyze() summary)"""
+    lines = [f"   {'stage':<14}{'wall ms':>10}{'cpu ms':>10}{'bars':>9}"
+             + (f"{'alloc KB':>11}{'peak KB':>10}" if report['memory'] else "")]
+    for s in report['stages']:
+        line = (f"   {s['stage']:<14}{s['wall_ms']:>10.2f}{s['cpu_ms']:>10.2f}"
+                f"{s['bars'] if s['bars'] is not None else '-':>9}")
+        if 'alloc_bytes' in s:
+            line += f"{s['alloc_bytes'] / 1024:>11.1f}{s['peak_bytes'] / 1024:>10.1f}"
+        lines.append(line)
+    lines.append(f"   {'total':<14}{report['wall_ms']:>10.2f}{report['cpu_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+# =============================================================================
+#                         Registry (every run of the process)
+# =============================================================================
+
+class StageRegistry:
+    """
+    Aggregates reports per (symbol, timeframe, profile, stage):
+    count / sums for rates and the last run's values for gauges
+    """
+
+    def __init__(self, history=200):
+        self.runs = deque(maxlen=history)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def record(self, report):
+        with self._lock:
+            self.runs.append(report)
+            for s in report['stages']:
+                key = (report['symbol'], report['timeframe'], report['profile'], s['stage'])
+                agg = self.series.setdefault(key, {'count': 0, 'wall_sum': 0.0, 'cpu_sum': 0.0})
+                agg['count'] += 1
+                agg['wall_sum'] += s['wall_ms'] / 1000
+                agg['cpu_sum'] += s['cpu_ms'] / 1000
+                agg['last'] = s
+
+    def clear(self):
+        with self._lock:
+            self.runs.clear()
+            self.series.clear()
+
+    def to_json(self):
+        with self._lock:
+            return {
+                'generated_at': datetime.now().isoformat(),
+                'runs': list(self.runs),
+                'stages': [
+                    {'symbol': k[0], 'timeframe': k[1], 'profile': k[2], 'stage': k[3],
+                     'count': v['count'], 'wall_seconds_sum': round(v['wall_sum'], 6),
+                     'cpu_seconds_sum': round(v['cpu_sum'], 6), 'last': v['last']}
+                    for k, v in self.series.items()
+                ],
+            }
+
+    def metrics_text(self):
+        """Prometheus text exposition (summary-style _sum / _count + last-run gauges)"""
+        with self._lock:
+            items = sorted(self.series.items())
+        series = (
+            ('smc_stage_wall_seconds_sum', 'counter', lambda v: v['wall_sum']),
+            ('smc_stage_wall_seconds_count', 'counter', lambda v: v['count']),
+            ('smc_stage_cpu_seconds_sum', 'counter', lambda v: v['cpu_sum']),
+            ('smc_stage_last_wall_seconds', 'gauge', lambda v: v['last']['wall_ms'] / 1000),
+            ('smc_stage_last_cpu_seconds', 'gauge', lambda v: v['last']['cpu_ms'] / 1000),
+            ('smc_stage_last_bars', 'gauge', lambda v: v['last']['bars']),
+            ('smc_stage_last_alloc_bytes', 'gauge', lambda v: v['last'].get('alloc_bytes')),
+            ('smc_stage_last_peak_bytes', 'gauge', lambda v: v['last'].get('peak_bytes')),
+            ('smc_stage_last_blocks', 'gauge', lambda v: v['last'].get('blocks')),
+        )
+        lines = []
+        for name, kind, value_of in series:
+            values = [(key, value_of(agg)) for key, agg in items]
+            values = [(key, value) for key, value in values if value is not None]
+            if not values:
+                continue
+            lines.append(f"# TYPE {name} {kind}")
+            for (symbol, timeframe, profile, stage), value in values:
+                labels = (f'symbol="{symbol}",timeframe="{timeframe}",'
+                          f'profile="{profile}",stage="{stage}"')
+                lines.append(f"{name}{{{labels}}} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, out_dir):
+        """<out_dir>/smc_stages.json + smc_stages.prom (textfile collector), atomic"""
+        os.makedirs(out_dir, exist_ok=True)
+        json_path = write_json_atomic(os.path.join(out_dir, "smc_stages.json"), self.to_json())
+        prom_path = write_text_atomic(os.path.join(out_dir, "smc_stages.prom"), self.metrics_text())
+        return json_path, prom_path
+
+
+REGISTRY = StageRegistry()
+
+
+# =============================================================================
+#                         CLI - instrumented analyze() runs
+# =============================================================================
+
+def main():
+    from data_providers import TIMEFRAMES, provider_from_spec
+    from smc_analyzer import SMCAnalyzer
+    from smc_analyzer_v2 import SMCAnalyzerV2
+    from smc_analyzer_v3 import SMCAnalyzerV3
+
+    analyzers = {'v1': SMCAnalyzer, 'v2': SMCAnalyzerV2, 'v3': SMCAnalyzerV3}
+    parser = argparse.ArgumentParser(description="Per-stage timing / memory / cProfile of analyze()")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"])
+    parser.add_argument("--timeframes", nargs="+", default=["H1"], choices=list(TIMEFRAMES))
+    parser.add_argument("--profile", default="v3", choices=list(analyzers))
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--memory", action="store_true", help="tracemalloc per stage")
+    parser.add_argument("--cprofile", action="store_true", help="cProfile capture (top functions)")
+    parser.add_argument("--out-dir", default="metrics", help="smc_stages.json / .prom / .pstats")
+    parser.add_argument("--format", default="table", choices=["table", "json", "prom"])
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir> | replay[:speed]")
+    args = parser.parse_args()
+
+    provider = provider_from_spec(args.provider) if args.provider else None
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    for symbol in args.symbols:
+        for tf in args.timeframes:
+            analyzer = analyzers[args.profile](symbol, TIMEFRAMES[tf], provider)
+            analyzer.instrument = Instrumentation(memory=args.memory, cprofile=args.cprofile)
+            for _ in range(args.repeat):
+                # Signal files of the runs go next to the metrics
+                cwd = os.getcwd()
+                os.chdir(out_dir)
+                try:
+                    analyzer.analyze(bars=args.bars)
+                finally:
+                    os.chdir(cwd)
+            if args.cprofile:
+                analyzer.instrument.write_pstats(os.path.join(out_dir, f"smc_{symbol}_{tf}.pstats"))
+
+    json_path, prom_path = REGISTRY.write(out_dir)
+    if args.format == 'json':
+        import json
+        print(json.dumps(REGISTRY.to_json()['stages'], indent=2))
+    elif args.format == 'prom':
+        print(REGISTRY.metrics_text())
+    print(f"[OK] Stage metrics saved to: {json_path}, {prom_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
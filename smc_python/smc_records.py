@@ -0,0 +1,204 @@
+"""
+=============================================================================
+    SMC Records - compact result types for swings, breaks and order blocks
+    - __slots__ instead of dicts (no per-record key tables)
+    - times stored as epoch seconds (int), formatted only on export
+=============================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Fields holding epoch-second timestamps
+TIME_FIELDS = frozenset(('time', 'start_time', 'break_time', 'mitigated_time', 'filled_time',
+                         'first_time', 'last_time', 'swept_time'))
+
+# Resolution get_data() ends up with (ns on pandas 2, s on pandas 3)
+_TIME_DTYPE = pd.to_datetime(pd.Series([0]), unit='s').dtype
+
+
+def to_epoch(value):
+    """Epoch seconds from an MT5 int time, numpy datetime64 or pandas Timestamp"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(np.datetime64(pd.Timestamp(value), 's').astype(np.int64))
+
+
+def epochs_of(times):
+    """Epoch seconds (int64 array) for a column of MT5 int times or datetimes"""
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.integer):
+        return times.astype(np.int64)
+    return times.astype('datetime64[s]').astype(np.int64)
+
+
+def format_time(epoch, stamp=False):
+    """
+    Epoch -> the string the analyzers always exported
+    stamp=False: str(numpy datetime64)  e.g. 2024-01-02T10:00:00.000000000
+    stamp=True:  str(pandas Timestamp)  e.g. 2024-01-02 10:00:00
+    """
+    if stamp:
+        return str(pd.Timestamp(epoch, unit='s'))
+    return str(np.datetime64(epoch, 's').astype(_TIME_DTYPE))
+
+
+class Record:
+    """Base for slot records - read access by attribute or record['field']"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self, fields=None, stamp_fields=()):
+        """Plain dict in `fields` order with times formatted (export only)"""
+        out = {}
+        for f in fields or self.__slots__:
+            value = getattr(self, f)
+            if f in TIME_FIELDS and value is not None:
+                value = format_time(value, f in stamp_fields)
+            out[f] = value
+        return out
+
+
+class Swing(Record):
+    """Swing high / low - label: HH, HL, LH, LL (SH / SL = first of its type)"""
+
+    __slots__ = ('type', 'label', 'price', 'time', 'bar_index')
+
+    def __init__(self, type, label, price, time, bar_index):
+        self.type = type
+        self.label = label
+        self.price = price
+        self.time = time
+        self.bar_index = bar_index
+
+
+class Break(Record):
+    """BOS / CHoCH - the level set at start_bar and closed through at break_bar"""
+
+    __slots__ = ('type', 'level', 'start_time', 'start_bar', 'break_time', 'break_bar')
+
+    def __init__(self, type, level, start_time, start_bar, break_time, break_bar):
+        self.type = type
+        self.level = level
+        self.start_time = start_time
+        self.start_bar = start_bar
+        self.break_time = break_time
+        self.break_bar = break_bar
+
+
+class OrderBlock(Record):
+    """
+    Order block candle - source: the break that produced it (BOS / CHoCH)
+    Mitigation (smc_mitigation) is checked from the bar after break_bar:
+    mitigated = price traded back into the zone, invalidated = closed through it
+    """
+
+    __slots__ = ('type', 'high', 'low', 'open', 'close', 'time', 'bar_index', 'source',
+                 'mitigated', 'break_bar', 'mitigated_bar', 'mitigated_time',
+                 'invalidated', 'invalidated_bar')
+
+    def __init__(self, type, high, low, open, close, time, bar_index, source=None,
+                 mitigated=False, break_bar=-1):
+        self.type = type
+        self.high = high
+        self.low = low
+        self.open = open
+        self.close = close
+        self.time = time
+        self.bar_index = bar_index
+        self.source = source
+        self.mitigated = mitigated
+        self.break_bar = break_bar
+        self.mitigated_bar = -1
+        self.mitigated_time = None
+        self.invalidated = False
+        self.invalidated_bar = -1
+
+    @property
+    def bullish(self):
+        """Demand zone (BULL / OB_BULL)"""
+        return 'BULL' in self.type
+
+
+class FairValueGap(Record):
+    """
+    Three-candle imbalance - time / bar_index: the middle candle
+    partial = price entered the gap, filled = price crossed it completely,
+    fill_ratio = deepest part of the gap traded so far (0..1)
+    """
+
+    __slots__ = ('type', 'top', 'bottom', 'time', 'bar_index', 'partial', 'partial_bar',
+                 'filled', 'filled_bar', 'filled_time', 'fill_ratio')
+
+    def __init__(self, type, top, bottom, time, bar_index):
+        self.type = type
+        self.top = top
+        self.bottom = bottom
+        self.time = time
+        self.bar_index = bar_index
+        self.partial = False
+        self.partial_bar = -1
+        self.filled = False
+        self.filled_bar = -1
+        self.filled_time = None
+        self.fill_ratio = 0.0
+
+
+class EqualLevel(Record):
+    """
+    Equal highs (EQH) / equal lows (EQL) - swings within tolerance of each other
+    level = mean member price, swept = price later traded beyond the whole cluster
+    """
+
+    __slots__ = ('type', 'level', 'top', 'bottom', 'count', 'first_time', 'last_time',
+                 'last_bar', 'swept', 'swept_bar', 'swept_time', 'members')
+
+    # Member swings on export (no 'type' key - the EA scans objects by "type")
+    MEMBER_FIELDS = ('label', 'price', 'time', 'bar_index')
+
+    def __init__(self, type, members):
+        prices = [m.price for m in members]
+        self.type = type
+        self.level = sum(prices) / len(prices)
+        self.top = max(prices)
+        self.bottom = min(prices)
+        self.count = len(members)
+        self.first_time = members[0].time
+        self.last_time = members[-1].time
+        self.last_bar = members[-1].bar_index
+        self.swept = False
+        self.swept_bar = -1
+        self.swept_time = None
+        self.members = members
+
+    def to_dict(self, fields=None, stamp_fields=()):
+        out = super().to_dict(fields, stamp_fields)
+        if 'members' in out:
+            out['members'] = to_dicts(self.members, self.MEMBER_FIELDS)
+        return out
+
+
+def to_dicts(records, fields=None, stamp_fields=()):
+    """Convert a list of records for JSON export"""
+    return [r.to_dict(fields, stamp_fields) for r in records]
@@ -0,0 +1,443 @@
+"""
+=============================================================================
+    SMC Sweep - parameter grid over analysis + backtest in a process pool
+    - the bars of every symbol / timeframe sit in one SharedMemory block;
+      workers map it once (no price arrays pickled per task)
+    - combinations are grouped by the structure parameters (profile,
+      swing_strength, ob_lookback): a task = one structure + a batch of
+      trade settings (SL / TP, entries, max_ob ...) -> the swings / breaks /
+      OBs are computed once per batch and kept in a small per-worker cache
+    - every finished task is appended to <out>/results.jsonl right away and
+      <out>/ranked.json (top N) is rewritten atomically while the sweep runs
+    - --resume skips combinations already in results.jsonl
+
+    python smc_sweep.py --symbols EURUSD GBPUSD --timeframes H1 --bars 6240
+    python smc_sweep.py --grid grid.json --rank-by sharpe_ratio --min-trades 30
+    python smc_sweep.py --benchmark      # throughput vs number of workers
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import heapq
+import argparse
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_providers import TIMEFRAMES, RATES_DTYPE, SyntheticProvider, get_default_provider, provider_from_spec
+from smc_core import SMCCore
+from smc_backtest import market_structure, backtest, bars_per_year
+from smc_export import write_json_atomic
+
+# Parameters that change the analysis (one structure per combination of these)
+STRUCTURE_PARAMS = ('profile', 'swing_strength', 'ob_lookback')
+
+# Only used by order block entries - dropped from combinations without 'ob'
+OB_ONLY_PARAMS = ('ob_lookback', 'max_ob', 'ob_rr', 'ob_sl_buffer', 'ob_expiry')
+
+DEFAULT_GRID = {
+    'profile': ['v3'],
+    'swing_strength': [3, 5, 8],
+    'ob_lookback': [5, 10],
+    'entries': [['bos', 'choch'], ['bos', 'choch', 'ob']],
+    'max_ob': [None, 5],
+    'sl_atr': [1.0, 1.5, 2.0],
+    'tp_atr': [1.5, 2.0, 3.0],
+}
+
+# Metrics copied into every result row
+ROW_METRICS = ('total_profit', 'total_trades', 'win_rate', 'max_drawdown', 'max_drawdown_pct',
+               'profit_factor', 'sharpe_ratio', 'recovery_factor', 'expected_payoff')
+
+# Smaller is better
+ASCENDING = frozenset(('max_drawdown', 'max_drawdown_pct'))
+
+
+def expand_grid(grid):
+    """
+    {'name': [values]} -> [{'name': value, ...}] (every combination, grid order)
+    Combinations without 'ob' entries lose the OB-only parameters, so they
+    are not backtested once per OB setting
+    """
+    names = list(grid)
+    combos = []
+    seen = set()
+    for values in itertools.product(*(grid[n] for n in names)):
+        combo = dict(zip(names, values))
+        if 'entries' in combo and 'ob' not in combo['entries']:
+            combo = {k: v for k, v in combo.items() if k not in OB_ONLY_PARAMS}
+        key = json.dumps(combo, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            combos.append(combo)
+    return combos
+
+
+def row_key(symbol, timeframe, params):
+    return json.dumps({'symbol': symbol, 'timeframe': timeframe, **params}, sort_keys=True)
+
+
+# =============================================================================
+#                         Shared bars
+# =============================================================================
+
+class SharedBars:
+    """
+    Every series' rates in one SharedMemory block (RATES_DTYPE records)
+
+    with SharedBars({("EURUSD", "H1"): rates}) as shared:
+        ProcessPoolExecutor(initializer=attach_shared, initargs=(shared.spec,))
+    """
+
+    def __init__(self, series):
+        self.index = {}
+        total = 0
+        for key, rates in series.items():
+            self.index[key] = (total, len(rates))
+            total += len(rates)
+
+        self.shm = SharedMemory(create=True, size=max(total, 1) * RATES_DTYPE.itemsize)
+        self.array = np.ndarray((total,), dtype=RATES_DTYPE, buffer=self.shm.buf)
+        for key, rates in series.items():
+            offset, length = self.index[key]
+            block = self.array[offset:offset + length]
+            for name in RATES_DTYPE.names:
+                block[name] = rates[name] if name in rates.dtype.names else 0
+
+    @property
+    def spec(self):
+        """Picklable handle for the workers"""
+        return self.shm.name, len(self.array), self.index
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Worker state (one per process, filled by attach_shared)
+_WORKER = {}
+
+
+def attach_shared(spec, structure_cache=8):
+    """Pool initializer: map the shared bars (read only)"""
+    name, total, index = spec
+    try:
+        shm = SharedMemory(name=name, track=False)   # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+    array = np.ndarray((total,), dtype=RATES_DTYPE, buffer=shm.buf)
+    array.flags.writeable = False
+    _WORKER.update(shm=shm, array=array, index=index, cores={}, spreads={},
+                   structures=OrderedDict(), structure_cache=structure_cache)
+
+
+def _series(key):
+    """SMCCore (views on the shared block, swing masks cached) + per-bar spread"""
+    cores = _WORKER['cores']
+    if key not in cores:
+        offset, length = _WORKER['index'][key]
+        rates = _WORKER['array'][offset:offset + length]
+        cores[key] = SMCCore.from_rates(rates)
+        _WORKER['spreads'][key] = rates['spread'].astype(np.float64)
+    return cores[key], _WORKER['spreads'][key]
+
+
+def _structure(key, core, structure_params, order_blocks):
+    """market_structure() through a small LRU (batches of one group often land on the same worker)"""
+    cache = _WORKER['structures']
+    cache_key = (key, tuple(sorted(structure_params.items())), order_blocks)
+    if cache_key in cache:
+        cache.move_to_end(cache_key)
+        return cache[cache_key]
+    structure = market_structure(core, structure_params.get('profile', 'v3'),
+                                 structure_params.get('swing_strength'), order_blocks,
+                                 structure_params.get('ob_lookback'))
+    cache[cache_key] = structure
+    while len(cache) > _WORKER['structure_cache']:
+        cache.popitem(last=False)
+    return structure
+
+
+def run_task(key, structure_params, combos, fixed):
+    """Worker: one structure, a batch of trade settings -> result rows"""
+    started = time.perf_counter()
+    core, spread = _series(key)
+    order_blocks = any('ob' in combo.get('entries', fixed.get('entries', ())) for combo in combos)
+    structure = _structure(key, core, structure_params, order_blocks)
+
+    rows = []
+    for combo in combos:
+        params = {'spread': spread, **fixed, **structure_params, **combo}
+        report = backtest(core, structure, **params)
+        row = {'symbol': key[0], 'timeframe': key[1], 'params': {**structure_params, **combo}}
+        row.update({name: getattr(report, name) for name in ROW_METRICS})
+        rows.append(row)
+    return rows, time.perf_counter() - started
+
+
+# =============================================================================
+#                         Ranking
+# =============================================================================
+
+class Leaderboard:
+    """Top `top` rows by `rank_by` (rows under `min_trades` trades are not ranked)"""
+
+    def __init__(self, rank_by='total_profit', top=50, min_trades=0):
+        self.rank_by = rank_by
+        self.top = top
+        self.min_trades = min_trades
+        self.sign = -1.0 if rank_by in ASCENDING else 1.0
+        self._heap = []
+        self._seq = 0
+
+    def add(self, row):
+        if row['total_trades'] < self.min_trades:
+            return
+        value = row[self.rank_by]
+        if value is None or math.isnan(value):
+            return
+        self._seq += 1
+        item = (self.sign * value, -self._seq, row)
+        if len(self._heap) < self.top:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def rows(self):
+        return [item[2] for item in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+
+# =============================================================================
+#                         Sweep
+# =============================================================================
+
+def group_combos(combos):
+    """[(structure params, [trade settings])] - one entry per distinct structure"""
+    groups = OrderedDict()
+    for combo in combos:
+        structure = {name: combo[name] for name in STRUCTURE_PARAMS if name in combo}
+        trade = {name: value for name, value in combo.items() if name not in STRUCTURE_PARAMS}
+        groups.setdefault(json.dumps(structure, sort_keys=True), (structure, []))[1].append(trade)
+    return list(groups.values())
+
+
+def plan_tasks(keys, combos, workers, chunk=None):
+    """
+    (series, structure params, batch of trade settings) tasks, groups kept
+    together; batch size leaves ~8 tasks per worker for load balancing
+    """
+    groups = group_combos(combos)
+    total = len(combos) * len(keys)
+    chunk = chunk or max(1, min(64, total // (workers * 8)))
+    tasks = []
+    for key in keys:
+        for structure, trades in groups:
+            for i in range(0, len(trades), chunk):
+                tasks.append((key, structure, trades[i:i + chunk]))
+    return tasks
+
+
+def sweep(series, grid=None, out_dir="sweep", workers=None, rank_by='total_profit', top=50,
+          min_trades=0, fixed=None, resume=False, chunk=None, rank_every=2.0, verbose=True):
+    """
+    Run every grid combination on every series {(symbol, tf): rates}
+
+    fixed: backtest() settings shared by all combinations (lots, commission ...)
+    Returns the ranked rows (also in <out_dir>/ranked.json)
+    """
+    grid = grid or DEFAULT_GRID
+    fixed = fixed or {}
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.jsonl")
+    ranked_path = os.path.join(out_dir, "ranked.json")
+    board = Leaderboard(rank_by, top, min_trades)
+
+    combos = expand_grid(grid)
+    done_keys = set()
+    if resume and os.path.exists(results_path):
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue   # last line of an interrupted run
+                done_keys.add(row_key(row['symbol'], row['timeframe'], row['params']))
+                board.add(row)
+
+    tasks = [
+        (key, structure, [t for t in trades
+                          if row_key(key[0], key[1], {**structure, **t}) not in done_keys])
+        for key, structure, trades in plan_tasks(list(series), combos, workers, chunk)
+    ]
+    tasks = [task for task in tasks if task[2]]
+    total = sum(len(task[2]) for task in tasks)
+
+    if verbose:
+        print("=" * 60)
+        print(f"   SMC Sweep: {len(combos)} combinations x {len(series)} series "
+              f"= {len(combos) * len(series)} backtests ({workers} workers)")
+        if done_keys:
+            print(f"   Resumed: {len(done_keys)} already done, {total} to go")
+        print("=" * 60)
+
+    def write_ranked(done):
+        write_json_atomic(ranked_path, {
+            'generated_at': datetime.now().isoformat(),
+            'rank_by': rank_by,
+            'min_trades': min_trades,
+            'done': done,
+            'total': total,
+            'grid': grid,
+            'ranked': board.rows(),
+        })
+
+    started = time.perf_counter()
+    done = 0
+    last_write = started
+    with SharedBars(series) as shared, \
+            open(results_path, 'a' if resume else 'w', encoding='utf-8') as results, \
+            ProcessPoolExecutor(max_workers=workers, initializer=attach_shared,
+                                initargs=(shared.spec,)) as pool:
+        futures = [pool.submit(run_task, key, structure, trades, fixed)
+                   for key, structure, trades in tasks]
+        for future in as_completed(futures):
+            try:
+                rows, _ = future.result()
+            except Exception as e:
+                print(f"[ERROR] {e}")
+                continue
+            for row in rows:
+                results.write(json.dumps(row, default=str) + "\n")
+                board.add(row)
+            results.flush()
+            done += len(rows)
+
+            now = time.perf_counter()
+            if now - last_write >= rank_every:
+                write_ranked(done)
+                last_write = now
+                if verbose:
+                    print(f"[{done}/{total}] {done / (now - started):.1f} backtests/s")
+
+    write_ranked(done)
+    wall = time.perf_counter() - started
+    if verbose:
+        print("\n" + "=" * 60)
+        print("   Sweep Summary:")
+        print(f"   - Backtests: {done} in {wall:.2f}s ({done / wall if wall else 0:.1f}/s)")
+        best = board.rows()[:5]
+        for i, row in enumerate(best, start=1):
+            print(f"   {i}. {row['symbol']} {row['timeframe']} {rank_by}={row[rank_by]:.3f} "
+                  f"trades={row['total_trades']} {row['params']}")
+        print(f"[OK] Results: {results_path}")
+        print(f"[OK] Ranking: {ranked_path}")
+        print("=" * 60)
+    return board.rows()
+
+
+def benchmark(workers_list=None, series_count=4, seed=42, out_dir=None):
+    """Backtests per second on synthetic H1 symbol-years for 1..cpu_count workers"""
+    import tempfile
+
+    timeframe = TIMEFRAMES['H1']
+    bars = bars_per_year(timeframe)
+    provider = SyntheticProvider(bars=bars, seed=seed)
+    series = {(f"SYN{i}", "H1"): provider.get_rates(f"SYN{i}", timeframe, bars) for i in range(series_count)}
+    cpus = os.cpu_count() or 1
+    workers_list = workers_list or sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in workers_list:
+            started = time.perf_counter()
+            ranked = sweep(series, DEFAULT_GRID, out_dir or tmp, workers, verbose=False)
+            wall = time.perf_counter() - started
+            count = len(expand_grid(DEFAULT_GRID)) * len(series)
+            rows.append({'workers': workers, 'backtests': count, 'seconds': wall,
+                         'rate': count / wall, 'best': ranked[0] if ranked else None})
+    base = rows[0]['rate']
+    for row in rows:
+        row['speedup'] = row['rate'] / base
+    return rows
+
+
+def main():
+    from run_batch import fetch_all
+
+    parser = argparse.ArgumentParser(description="Parallel SMC parameter sweep (analysis + backtest)")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"])
+    parser.add_argument("--timeframes", nargs="+", default=["H1"], choices=list(TIMEFRAMES))
+    parser.add_argument("--bars", type=int, default=None, help="bars per series (default: one year)")
+    parser.add_argument("--grid", default=None, help="JSON file or inline JSON {name: [values]}")
+    parser.add_argument("--rank-by", default="total_profit",
+                        choices=[m for m in ROW_METRICS if m != 'total_trades'])
+    parser.add_argument("--min-trades", type=int, default=0)
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--commission", type=float, default=0.0, help="money per lot and side")
+    parser.add_argument("--lots", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=None, help="trade settings per task")
+    parser.add_argument("--out-dir", default="sweep")
+    parser.add_argument("--resume", action="store_true", help="skip combinations in results.jsonl")
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir>")
+    parser.add_argument("--benchmark", action="store_true", help="throughput vs workers")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print("=" * 60)
+        print(f"   Sweep throughput ({datetime.now():%Y-%m-%d %H:%M}), "
+              f"{len(expand_grid(DEFAULT_GRID))} combinations x 4 H1 symbol-years")
+        print("=" * 60)
+        print(f"{'workers':>8} {'backtests':>10} {'seconds':>9} {'per s':>8} {'speedup':>8}")
+        for row in benchmark():
+            print(f"{row['workers']:>8} {row['backtests']:>10} {row['seconds']:>9.2f} "
+                  f"{row['rate']:>8.1f} {row['speedup']:>8.2f}")
+        print("=" * 60)
+        return 0
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        if os.path.exists(args.grid):
+            with open(args.grid, 'r', encoding='utf-8') as f:
+                grid = json.load(f)
+        else:
+            grid = json.loads(args.grid)
+
+    provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+    if not provider.connect():
+        print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+        return 1
+    try:
+        bars = args.bars or max(bars_per_year(TIMEFRAMES[tf]) for tf in args.timeframes)
+        series = fetch_all(provider, args.symbols, args.timeframes, bars)
+    finally:
+        provider.shutdown()
+    if not series:
+        print("[ERROR] No data")
+        return 1
+
+    sweep(series, grid, args.out_dir, args.workers, args.rank_by, args.top, args.min_trades,
+          {'commission': args.commission, 'lots': args.lots}, args.resume, args.chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
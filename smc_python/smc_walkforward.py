@@ -0,0 +1,407 @@
+"""
+=============================================================================
+    SMC Walk-Forward - rolling / anchored optimization with out-of-sample checks
+    - instead of one in-sample run (like the 2024.01.01 - 2024.12.31 default
+      of the tester modules) the bars are cut into windows:
+          rolling:  [IS 1][OOS 1]
+                          [IS 2   ][OOS 2]
+          anchored: [IS 1][OOS 1]
+                    [IS 2         ][OOS 2]
+    - every IS window gets the full grid search, the best set (rank_by,
+      min_trades) is then traded on the following OOS window only
+    - windows are independent -> one pool task per (series, window);
+      the bars sit once in SharedMemory (SharedBars) and each worker keeps
+      the structures (swings / breaks / OBs) of the whole series in its cache,
+      so a structure is computed once per worker and reused by every window
+      (signals are point-in-time, see smc_backtest.signal_bars)
+    - <out>/walkforward.json: windows, chosen parameters, IS / OOS metrics,
+      stability report; <out>/oos_equity.csv: stitched OOS equity curve
+
+    python smc_walkforward.py --symbols EURUSD --timeframes H1 --bars 12480
+    python smc_walkforward.py --is-bars 3120 --oos-bars 1040 --anchored
+    python smc_walkforward.py --from 2022-01-01 --to 2024-12-31 --rank-by sharpe_ratio
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bar_store import BarStore
+from data_providers import TIMEFRAMES, get_default_provider, provider_from_spec
+from smc_backtest import backtest, bars_per_year
+from smc_export import write_json_atomic, write_text_atomic
+from smc_sweep import (DEFAULT_GRID, ROW_METRICS, SharedBars, Leaderboard,
+                       attach_shared, expand_grid, group_combos, _series, _structure)
+
+
+def make_windows(n, is_bars, oos_bars, anchored=False):
+    """
+    [{'index', 'is': (start, end), 'oos': (start, end)}] over `n` bars
+    OOS windows follow each other without gaps; a short last one is kept
+    when it has at least a quarter of `oos_bars`
+    """
+    windows = []
+    for oos_start in range(is_bars, n, oos_bars):
+        oos_end = min(n, oos_start + oos_bars)
+        if oos_end - oos_start < max(1, oos_bars // 4):
+            break
+        is_start = 0 if anchored else oos_start - is_bars
+        windows.append({'index': len(windows), 'is': (is_start, oos_start), 'oos': (oos_start, oos_end)})
+    return windows
+
+
+def default_window_bars(timeframe):
+    """Half a year in sample, two months out of sample"""
+    year = bars_per_year(TIMEFRAMES[timeframe]) if timeframe in TIMEFRAMES else 6240
+    return year // 2, year // 6
+
+
+def spearman(x, y):
+    """Rank correlation of the finite pairs (None with fewer than 3)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if ok.sum() < 3:
+        return None
+    rx = pd.Series(x[ok]).rank().to_numpy()
+    ry = pd.Series(y[ok]).rank().to_numpy()
+    if rx.std() == 0 or ry.std() == 0:
+        return None
+    return float(np.corrcoef(rx, ry)[0, 1])
+
+
+def _metrics(report):
+    return {name: getattr(report, name) for name in ROW_METRICS}
+
+
+# =============================================================================
+#                         Worker
+# =============================================================================
+
+def run_window(key, window, groups, fixed, rank_by, min_trades):
+    """
+    Worker: grid search on the IS bars, chosen set on the OOS bars
+    Every combination is also run OOS for the IS / OOS rank correlation
+    """
+    started = time.perf_counter()
+    core, spread = _series(key)
+    board = Leaderboard(rank_by, 1, min_trades)
+    runs, is_rows, oos_rows = [], [], []
+
+    for structure_params, trades in groups:
+        order_blocks = any('ob' in combo.get('entries', fixed.get('entries', ())) for combo in trades)
+        structure = _structure(key, core, structure_params, order_blocks)
+        for combo in trades:
+            params = {'spread': spread, **fixed, **structure_params, **combo}
+            is_row = _metrics(backtest(core, structure, window=window['is'], **params))
+            oos_row = _metrics(backtest(core, structure, window=window['oos'], **params))
+            board.add({**is_row, 'index': len(runs)})
+            runs.append((structure, {**structure_params, **combo}, params))
+            is_rows.append(is_row)
+            oos_rows.append(oos_row)
+
+    result = {
+        'symbol': key[0],
+        'timeframe': key[1],
+        **window,
+        'combinations': len(runs),
+        'spearman': spearman([r[rank_by] for r in is_rows], [r[rank_by] for r in oos_rows]),
+        'chosen': None,
+        'is_metrics': None,
+        'oos_metrics': None,
+        'oos_pnl': None,
+    }
+    best = board.rows()
+    if best:
+        i = best[0]['index']
+        structure, chosen, params = runs[i]
+        report = backtest(core, structure, window=window['oos'], **params)
+        result.update(chosen=chosen, is_metrics=is_rows[i], oos_metrics=oos_rows[i],
+                      oos_pnl=(report.equity[0] - report.deposit).tolist())
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+# =============================================================================
+#                         Report
+# =============================================================================
+
+def _iso(epoch):
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).isoformat()
+
+
+def efficiency(is_metrics, oos_metrics, is_bars, oos_bars):
+    """Walk-forward efficiency: OOS profit per bar / IS profit per bar (None if IS lost)"""
+    if not is_metrics or is_metrics['total_profit'] <= 0:
+        return None
+    return (oos_metrics['total_profit'] / oos_bars) / (is_metrics['total_profit'] / is_bars)
+
+
+def stitch(windows, deposit):
+    """OOS P/L curves end to end -> equity per OOS bar (untraded windows stay flat)"""
+    parts = []
+    balance = deposit
+    for window in windows:
+        length = window['oos'][1] - window['oos'][0]
+        pnl = np.asarray(window['oos_pnl']) if window['oos_pnl'] is not None else np.zeros(length)
+        parts.append(balance + pnl)
+        balance += float(pnl[-1]) if len(pnl) else 0.0
+    return np.concatenate(parts) if parts else np.zeros(0)
+
+
+def parameter_stability(windows, grid):
+    """Per searched parameter: chosen value per window, most common value and its share, CV"""
+    chosen = [w['chosen'] for w in windows if w['chosen'] is not None]
+    out = {}
+    for name, values in grid.items():
+        if len(values) < 2:
+            continue
+        # OB-only parameters count only in windows that chose OB entries
+        picked = [c[name] for c in chosen if name in c]
+        counts = Counter(json.dumps(v) for v in picked)
+        entry = {'values': [c.get(name) for c in chosen], 'distinct': len(counts),
+                 'mode': None, 'mode_share': None, 'cv': None}
+        if counts:
+            mode, count = counts.most_common(1)[0]
+            entry.update(mode=json.loads(mode), mode_share=count / len(picked))
+        numeric = [v for v in picked if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if len(numeric) > 1 and len(numeric) == len(picked) and np.mean(numeric) != 0:
+            entry['cv'] = float(np.std(numeric) / abs(np.mean(numeric)))
+        out[name] = entry
+    return out
+
+
+def series_report(key, windows, rates, grid, deposit):
+    """Windows + stitched OOS equity + stability summary of one series"""
+    times = rates['time']
+    equity = stitch(windows, deposit)
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = peak - equity
+    traded = [w for w in windows if w['oos_metrics'] is not None]
+    profits = [w['oos_metrics']['total_profit'] for w in traded]
+
+    rows = []
+    for w in windows:
+        is_bars = w['is'][1] - w['is'][0]
+        oos_bars = w['oos'][1] - w['oos'][0]
+        rows.append({
+            'index': w['index'],
+            'is': {'from': _iso(times[w['is'][0]]), 'to': _iso(times[w['is'][1] - 1]), 'bars': is_bars},
+            'oos': {'from': _iso(times[w['oos'][0]]), 'to': _iso(times[w['oos'][1] - 1]), 'bars': oos_bars},
+            'chosen': w['chosen'],
+            'is_metrics': w['is_metrics'],
+            'oos_metrics': w['oos_metrics'],
+            'efficiency': efficiency(w['is_metrics'], w['oos_metrics'], is_bars, oos_bars),
+            'spearman': w['spearman'],
+            'seconds': round(w['seconds'], 3),
+        })
+
+    wfe = [r['efficiency'] for r in rows if r['efficiency'] is not None]
+    rho = [w['spearman'] for w in windows if w['spearman'] is not None]
+    worst = int(np.argmax(drawdown)) if len(drawdown) else 0
+    summary = {
+        'windows': len(windows),
+        'traded_windows': len(traded),
+        'profitable_windows_pct': 100.0 * sum(p > 0 for p in profits) / len(traded) if traded else 0.0,
+        'oos_total_profit': float(sum(profits)),
+        'oos_trades': int(sum(w['oos_metrics']['total_trades'] for w in traded)),
+        'oos_max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+        'oos_max_drawdown_pct': float(100.0 * drawdown[worst] / peak[worst]) if len(drawdown) else 0.0,
+        'final_equity': float(equity[-1]) if len(equity) else deposit,
+        'mean_efficiency': float(np.mean(wfe)) if wfe else None,
+        'mean_spearman': float(np.mean(rho)) if rho else None,
+    }
+    return {
+        'symbol': key[0],
+        'timeframe': key[1],
+        'summary': summary,
+        'parameters': parameter_stability(windows, grid),
+        'windows': rows,
+    }, equity
+
+
+# =============================================================================
+#                         Walk-forward
+# =============================================================================
+
+def walk_forward(series, grid=None, is_bars=None, oos_bars=None, anchored=False, out_dir="walkforward",
+                 workers=None, rank_by='total_profit', min_trades=0, fixed=None, verbose=True):
+    """
+    Walk-forward optimization of every series {(symbol, tf): rates}
+
+    is_bars / oos_bars: window lengths (default per timeframe: 6 / 2 months)
+    fixed: backtest() settings shared by all combinations (lots, commission ...)
+    Returns the report (also in <out_dir>/walkforward.json)
+    """
+    grid = grid or DEFAULT_GRID
+    fixed = fixed or {}
+    workers = workers or os.cpu_count() or 1
+    deposit = fixed.get('deposit', 10_000.0)
+    groups = group_combos(expand_grid(grid))
+    combos = sum(len(trades) for _, trades in groups)
+
+    plans = {}
+    for key, rates in series.items():
+        default_is, default_oos = default_window_bars(key[1])
+        plans[key] = make_windows(len(rates), is_bars or default_is, oos_bars or default_oos, anchored)
+        if not plans[key] and verbose:
+            print(f"[ERROR] {key[0]} {key[1]}: {len(rates)} bars is too short for one window")
+    tasks = [(key, window) for key, windows in plans.items() for window in windows]
+
+    if verbose:
+        print("=" * 60)
+        print(f"   SMC Walk-Forward ({'anchored' if anchored else 'rolling'}): {len(tasks)} windows x "
+              f"{combos} combinations ({workers} workers)")
+        print("=" * 60)
+
+    started = time.perf_counter()
+    results = {key: [] for key in plans}
+    # Every structure of every series fits the worker cache -> computed once per worker
+    cache = max(8, 2 * len(groups) * len(series))
+    with SharedBars(series) as shared, \
+            ProcessPoolExecutor(max_workers=workers, initializer=attach_shared,
+                                initargs=(shared.spec, cache)) as pool:
+        futures = {pool.submit(run_window, key, window, groups, fixed, rank_by, min_trades): key
+                   for key, window in tasks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[ERROR] {key[0]} {key[1]}: {e}")
+                continue
+            results[key].append(result)
+            if verbose:
+                oos = result['oos_metrics']
+                print(f"[{done}/{len(tasks)}] {key[0]} {key[1]} window {result['index']}: "
+                      + (f"OOS profit {oos['total_profit']:.2f} ({oos['total_trades']} trades)"
+                         if oos else "no set with enough IS trades"))
+
+    os.makedirs(out_dir, exist_ok=True)
+    reports = []
+    lines = ["symbol,timeframe,time,window,equity"]
+    for key, windows in results.items():
+        if not windows:
+            continue
+        windows.sort(key=lambda w: w['index'])
+        report, equity = series_report(key, windows, series[key], grid, deposit)
+        reports.append(report)
+        times = series[key]['time']
+        bar = 0
+        for w in windows:
+            for i in range(w['oos'][0], w['oos'][1]):
+                lines.append(f"{key[0]},{key[1]},{_iso(times[i])},{w['index']},{equity[bar]:.2f}")
+                bar += 1
+
+    wall = time.perf_counter() - started
+    payload = {
+        'generated_at': datetime.now().isoformat(),
+        'mode': 'anchored' if anchored else 'rolling',
+        'rank_by': rank_by,
+        'min_trades': min_trades,
+        'is_bars': is_bars,
+        'oos_bars': oos_bars,
+        'grid': grid,
+        'fixed': fixed,
+        'seconds': wall,
+        'series': reports,
+    }
+    json_path = write_json_atomic(os.path.join(out_dir, "walkforward.json"), payload)
+    csv_path = write_text_atomic(os.path.join(out_dir, "oos_equity.csv"), "\n".join(lines) + "\n")
+
+    if verbose:
+        print("\n" + "=" * 60)
+        print(f"   Walk-Forward Summary ({len(tasks) * combos * 2} backtests in {wall:.2f}s):")
+        for report in reports:
+            s = report['summary']
+            wfe = f"{s['mean_efficiency']:.2f}" if s['mean_efficiency'] is not None else "-"
+            rho = f"{s['mean_spearman']:.2f}" if s['mean_spearman'] is not None else "-"
+            print(f"   - {report['symbol']} {report['timeframe']}: OOS profit {s['oos_total_profit']:.2f}, "
+                  f"DD {s['oos_max_drawdown_pct']:.2f}%, {s['profitable_windows_pct']:.0f}% windows "
+                  f"profitable, WFE {wfe}, IS/OOS rank corr {rho}")
+            for name, entry in report['parameters'].items():
+                if entry['mode_share'] is not None:
+                    print(f"       {name}: {entry['mode']} in {entry['mode_share'] * 100:.0f}% of windows "
+                          f"({entry['distinct']} distinct)")
+        print(f"[OK] Report: {json_path}")
+        print(f"[OK] OOS equity: {csv_path}")
+        print("=" * 60)
+    return payload
+
+
+def main():
+    from run_batch import fetch_all
+
+    parser = argparse.ArgumentParser(description="Walk-forward SMC optimization (IS search -> OOS check)")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"])
+    parser.add_argument("--timeframes", nargs="+", default=["H1"], choices=list(TIMEFRAMES))
+    parser.add_argument("--bars", type=int, default=None, help="bars per series (default: two years)")
+    parser.add_argument("--from", dest="date_from", default=None, help="YYYY-MM-DD instead of --bars")
+    parser.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (default: now)")
+    parser.add_argument("--is-bars", type=int, default=None, help="in-sample bars (default: 6 months)")
+    parser.add_argument("--oos-bars", type=int, default=None, help="out-of-sample bars (default: 2 months)")
+    parser.add_argument("--anchored", action="store_true", help="IS windows all start at the first bar")
+    parser.add_argument("--grid", default=None, help="JSON file or inline JSON {name: [values]}")
+    parser.add_argument("--rank-by", default="total_profit",
+                        choices=[m for m in ROW_METRICS if m != 'total_trades'])
+    parser.add_argument("--min-trades", type=int, default=10, help="IS trades needed to be chosen")
+    parser.add_argument("--commission", type=float, default=0.0, help="money per lot and side")
+    parser.add_argument("--lots", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out-dir", default="walkforward")
+    parser.add_argument("--store", default=None, help="BarStore directory (top-up fetch, cached bars)")
+    parser.add_argument("--provider", default=None, help="mt5 | synthetic[:seed] | files:<dir>")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        if os.path.exists(args.grid):
+            with open(args.grid, 'r', encoding='utf-8') as f:
+                grid = json.load(f)
+        else:
+            grid = json.loads(args.grid)
+
+    provider = provider_from_spec(args.provider) if args.provider else get_default_provider()
+    if not provider.connect():
+        print(f"[ERROR] Failed to connect to {provider.name}: {provider.last_error()}")
+        return 1
+    try:
+        if args.date_from:
+            date_from = datetime.strptime(args.date_from, "%Y-%m-%d")
+            date_to = (datetime.strptime(args.date_to, "%Y-%m-%d") if args.date_to
+                       else datetime.now(tz=timezone.utc))
+            series = {}
+            for symbol in args.symbols:
+                provider.select_symbol(symbol)
+                for tf in args.timeframes:
+                    rates = provider.get_rates_range(symbol, TIMEFRAMES[tf], date_from, date_to)
+                    if rates is not None and len(rates):
+                        series[(symbol, tf)] = rates
+        else:
+            bars = args.bars or max(2 * bars_per_year(TIMEFRAMES[tf]) for tf in args.timeframes)
+            store = BarStore(args.store) if args.store else None
+            series = fetch_all(provider, args.symbols, args.timeframes, bars, store)
+    finally:
+        provider.shutdown()
+    if not series:
+        print("[ERROR] No data")
+        return 1
+
+    walk_forward(series, grid, args.is_bars, args.oos_bars, args.anchored, args.out_dir, args.workers,
+                 args.rank_by, args.min_trades, {'commission': args.commission, 'lots': args.lots})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())